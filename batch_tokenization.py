@@ -0,0 +1,300 @@
+"""
+    Batched, multi-process tokenization: documents streamed from files or stdin in chunks,
+    split into sentences and words by tokenizers loaded once per process, and returned as
+    byte spans of the source instead of copied strings
+"""
+# pylint: disable=C0103
+
+import collections
+import mmap
+import os
+import re
+import sys
+import time
+import numpy as np
+import nltk.data
+from nltk.tokenize import sent_tokenize, word_tokenize
+from nltk.tokenize import MWETokenizer, TreebankWordTokenizer, TweetTokenizer
+from nltk.tokenize.casual import WORD_RE
+from nltk.tokenize.destructive import NLTKWordTokenizer
+from nltk.tokenize.util import align_tokens
+from batch_tagging import pool_context
+
+PUNKT = "tokenizers/punkt/PY3/{}.pickle"
+_QUOTES = re.compile(r"``|'{2}|\"")
+
+# Spans of a document, in bytes from the start of its source: the document itself, its
+# sentences and its words, an (n, 2) array each, and the words of sentence i are
+# words[bounds[i]:bounds[i + 1]]
+DocumentSpans = collections.namedtuple("DocumentSpans", "start end sentences words bounds")
+
+# Tokenizers and mapped files of the current process. Loaded in the parent before the
+# pool is forked, so the workers share the Punkt model instead of loading it again.
+# Each path maps to the (device, inode, size, mtime) of the file it mapped and the mapping
+_tokenizers = None
+_tokenizers_config = None
+_mapped = {}
+
+
+def load_tokenizers(language="english", mwes=()):
+    """
+        Loads the tokenizers of the current process, once per language and MWE list
+    """
+    global _tokenizers, _tokenizers_config  # pylint: disable = W0603
+    config = (language, tuple(tuple(mwe) for mwe in mwes))
+    if _tokenizers is None or _tokenizers_config != config:
+        _tokenizers = {
+            "punkt": nltk.data.load(PUNKT.format(language)),
+            "word": NLTKWordTokenizer(),  # Tokenizer of word_tokenize
+            "treebank": TreebankWordTokenizer(),
+            "tweet": TweetTokenizer(),
+            "mwe": MWETokenizer(list(config[1])) if mwes else None
+        }
+        _tokenizers_config = config
+    return _tokenizers
+
+
+def _word_spans(sentence, words):
+    """
+        Spans of the words of a sentence. "word" aligns the tokens of word_tokenize as
+        TreebankWordTokenizer.span_tokenize does; "tweet" gives the tokens TweetTokenizer
+        matches, before it unescapes HTML entities and shortens runs of punctuation
+    """
+    tokenizer = _tokenizers[words]
+    if words == "treebank":
+        return list(tokenizer.span_tokenize(sentence))
+    if words == "tweet":
+        return [match.span() for match in WORD_RE.finditer(sentence)]
+    tokens = tokenizer.tokenize(sentence)
+    if '"' in sentence or "''" in sentence:
+        # Quotes the tokenizer turned into `` or '' are aligned as written
+        matched = _QUOTES.findall(sentence)
+        tokens = [matched.pop(0) if token in ('"', "``", "''") else token for token in tokens]
+    return align_tokens(tokens, sentence)
+
+
+def _merge_mwes(text, spans):
+    """
+        Merges the spans of multi-word expressions, with the same greedy trie walk as
+        MWETokenizer.tokenize
+    """
+    mwes = _tokenizers["mwe"]._mwes  # pylint: disable = W0212
+    tokens = [text[start:end] for start, end in spans]
+    merged = []
+    i, n = 0, len(tokens)
+    while i < n:
+        j, trie = i, mwes
+        while j < n and tokens[j] in trie:
+            trie = trie[tokens[j]]
+            j += 1
+        if j > i and mwes.LEAF in trie:
+            merged.append((spans[i][0], spans[j - 1][1]))
+            i = j
+        else:
+            merged.append(spans[i])
+            i += 1
+    return merged
+
+
+def document_spans(text, words="word"):
+    """
+        Sentence spans, word spans and word bounds of each sentence of a text, in
+        characters. The sentences are the ones of sent_tokenize, and with words="word",
+        the words are the ones of word_tokenize
+    """
+    sentences = list(_tokenizers["punkt"].span_tokenize(text))
+    spans, bounds = [], [0]
+    for start, end in sentences:
+        sentence_spans = _word_spans(text[start:end], words)
+        if _tokenizers["mwe"] is not None:
+            sentence_spans = _merge_mwes(text[start:end], sentence_spans)
+        spans.extend((start + first, start + last) for first, last in sentence_spans)
+        bounds.append(len(spans))
+    return (np.array(sentences, dtype=np.int64).reshape(-1, 2),
+            np.array(spans, dtype=np.int64).reshape(-1, 2), np.array(bounds, dtype=np.int64))
+
+
+def _byte_offsets(text):
+    """
+        UTF-8 offset of each character of a text, and of its end. None for ASCII text
+    """
+    if text.isascii():
+        return None
+    points = np.frombuffer(text.encode("utf-32-le"), dtype="<u4")
+    offsets = np.zeros(len(points) + 1, dtype=np.int64)
+    np.cumsum(1 + (points >= 0x80) + (points >= 0x800) + (points >= 0x10000), out=offsets[1:])
+    return offsets
+
+
+def _tokenize_document(data, start, words):
+    """
+        Spans of a UTF-8 document starting at byte start of its source
+    """
+    text = data.decode("utf-8")
+    sentences, spans, bounds = document_spans(text, words)
+    offsets = _byte_offsets(text)
+    if offsets is not None:
+        sentences, spans = offsets[sentences], offsets[spans]
+    return DocumentSpans(start, start + len(data), sentences + start, spans + start, bounds)
+
+
+def _mapping(path):
+    """
+        Mapping of a file in the current process, kept while the file is unchanged. A file
+        replaced or rewritten since it was mapped (by this process or the parent it was
+        forked from) is mapped again and its stale mapping closed
+    """
+    with open(path, "rb") as file:
+        stat = os.fstat(file.fileno())
+        key = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if path in _mapped and _mapped[path][0] == key:
+            return _mapped[path][1]
+        source = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    if path in _mapped:
+        _mapped.pop(path)[1].close()
+    _mapped[path] = (key, source)
+    return source
+
+
+def _tokenize_chunk(task):
+    """
+        Tokenizes a chunk of documents inside a worker: (start, end) byte ranges of a
+        file, mapped once per process, or (start, bytes) pairs read from a stream
+    """
+    path, documents, words = task
+    if path is None:
+        return [_tokenize_document(data, start, words) for start, data in documents]
+    source = _mapping(path)
+    return [_tokenize_document(source[start:end], start, words) for start, end in documents]
+
+
+def _file_chunks(path, separator, chunk_bytes):
+    """
+        Byte ranges of the documents of a file, found in its mapping, in chunks of about
+        chunk_bytes. No document is read by the parent
+    """
+    if not os.path.getsize(path):
+        return
+    with open(path, "rb") as file, \
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as source:
+        chunk, size, start = [], 0, 0
+        while start < len(source):
+            end = source.find(separator, start)
+            end = len(source) if end < 0 else end
+            chunk.append((start, end))
+            size += end - start
+            start = end + len(separator)
+            if size >= chunk_bytes:
+                yield chunk
+                chunk, size = [], 0
+        if chunk:
+            yield chunk
+
+
+def _stream_chunks(stream, separator, chunk_bytes):
+    """
+        (start, bytes) of the documents of a binary stream, in chunks of about chunk_bytes.
+        Only the blocks just read are searched for separators
+    """
+    chunk, size, start, buffer = [], 0, 0, bytearray()
+    for block in iter(lambda: stream.read(chunk_bytes), b""):
+        buffer += block
+        end = buffer.rfind(separator, max(0, len(buffer) - len(block) - len(separator) + 1))
+        if end < 0:
+            continue
+        for data in bytes(buffer[:end]).split(separator):
+            chunk.append((start, data))
+            size += len(data)
+            start += len(data) + len(separator)
+        del buffer[:end + len(separator)]
+        if size >= chunk_bytes:
+            yield chunk
+            chunk, size = [], 0
+    if buffer:
+        chunk.append((start, bytes(buffer)))
+    if chunk:
+        yield chunk
+
+
+def tokenize_documents(source=None, workers=None, words="word", language="english", mwes=(),
+                       separator=b"\n", chunk_bytes=1 << 20, prefetch=2):
+    """
+        Tokenizes the documents of a file (a path), a binary stream, or stdin (None),
+        separated by separator, across worker processes. Yields a DocumentSpans of each
+        document in input order, with at most workers * prefetch chunks in flight.
+        Workers map files themselves, so the parent only passes byte ranges around
+    """
+    workers = workers or os.cpu_count() or 1
+    load_tokenizers(language, mwes)
+    if isinstance(source, (str, os.PathLike)):
+        path, chunks = os.fspath(source), _file_chunks(source, separator, chunk_bytes)
+    else:
+        stream = sys.stdin.buffer if source is None else source
+        path, chunks = None, _stream_chunks(stream, separator, chunk_bytes)
+
+    if workers == 1:
+        for chunk in chunks:
+            yield from _tokenize_chunk((path, chunk, words))
+        return
+
+    with pool_context().Pool(workers, initializer=load_tokenizers,
+                             initargs=(language, mwes)) as pool:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(_tokenize_chunk, ((path, chunk, words),)))
+            if len(pending) >= workers * prefetch:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+
+def _written_words(source, document):
+    """
+        Words of each sentence of a document, read from its source by their spans, with
+        double quotes as written (word_tokenize writes them as `` or '')
+    """
+    words = [source[first:last].decode("utf-8") for first, last in document.words.tolist()]
+    words = ['"' if word in ("``", "''") else word for word in words]
+    bounds = document.bounds.tolist()
+    return [words[first:last] for first, last in zip(bounds, bounds[1:])]
+
+
+def benchmark(path, workers_list=(1, 2, 4, 8)):
+    """
+        Compares the throughput (documents/sec) of tokenize_documents against
+        sent_tokenize and word_tokenize called on each line of a file
+    """
+    with open(path, "rb") as file:
+        lines = file.read().split(b"\n")
+    if lines and not lines[-1]:
+        lines.pop()
+    start = time.perf_counter()
+    expected = [[word_tokenize(sent) for sent in sent_tokenize(line.decode("utf-8"))]
+                for line in lines]
+    elapsed = time.perf_counter() - start
+    print(f"Serial loop: {len(lines) / elapsed:.1f} documents/sec")
+    expected = [[['"' if word in ("``", "''") else word for word in sent] for sent in document]
+                for document in expected]
+
+    with open(path, "rb") as file, \
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as source:
+        for workers in workers_list:
+            start = time.perf_counter()
+            documents = list(tokenize_documents(path, workers=workers))
+            elapsed = time.perf_counter() - start
+            tokens = [_written_words(source, document) for document in documents]
+            print(f"tokenize_documents with {workers} workers: " +
+                  f"{len(documents) / elapsed:.1f} documents/sec; same words = {tokens == expected}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--benchmark"]:
+        benchmark(sys.argv[2])
+        sys.exit()
+    if len(sys.argv) > 1 and sys.argv[1] != "-":
+        input_source = sys.argv[1]
+    else:
+        input_source = None
+    for spans in tokenize_documents(input_source):
+        print(f"{spans.start}-{spans.end}: " + " ".join(
+            f"{first}:{last}" for first, last in spans.words.tolist()))
@@ -0,0 +1,31 @@
+"""
+    Feature detectors of the classifier chunkers, in a module of their own so saved
+    models can import them without running the chunking script
+"""
+# pylint: disable=C0103
+
+
+def prev_next_pos_iob(tokens, index, history):
+    """
+        Feature detector function for the classifier
+    """
+    word, pos = tokens[index]
+    if index == 0:
+        prevword, prevpos, previob = ('<START>',) * 3
+    else:
+        prevword, prevpos = tokens[index - 1]
+        previob = history[index - 1]
+    if index == len(tokens) - 1:
+        nextword, nextpos = ('<END>',) * 2
+    else:
+        nextword, nextpos = tokens[index + 1]
+    feats = {
+        'word': word,
+        'pos': pos,
+        'nextword': nextword,
+        'nextpos': nextpos,
+        'prevword': prevword,
+        'prevpos': prevpos,
+        'previob': previob
+    }
+    return feats
@@ -0,0 +1,316 @@
+"""
+    Chunk transformation engine: the default chain of transform_chunk run over tag
+    class bitmasks, one chunk at a time in a single pass, or for a whole batch of
+    chunks at once over flat arrays
+"""
+# pylint: disable=C0103
+
+import numpy as np
+
+# Tag classes the transformations of the chain test
+INSIGNIFICANT = 1   # Ends with one of the tag suffixes of filter_insignificant
+VERB_PIVOT = 2      # Pivot of swap_verb_phrase: VB* with more than 2 letters, but VBG
+PREPOSITION = 4     # IN, the pivot of swap_infinitive_phrase unless the word is "like"
+NOUN = 8            # NN*
+PLURAL_NOUN = 16    # NNS, singularized when another noun follows
+
+# Word swap_infinitive_phrase does not pivot on
+LIKE = "like"
+
+
+def tag_class(tag, tag_suffixes=("DT", "CC")):
+    """
+        Bitmask of the tag classes of a tag
+    """
+    bits = 0
+    if any(tag.endswith(suffix) for suffix in tag_suffixes):
+        bits |= INSIGNIFICANT
+    if tag != "VBG" and tag.startswith("VB") and len(tag) > 2:
+        bits |= VERB_PIVOT
+    if tag == "IN":
+        bits |= PREPOSITION
+    if tag.startswith("NN"):
+        bits |= NOUN
+    if tag == "NNS":
+        bits |= PLURAL_NOUN
+    return bits
+
+
+def _segments(offsets):
+    """
+        Segment and position in its segment of every element of CSR arrays
+    """
+    lengths = np.diff(offsets)
+    segment = np.repeat(np.arange(len(lengths)), lengths)
+    return segment, np.arange(offsets[-1]) - offsets[:-1][segment], lengths
+
+
+def _first(mask, segment, count):
+    """
+        Flat index of the first element of each segment where mask holds, -1 if none
+    """
+    found = np.flatnonzero(mask)
+    firsts = np.full(count, -1, dtype=np.int64)
+    if len(found):
+        segments = segment[found]
+        starts = np.r_[True, segments[1:] != segments[:-1]]
+        firsts[segments[starts]] = found[starts]
+    return firsts
+
+
+def _last(mask, segment, count):
+    """
+        Flat index of the last element of each segment where mask holds, -1 if none
+    """
+    found = np.flatnonzero(mask)
+    lasts = np.full(count, -1, dtype=np.int64)
+    if len(found):
+        segments = segment[found]
+        ends = np.r_[segments[1:] != segments[:-1], True]
+        lasts[segments[ends]] = found[ends]
+    return lasts
+
+
+class ChunkTransformer(object):
+    """
+        Same output as transform_chunk with its default chain (filter_insignificant,
+        swap_verb_phrase, swap_infinitive_phrase, singularize_plural_noun).
+
+        Each tag is classified once into a bitmask, and a chunk becomes the bitmasks of
+        its tokens. The chain only reorders and drops tokens, and may singularize one
+        plural noun, so it is computed as the order of the input tokens in the output:
+        a step whose class is missing from the whole chunk (the or of its bitmasks) is
+        skipped, and the tuples are only built once, at the end. Batches run every step
+        for all their chunks at once over flat arrays of bitmasks.
+    """
+
+    def __init__(self, tag_suffixes=("DT", "CC")):
+        self.tag_suffixes = tuple(tag_suffixes)
+        self.labels = []
+        self.ids = {}
+        self._bits = {}
+        self._label_bits = np.zeros(0, dtype=np.uint8)
+
+    def tag_bits(self, tag):
+        """
+            Bitmask of a tag, computed once
+        """
+        bits = self._bits.get(tag)
+        if bits is None:
+            bits = self._bits[tag] = tag_class(tag, self.tag_suffixes)
+        return bits
+
+    def encode(self, tags):
+        """
+            Ids of a flat list of tags, interning the new ones
+        """
+        for tag in set(tags).difference(self.ids):
+            self.ids[tag] = len(self.labels)
+            self.labels.append(tag)
+        if len(self._label_bits) < len(self.labels):
+            self._label_bits = np.array([self.tag_bits(tag) for tag in self.labels],
+                                        dtype=np.uint8)
+        return np.fromiter(map(self.ids.__getitem__, tags), dtype=np.int32, count=len(tags))
+
+    def label_bits(self, labels):
+        """
+            Bitmask of each tag of a list of labels, as an array indexed by tag id
+        """
+        return np.array([self.tag_bits(tag) for tag in labels], dtype=np.uint8).reshape(-1)
+
+    def transform(self, chunk):
+        """
+            Transformed chunk of (word, tag) tuples, in one pass over its bitmasks
+        """
+        chunk = list(chunk)
+        try:
+            bits = [self._bits[tag] for _, tag in chunk]
+        except KeyError:
+            bits = [self.tag_bits(tag) for _, tag in chunk]
+        present = 0
+        for token_bits in bits:
+            present |= token_bits
+
+        # filter_insignificant
+        if present & INSIGNIFICANT:
+            order = [i for i, token_bits in enumerate(bits) if not token_bits & INSIGNIFICANT]
+        else:
+            order = list(range(len(chunk)))
+
+        # swap_verb_phrase
+        if present & VERB_PIVOT:
+            for k, i in enumerate(order):
+                if bits[i] & VERB_PIVOT:
+                    order = order[k + 1:] + order[:k]
+                    break
+
+        # swap_infinitive_phrase
+        if present & PREPOSITION:
+            for k, i in enumerate(order):
+                if bits[i] & PREPOSITION and chunk[i][0] != LIKE:
+                    n = k
+                    while n >= 0 and not bits[order[n]] & NOUN:
+                        n -= 1
+                    n = max(n, 0)
+                    order = order[:n] + order[k + 1:] + order[n:k]
+                    break
+
+        transformed = [chunk[i] for i in order]
+
+        # singularize_plural_noun
+        if present & PLURAL_NOUN:
+            for k, i in enumerate(order):
+                if bits[i] & PLURAL_NOUN:
+                    if k + 1 < len(order) and bits[order[k + 1]] & NOUN:
+                        word, tag = chunk[i]
+                        transformed[k] = (word.rstrip("s"), tag.rstrip("S"))
+                    break
+        return transformed
+
+    def transform_arrays(self, bits, offsets):
+        """
+            Chain over a batch of chunks given as CSR arrays: the bitmask of every token,
+            with the PREPOSITION bit cleared for the word "like", and the offsets of the
+            chunks. Returns (order, offsets, singular): the input index of every output
+            token, the offsets of the output chunks, and whether each output token is
+            the singularized noun
+        """
+        bits = np.asarray(bits)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        count = len(offsets) - 1
+
+        # filter_insignificant
+        order = np.flatnonzero(~bits & INSIGNIFICANT)
+        segment, _, _ = _segments(offsets)
+        offsets = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(segment[order], minlength=count), out=offsets[1:])
+
+        # swap_verb_phrase: [v + 1:] + [:v]
+        segment, _, lengths = _segments(offsets)
+        pivots = _first(bits[order] & VERB_PIVOT, segment, count)
+        pivots = np.where(pivots >= 0, pivots - offsets[:-1], -1)
+        order, offsets = self._rotate(order, offsets, pivots, np.zeros(count, dtype=np.int64),
+                                      lengths)
+
+        # swap_infinitive_phrase: [:n] + [p + 1:] + [n:p], n the last noun up to p, or 0
+        segment, local, lengths = _segments(offsets)
+        pivots = _first(bits[order] & PREPOSITION, segment, count)
+        pivots = np.where(pivots >= 0, pivots - offsets[:-1], -1)
+        before = (local <= pivots[segment]) & (bits[order] & NOUN > 0)
+        nouns = _last(before, segment, count)
+        nouns = np.where(nouns >= 0, nouns - offsets[:-1], 0)
+        order, offsets = self._rotate(order, offsets, pivots, nouns, lengths)
+
+        # singularize_plural_noun, when a noun follows the first plural noun
+        segment, _, _ = _segments(offsets)
+        plurals = _first(bits[order] & PLURAL_NOUN, segment, count)
+        valid = (plurals >= 0) & (plurals + 1 < offsets[1:])
+        valid[valid] = bits[order[plurals[valid] + 1]] & NOUN > 0
+        singular = np.zeros(len(order), dtype=bool)
+        singular[plurals[valid]] = True
+        return order, offsets, singular
+
+    @staticmethod
+    def _rotate(order, offsets, pivots, heads, lengths):
+        """
+            order[:head] + order[pivot + 1:] + order[head:pivot] for each segment with a
+            pivot, in local positions; segments without one (-1) are kept
+        """
+        has = pivots >= 0
+        new_lengths = lengths - has
+        new_offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(new_lengths, out=new_offsets[1:])
+        segment, local, _ = _segments(new_offsets)
+        pivot, head = pivots[segment], heads[segment]
+        tail = (lengths - pivots - 1)[segment]
+        source = np.where(local < head, local,
+                          np.where(local < head + tail, pivot + 1 + local - head,
+                                   local - tail))
+        source = np.where(has[segment], source, local)
+        return order[offsets[:-1][segment] + source], new_offsets
+
+    def chunk_bits(self, chunks):
+        """
+            CSR arrays of a batch of chunks of (word, tag) tuples, for transform_arrays
+        """
+        chunks = [list(chunk) for chunk in chunks]
+        tags = [tag for chunk in chunks for _, tag in chunk]
+        ids = self.encode(tags)
+        bits = self._label_bits[ids]
+        like = np.fromiter((word == LIKE for chunk in chunks for word, _ in chunk),
+                           dtype=bool, count=len(tags))
+        bits[like] &= ~np.uint8(PREPOSITION)
+        offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+        np.cumsum([len(chunk) for chunk in chunks], out=offsets[1:])
+        return chunks, bits, offsets
+
+    def transform_batch(self, chunks):
+        """
+            Transformed chunks of a batch, all chain steps running once for the batch
+        """
+        chunks, bits, offsets = self.chunk_bits(chunks)
+        tokens = [token for chunk in chunks for token in chunk]
+        order, offsets, singular = self.transform_arrays(bits, offsets)
+        transformed = [tokens[i] for i in order.tolist()]
+        for k in np.flatnonzero(singular).tolist():
+            word, tag = transformed[k]
+            transformed[k] = (word.rstrip("s"), tag.rstrip("S"))
+        bounds = offsets.tolist()
+        return [transformed[first:last] for first, last in zip(bounds, bounds[1:])]
+
+    def transform_columns(self, columns):
+        """
+            Chain over every sentence of a ColumnarSentences, read as one chunk each,
+            from its tag ids. Returns the arrays of transform_arrays
+        """
+        bits = self.label_bits(columns.tag_labels)[columns.tags]
+        # Only the words of IN tokens are read
+        like = LIKE if isinstance(columns.source, str) else LIKE.encode("utf-8")
+        for i in np.flatnonzero(bits & PREPOSITION).tolist():
+            if columns.source[columns.starts[i]:columns.ends[i]] == like:
+                bits[i] &= ~np.uint8(PREPOSITION)
+        return self.transform_arrays(bits, columns.bounds)
+
+
+def benchmark(count=1000000, seed=0):
+    """
+        Compares transform_chunk, ChunkTransformer.transform and the array chain on count
+        random chunks of common chunk tags
+    """
+    import time  # pylint: disable = C0415
+    from transforming import transform_chunk  # pylint: disable = C0415
+
+    random = np.random.default_rng(seed)
+    tags = ["DT", "JJ", "NN", "NNS", "NNP", "VB", "VBD", "VBG", "VBZ", "VBP", "IN", "CC",
+            "PDT", "CD", "RB", "TO", "MD", "PRP"]
+    words = ["the", "like", "books", "of", "cat", "runs", "in", "and", "two", "go"]
+    lengths = random.integers(0, 9, count)
+    tag_ids = random.integers(0, len(tags), int(lengths.sum()))
+    word_ids = random.integers(0, len(words), int(lengths.sum()))
+    bounds = np.r_[0, np.cumsum(lengths)].tolist()
+    flat = [(words[w], tags[t]) for w, t in zip(word_ids.tolist(), tag_ids.tolist())]
+    chunks = [flat[first:last] for first, last in zip(bounds, bounds[1:])]
+
+    transformer = ChunkTransformer()
+    start = time.perf_counter()
+    expected = [transform_chunk(chunk) for chunk in chunks]
+    reference_time = time.perf_counter() - start
+    start = time.perf_counter()
+    single = [transformer.transform(chunk) for chunk in chunks]
+    single_time = time.perf_counter() - start
+    start = time.perf_counter()
+    batched = transformer.transform_batch(chunks)
+    batch_time = time.perf_counter() - start
+
+    _, bits, offsets = transformer.chunk_bits(chunks)
+    start = time.perf_counter()
+    transformer.transform_arrays(bits, offsets)
+    arrays_time = time.perf_counter() - start
+
+    print(f"{count} chunks: transform_chunk {reference_time:.2f}s; transform " +
+          f"{single_time:.2f}s; transform_batch {batch_time:.2f}s; transform_arrays " +
+          f"{arrays_time:.2f}s; same output = {expected == single == batched}")
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -11,11 +11,18 @@ from nltk.chunk import RegexpParser, ChunkParserI
 from nltk.chunk.util import conlltags2tree, tree2conlltags
 from nltk.tag import BigramTagger, UnigramTagger, ClassifierBasedTagger
 from samples import quote_1
+from chunk_features import prev_next_pos_iob
+from columnar import ColumnarSentences
+from compiled_chunker import CompiledRegexpParser
+from evaluation import IOBTestSet, evaluate, evaluate_models
+from encoded_chunker import EncodedClassifierChunker
+from incremental_tagging import IncrementalUnigramTagger, IncrementalBigramTagger, update_backoffs
+from indexed_brill import IndexedBrillTagger
 
 # Samples and loadings
 
 with open("pickles/pos-taggers/brill_tagger.pickle", "rb") as file:
-    pos_tagger = pickle.load(file)
+    pos_tagger = IndexedBrillTagger(pickle.load(file))
 
 tagged_1 = pos_tagger.tag(word_tokenize(quote_1))
 
@@ -61,8 +68,21 @@ PP:
 VP:
     {<MD>?<VB.*>}
 ''')
-score = chunker.evaluate(conll2000.chunked_sents())
+
+# Same grammar compiled, chunking the sentences in batches. Both are scored in parallel
+# on the IOB tags of conll2000, prepared once
+compiled_chunker = CompiledRegexpParser(chunker)
+conll_all = IOBTestSet(conll2000.chunked_sents())
+score, compiled_score = evaluate_models([chunker, compiled_chunker], conll_all)
 print(f"Accuracy of regex chunker: {score.accuracy()}")
+print(f"Accuracy of compiled regex chunker: {compiled_score.accuracy()}")
+
+# Same stages over columns: the words are offsets into the quote, and the tagger and the
+# chunker write tag and IOB ids in place
+columns = ColumnarSentences.from_text(quote_1)
+columns.tag(pos_tagger)
+columns.chunk(compiled_chunker)
+print(f"Columnar chunks: {columns.trees()}")
 
 # Tagger-based chunker
 
@@ -103,10 +123,29 @@ class TagChunker(ChunkParserI):  # pylint: disable = W0223
         """
         if not tokens:
             return None
+        return conlltags2tree(self.parse_iob(tokens))
+
+    def parse_iob(self, tokens):
+        """
+            (word, pos, iob) triples of a sentence, without building its tree
+        """
+        if not tokens:
+            return []
         (words, tags) = zip(*tokens)
         gen_chunks = self.tagger.tag(tags)
-        wtc = zip(words, gen_chunks)
-        return conlltags2tree([(w, t, c) for (w, (t, c)) in wtc])
+        return [(w, t, c) for (w, (t, c)) in zip(words, gen_chunks)]
+
+    def iob_tag_sents(self, tag_sents):
+        """
+            IOB tags of a batch of tag sequences, without the words
+        """
+        return [[c for (t, c) in self.tagger.tag(tags)] if tags else [] for tags in tag_sents]
+
+    def update(self, chunk_sents):
+        """
+            Adds chunked sentences to the incremental taggers of the chain
+        """
+        update_backoffs(self.tagger, conll_tag_chunks(chunk_sents))
 
 
 # Separating data and getting chunker accuracy
@@ -115,10 +154,14 @@ test_ck = treebank_chunk.chunked_sents()[3000:]
 train_conll = conll2000.chunked_sents("train.txt")
 test_conll = conll2000.chunked_sents("test.txt")
 
+# Test sets prepared once, and scored on flat IOB tags
+treebank_test = IOBTestSet(test_ck)
+conll_test = IOBTestSet(test_conll)
+
 
 # With unigram and bigram taggers
 chunker = TagChunker(train_ck)
-score = chunker.evaluate(test_ck)
+score = evaluate(chunker, treebank_test)
 print(f"Accuracy of tag chunker on treebank: {score.accuracy()}")
 
 # Saving pickle
@@ -126,13 +169,20 @@ with open('pickles/chunkers/tag_chunker_treebank.pickle', 'wb') as file:
     pickle.dump(chunker, file)
 
 chunker = TagChunker(train_conll)
-score = chunker.evaluate(test_conll)
+score = evaluate(chunker, conll_test)
 print(f"Accuracy of tag chunker on conll2000: {score.accuracy()}")
 
 # Saving pickle
 with open('pickles/chunkers/tag_chunker_conll2000.pickle', 'wb') as file:
     pickle.dump(chunker, file)
 
+# Incremental tag chunker: trained on part of conll2000, then updated with the rest of it
+inc_chunker = TagChunker(train_conll[:4000],
+                         tagger_classes=[IncrementalUnigramTagger, IncrementalBigramTagger])
+inc_chunker.update(train_conll[4000:])
+score = evaluate(inc_chunker, conll_test)
+print(f"Accuracy of incremental tag chunker on conll2000: {score.accuracy()}")
+
 # Classification-based chunking
 
 
@@ -144,32 +194,6 @@ def chunk_trees2train_chunks(chunk_sents):
     return [[((w, t), c) for (w, t, c) in sent] for sent in tag_sents]
 
 
-def prev_next_pos_iob(tokens, index, history):
-    """
-        Feature detector function for the classifier
-    """
-    word, pos = tokens[index]
-    if index == 0:
-        prevword, prevpos, previob = ('<START>',) * 3
-    else:
-        prevword, prevpos = tokens[index - 1]
-        previob = history[index - 1]
-    if index == len(tokens) - 1:
-        nextword, nextpos = ('<END>',) * 2
-    else:
-        nextword, nextpos = tokens[index + 1]
-    feats = {
-        'word': word,
-        'pos': pos,
-        'nextword': nextword,
-        'nextpos': nextpos,
-        'prevword': prevword,
-        'prevpos': prevpos,
-        'previob': previob
-    }
-    return feats
-
-
 class ClassifierChunker(ChunkParserI):  # pylint: disable = W0223
     """
         Classifier-based chunker class implementation
@@ -186,13 +210,19 @@ class ClassifierChunker(ChunkParserI):  # pylint: disable = W0223
         """
         if not tokens:
             return None
+        return conlltags2tree(self.parse_iob(tokens))
+
+    def parse_iob(self, tokens):
+        """
+            (word, pos, iob) triples of a sentence, without building its tree
+        """
         chunked = self.tagger.tag(tokens)
-        return conlltags2tree([(w, t, c) for ((w, t), c) in chunked])
+        return [(w, t, c) for ((w, t), c) in chunked]
 
 
 # Testing accuracy with treebank
 cl_chunker = ClassifierChunker(train_ck, prev_next_pos_iob)
-score = cl_chunker.evaluate(test_ck)
+score = evaluate(cl_chunker, treebank_test)
 print(f"Accuracy of classifier chunker on treebank: {score.accuracy()}")
 
 # Saving pickle
@@ -201,9 +231,15 @@ with open('pickles/chunkers/classifier_chunker_treebank.pickle', 'wb') as file:
 
 # Testing accuracy with conll2000
 cl_chunker = ClassifierChunker(train_conll, prev_next_pos_iob)
-score = cl_chunker.evaluate(test_conll)
+score = evaluate(cl_chunker, conll_test)
 print(f"Accuracy of classifier chunker on conll2000: {score.accuracy()}")
 
 # Saving pickle
 with open('pickles/chunkers/classifier_chunker_conll2000.pickle', 'wb') as file:
     pickle.dump(cl_chunker, file)
+
+# Same classifier chunker over interned feature columns: trains from one sparse matrix and
+# only follows the previob of each token while tagging
+enc_chunker = EncodedClassifierChunker(train_conll)
+score = evaluate(enc_chunker, conll_test)
+print(f"Accuracy of encoded classifier chunker on conll2000: {score.accuracy()}")
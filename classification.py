@@ -4,13 +4,18 @@
 # pylint: disable=C0103
 
 import collections
-from nltk.corpus import stopwords, movie_reviews
+import time
+import zlib
+from nltk.corpus import movie_reviews
 from nltk.tokenize import word_tokenize
 from nltk.collocations import BigramCollocationFinder
 from nltk.metrics import BigramAssocMeasures
 from nltk.classify import NaiveBayesClassifier
 from nltk.classify.util import accuracy
 from samples import quote_8
+from normalization import stopword_set
+from association_scoring import nbest
+from vectorized_nb import VectorizedNaiveBayes, batches
 
 # Bag of words - word presence feature set from all the words of an instance
 
@@ -26,7 +31,7 @@ def bag_of_non_stopwords(sentence, language='english'):
     """
         Creates and returns a bag of words without the stop words of the language
     """
-    return bag_of_words(set(sentence) - set(stopwords.words(language)))
+    return bag_of_words(set(sentence) - stopword_set(language))
 
 
 def bag_of_bigrams_words(words, score_fn=BigramAssocMeasures.chi_sq, n=200):
@@ -34,7 +39,7 @@ def bag_of_bigrams_words(words, score_fn=BigramAssocMeasures.chi_sq, n=200):
         Creates a bag of words with the 200 most common bigrams.
     """
     bigram_finder = BigramCollocationFinder.from_words(words)
-    bigrams = bigram_finder.nbest(score_fn, n)
+    bigrams = nbest(bigram_finder, score_fn, n)
     return bag_of_words(words + bigrams)
 
 
@@ -80,6 +85,38 @@ def split_label_feats(lfeats, split=0.75):
     return train_feats, test_feats
 
 
+# Streaming versions: featuresets are built lazily and never held in memory together
+
+
+def in_train_split(fileid, split=0.75):
+    """
+        Deterministic train/test assignment of a file, from a hash of its id
+    """
+    return zlib.crc32(fileid.encode("utf-8")) < split * 2 ** 32
+
+
+def stream_label_feats(corp, feature_detector=bag_of_words, split=0.75, train=True):
+    """
+        Lazily yields (featureset, label) for the train (or test) files of the corpus
+    """
+    for label in corp.categories():
+        for fileid in corp.fileids(categories=[label]):
+            if in_train_split(fileid, split) == train:
+                yield feature_detector(corp.words(fileids=[fileid])), label
+
+
+def stream_accuracy(classifier, labeled_featuresets, batch_size=500):
+    """
+        Accuracy over a stream of (featureset, label), classified batch by batch
+    """
+    correct = total = 0
+    for batch in batches(labeled_featuresets, batch_size):
+        guesses = classifier.classify_many([featureset for featureset, _ in batch])
+        correct += sum(guess == label for guess, (_, label) in zip(guesses, batch))
+        total += len(batch)
+    return correct / total if total else 0
+
+
 # Getting corpus, showing label and features, splitting data
 print(f"Categories of the corpus: {movie_reviews.categories()}\n")
 
@@ -103,3 +140,23 @@ print(f"Accuracy of Naive Bayes: {acc}\n")
 probs = nb_classifier.prob_classify(test_data[1][0])
 print(f"Probability of 1st sample: {probs.max()}, with pos={probs.prob('pos'):.3} and " +
       f"neg={probs.prob('neg'):.3}; REAL RESULT = {test_data[1][1]}\n")
+
+# Vectorized Naive Bayes - same model, trained and scored with sparse matrix operations
+start = time.perf_counter()
+nb_classifier = NaiveBayesClassifier.train(train_data)
+acc = accuracy(nb_classifier, test_data)
+nltk_time = time.perf_counter() - start
+
+start = time.perf_counter()
+vnb_classifier = VectorizedNaiveBayes.train(train_data)
+vnb_acc = accuracy(vnb_classifier, test_data)
+vnb_time = time.perf_counter() - start
+
+vnb_classifier.show_most_informative_features(n=10)
+print(f"Accuracy of vectorized Naive Bayes: {vnb_acc} (nltk: {acc}); train + test took " +
+      f"{vnb_time:.2f}s against {nltk_time:.2f}s\n")
+
+# Streaming pipeline - bounded memory, whatever the size of the corpus
+stream_classifier = VectorizedNaiveBayes.train(stream_label_feats(movie_reviews), batch_size=500)
+stream_acc = stream_accuracy(stream_classifier, stream_label_feats(movie_reviews, train=False))
+print(f"Accuracy of the streamed Naive Bayes: {stream_acc}\n")
@@ -0,0 +1,267 @@
+"""
+    Columnar sentences: the words of a batch of sentences as offsets into one source
+    buffer, with their tag and IOB tag ids in flat arrays that tagging and chunking
+    stages fill in place
+"""
+# pylint: disable=C0103
+
+import numpy as np
+from nltk.chunk.util import conlltags2tree, tree2conlltags
+
+# Id of a tag or IOB tag no stage has written yet
+UNSET = -1
+
+# Offsets are int32 unless the source is larger than that
+MAX_INT32 = np.iinfo(np.int32).max
+
+
+def _offsets_dtype(size):
+    """
+        Smallest offset type for a source of size characters or bytes
+    """
+    return np.int32 if size <= MAX_INT32 else np.int64
+
+
+class ColumnarSentences(object):
+    """
+        Sentences as columns: a source buffer (a string, or UTF-8 bytes or a mapped file)
+        with the start and end offsets of every word in it, the bounds of each sentence
+        (the words of sentence i are bounds[i]:bounds[i + 1]), and the tag and IOB ids of
+        every word, UNSET until a stage writes them. Tags and IOB tags are interned in
+        tag_labels and iob_labels as they show up.
+
+        Stages read words and tags by sentence and write the ids of their output into the
+        arrays; (word, tag) tuples and trees are only built by the adapters
+    """
+
+    def __init__(self, source, starts, ends, bounds):
+        dtype = _offsets_dtype(len(source))
+        self.source = source
+        self.starts = np.asarray(starts, dtype=dtype)
+        self.ends = np.asarray(ends, dtype=dtype)
+        self.bounds = np.asarray(bounds, dtype=np.int64)
+        self.tags = np.full(len(self.starts), UNSET, dtype=np.int32)
+        self.iobs = np.full(len(self.starts), UNSET, dtype=np.int32)
+        self.tag_labels, self.tag_ids = [], {}
+        self.iob_labels, self.iob_ids = [], {}
+        self._decode = not isinstance(source, str)
+
+    @classmethod
+    def from_words(cls, word_sents):
+        """
+            Sentences of words, joined by spaces into the source
+        """
+        words = [word for sent in word_sents for word in sent]
+        bounds = np.zeros(1, dtype=np.int64)
+        bounds = np.concatenate((bounds, np.cumsum([len(sent) for sent in word_sents])))
+        lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+        starts = np.cumsum(lengths + 1) - lengths - 1
+        return cls(" ".join(words), starts, starts + lengths, bounds)
+
+    @classmethod
+    def from_tagged(cls, tagged_sents):
+        """
+            Sentences of (word, tag) tuples
+        """
+        tagged_sents = [list(sent) for sent in tagged_sents]
+        columns = cls.from_words([[word for word, _ in sent] for sent in tagged_sents])
+        columns.set_tags([[tag for _, tag in sent] for sent in tagged_sents])
+        return columns
+
+    @classmethod
+    def from_iob(cls, iob_sents):
+        """
+            Sentences of (word, tag, iob) triples
+        """
+        iob_sents = [list(sent) for sent in iob_sents]
+        columns = cls.from_tagged([[(word, tag) for word, tag, _ in sent] for sent in iob_sents])
+        columns.set_iobs([[iob for _, _, iob in sent] for sent in iob_sents])
+        return columns
+
+    @classmethod
+    def from_trees(cls, trees):
+        """
+            Chunk trees, read as tree2conlltags reads them
+        """
+        return cls.from_iob(tree2conlltags(tree) for tree in trees)
+
+    @classmethod
+    def from_text(cls, text, words="word", language="english"):
+        """
+            Sentences and words of a text as batch_tokenization splits it, with the text
+            itself as the source
+        """
+        from batch_tokenization import document_spans, load_tokenizers  # pylint: disable = C0415
+        load_tokenizers(language)
+        _, spans, bounds = document_spans(text, words)
+        return cls(text, spans[:, 0], spans[:, 1], bounds)
+
+    @classmethod
+    def from_document(cls, source, document):
+        """
+            Sentences and words of a DocumentSpans of tokenize_documents, over its source
+            (the bytes or the mapped file the byte spans point into)
+        """
+        return cls(source, document.words[:, 0], document.words[:, 1], document.bounds)
+
+    def __len__(self):
+        return len(self.bounds) - 1
+
+    @staticmethod
+    def _encode(labels, ids, values):
+        """
+            Ids of a flat list of values, interning the new ones
+        """
+        for value in set(values).difference(ids):
+            ids[value] = len(labels)
+            labels.append(value)
+        return np.fromiter(map(ids.__getitem__, values), dtype=np.int32, count=len(values))
+
+    def _flat(self, sents):
+        """
+            Flat list of per-word values of every sentence, checked against the words
+        """
+        values = [value for sent in sents for value in sent]
+        if len(values) != len(self.starts):
+            raise ValueError("Lists must have the same length.")
+        return values
+
+    def set_tags(self, tag_sents):
+        """
+            Writes the tags of every sentence
+        """
+        self.tags[:] = self._encode(self.tag_labels, self.tag_ids, self._flat(tag_sents))
+
+    def set_iobs(self, iob_sents):
+        """
+            Writes the IOB tags of every sentence
+        """
+        self.iobs[:] = self._encode(self.iob_labels, self.iob_ids, self._flat(iob_sents))
+
+    def words(self, index):
+        """
+            Words of a sentence, read from the source
+        """
+        first, last = self.bounds[index], self.bounds[index + 1]
+        source = self.source
+        pairs = zip(self.starts[first:last].tolist(), self.ends[first:last].tolist())
+        if self._decode:
+            return [bytes(source[start:end]).decode("utf-8") for start, end in pairs]
+        return [source[start:end] for start, end in pairs]
+
+    def word_sents(self):
+        """
+            Words of every sentence
+        """
+        return [self.words(index) for index in range(len(self))]
+
+    def _labels(self, labels, ids, index):
+        """
+            Labels of the ids of a sentence, None where unset
+        """
+        first, last = self.bounds[index], self.bounds[index + 1]
+        return [labels[i] if i != UNSET else None for i in ids[first:last].tolist()]
+
+    def tag_sents(self):
+        """
+            Tags of every sentence
+        """
+        return [self._labels(self.tag_labels, self.tags, index) for index in range(len(self))]
+
+    def iob_sents(self):
+        """
+            IOB tags of every sentence
+        """
+        return [self._labels(self.iob_labels, self.iobs, index) for index in range(len(self))]
+
+    def tag(self, tagger):
+        """
+            Tagging stage: writes the tags a tagger gives to the words of every sentence
+        """
+        tagged = tagger.tag_sents(self.word_sents())
+        self.set_tags([[tag for _, tag in sent] for sent in tagged])
+
+    def chunk(self, chunker):
+        """
+            Chunking stage: writes the IOB tags of a chunker. Chunkers with iob_tag_sents
+            (CompiledRegexpParser, TagChunker) only read the tags, others the tagged tuples
+        """
+        if hasattr(chunker, "iob_tag_sents"):
+            self.set_iobs(chunker.iob_tag_sents(self.tag_sents()))
+            return
+        iob_sents = []
+        for sent in self.tagged_sents():
+            if hasattr(chunker, "parse_iob"):
+                triples = chunker.parse_iob(sent) if sent else []
+            else:
+                triples = tree2conlltags(chunker.parse(sent)) if sent else []
+            iob_sents.append([iob for _, _, iob in triples])
+        self.set_iobs(iob_sents)
+
+    def tagged(self, index):
+        """
+            (word, tag) tuples of a sentence
+        """
+        return list(zip(self.words(index), self._labels(self.tag_labels, self.tags, index)))
+
+    def tagged_sents(self):
+        """
+            (word, tag) tuples of every sentence
+        """
+        return [self.tagged(index) for index in range(len(self))]
+
+    def iob_triples(self, index):
+        """
+            (word, tag, iob) triples of a sentence
+        """
+        return list(zip(self.words(index), self._labels(self.tag_labels, self.tags, index),
+                        self._labels(self.iob_labels, self.iobs, index)))
+
+    def tree(self, index):
+        """
+            Chunk tree of a sentence, as conlltags2tree builds it
+        """
+        return conlltags2tree(self.iob_triples(index))
+
+    def trees(self):
+        """
+            Chunk trees of every sentence
+        """
+        return [self.tree(index) for index in range(len(self))]
+
+
+if __name__ == "__main__":
+    import time
+    import tracemalloc
+    from nltk.chunk import RegexpParser
+    from nltk.corpus import treebank_chunk
+    from compiled_chunker import CompiledRegexpParser
+
+    chunker = CompiledRegexpParser(RegexpParser(r"""
+    NP:
+        {<DT>?<JJ>*<NN.*>+}
+    VP:
+        {<MD>?<VB.*>}
+    """))
+    tagged_sents = [tree.leaves() for tree in treebank_chunk.chunked_sents()]
+
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    expected = [chunker.parse_iob(sent) for sent in tagged_sents]
+    tuple_time = time.perf_counter() - start
+    tuple_peak = tracemalloc.get_traced_memory()[1] - baseline
+
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    columns = ColumnarSentences.from_tagged(tagged_sents)
+    columns.chunk(chunker)
+    columnar_time = time.perf_counter() - start
+    columnar_peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+
+    same = [columns.iob_triples(index) for index in range(len(columns))] == expected
+    print(f"Chunked {len(columns)} sentences: tuples {tuple_time:.3f}s, peak " +
+          f"{tuple_peak / 1e6:.1f}MB; columnar {columnar_time:.3f}s, peak " +
+          f"{columnar_peak / 1e6:.1f}MB; same IOB tags = {same}")
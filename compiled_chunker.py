@@ -0,0 +1,326 @@
+"""
+    Compiled RegexpParser: chunk grammars run over strings of one character per tag,
+    for whole batches of sentences at once, with IOB output
+"""
+# pylint: disable=C0103
+
+import re
+from nltk.tree import Tree
+from nltk.chunk import ChunkParserI, RegexpParser
+from nltk.chunk.util import ChunkScore
+from nltk.chunk.regexp import (ChunkRule, ChinkRule, UnChunkRule, MergeRule,
+                               SplitRule, ExpandLeftRule, ExpandRightRule, ChunkRuleWithContext,
+                               tag_pattern2re_pattern)
+
+# First character of the private use area: tags are encoded from there on
+FIRST_TAG = 0xE000
+
+# Sentences of a batch are joined by this character, which no tag class contains, so
+# patterns never match across sentences
+SEPARATOR = "\n"
+
+# ChunkString.IN_CHINK_PATTERN and IN_CHUNK_PATTERN, stopping at the end of the sentence
+IN_CHINK_PATTERN = r"(?=[^\}\n]*(\{|\n|$))"
+IN_CHUNK_PATTERN = r"(?=[^\{\n]*\})"
+
+BRACES = re.compile("[{}]")
+
+# Valid chunk string of a batch: unnested, balanced braces around non-empty chunks, none of
+# them across sentences (ChunkString._verify)
+VALID_CHUNKS = re.compile(r"(?:[^{}]*\{[^{}\n]+\})*[^{}]*")
+
+# Regular expression templates of the nltk rules (see nltk.chunk.regexp), filled with
+# their tag patterns
+RULE_TEMPLATES = {
+    ChunkRule: (("_pattern",), "(?P<chunk>%s)" + IN_CHINK_PATTERN),
+    ChinkRule: (("_pattern",), "(?P<chink>%s)" + IN_CHUNK_PATTERN),
+    UnChunkRule: (("_pattern",), r"\{(?P<chunk>%s)\}"),
+    MergeRule: (("_left_tag_pattern", "_right_tag_pattern"), "(?P<left>%s)}{(?=%s)"),
+    SplitRule: (("_left_tag_pattern", "_right_tag_pattern"), "(?P<left>%s)(?=%s)"),
+    ExpandLeftRule: (("_left_tag_pattern", "_right_tag_pattern"), r"(?P<left>%s)\{(?P<right>%s)"),
+    ExpandRightRule: (("_left_tag_pattern", "_right_tag_pattern"), r"(?P<left>%s)\}(?P<right>%s)"),
+    ChunkRuleWithContext: (("_left_context_tag_pattern", "_chunk_tag_pattern",
+                            "_right_context_tag_pattern"),
+                           "(?P<left>%s)(?P<chunk>%s)(?P<right>%s)" + IN_CHINK_PATTERN),
+}
+
+
+def _split_tag_pattern(tag_pattern):
+    """
+        Splits a tag pattern into its regex operators and its tags: '<DT>?<NN.*>+' gives
+        ['', 'DT', '?', 'NN[^\\{\\}<>]*', '+'], the odd items being regexes for one tag
+    """
+    tag_pattern = re.sub(r"\s", "", tag_pattern)
+    tag_pattern2re_pattern(tag_pattern)  # Raises ValueError for bad patterns, as nltk
+    parts = re.split(r"<([^<>]*)>", tag_pattern)
+    # Same replacement of '.' as nltk, done on one tag at a time
+    parts[1::2] = [tag_pattern2re_pattern(f"<{tag}>")[3:-3] for tag in parts[1::2]]
+    return parts
+
+
+class CompiledRegexpParser(ChunkParserI):
+    """
+        Chunker giving the same trees as a RegexpParser.
+
+        The chunk string of nltk, e.g. '{<DT><NN>}<VBD>', becomes one character per tag,
+        '{ab}c', and each <tag pattern> of a rule becomes a class of the characters of the
+        tags it matches, so the rules of each stage run over strings several times shorter.
+        Tags are given characters as they show up, updating the classes. The stages work on
+        spans of token positions, and trees or IOB tags are only built at the end.
+    """
+
+    def __init__(self, grammar, root_label="S", loop=1):
+        if not isinstance(grammar, RegexpParser):
+            grammar = RegexpParser(grammar, root_label=root_label, loop=loop)
+        self._loop = grammar._loop  # pylint: disable = W0212
+        self._stages = []
+        for stage in grammar._stages:  # pylint: disable = W0212
+            rules = []
+            for rule in stage.rules():
+                if type(rule) not in RULE_TEMPLATES:
+                    raise ValueError(f"Rule {rule!r} cannot be compiled")
+                attributes, template = RULE_TEMPLATES[type(rule)]
+                patterns = [_split_tag_pattern(getattr(rule, name)) for name in attributes]
+                rules.append((template, patterns, rule._repl))  # pylint: disable = W0212
+            self._stages.append((stage._chunk_label, rules))  # pylint: disable = W0212
+        # Root label of the trees, and of the tree of an empty sentence (see RegexpChunkParser)
+        stages = grammar._stages or [None]  # pylint: disable = W0212
+        self._root_label = getattr(stages[0], "_root_label", root_label)
+        self._empty_label = getattr(stages[-1], "_root_label", root_label)
+        self._chars = {}
+        self._compiled = None
+        # Chunk labels are the tags of the chunks in the next stages
+        for label, _ in self._stages:
+            self._encode(label)
+
+    def _encode(self, tag):
+        """
+            Character of a tag, giving a new one to tags not seen before
+        """
+        char = self._chars.get(tag)
+        if char is None:
+            char = self._chars[tag] = chr(FIRST_TAG + len(self._chars))
+            self._compiled = None
+        return char
+
+    def _compile(self):
+        """
+            Compiles the rules for the tags seen so far
+        """
+        def tag_class(regex):
+            chars = "".join(char for tag, char in self._chars.items() if re.fullmatch(regex, tag))
+            return f"([{chars}])" if chars else r"([^\s\S])"
+
+        self._compiled = []
+        for _, rules in self._stages:
+            compiled = []
+            for template, patterns, repl in rules:
+                regexes = []
+                for parts in patterns:
+                    parts = list(parts)
+                    parts[1::2] = [tag_class(regex) for regex in parts[1::2]]
+                    regexes.append("".join(parts))
+                # Multiline, so ^ and $ of the tag patterns anchor at the sentence
+                compiled.append((re.compile(template % tuple(regexes), re.MULTILINE), repl))
+            self._compiled.append(compiled)
+
+    def _structures(self, tag_sents):
+        """
+            Chunk structure of a batch of tag sequences: per sentence, a list of token
+            positions and (label, children) chunks
+        """
+        sents = [list(range(len(tags))) for tags in tag_sents]
+        for tag in {tag for tags in tag_sents for tag in tags}.difference(self._chars):
+            self._encode(tag)
+        if self._compiled is None:
+            self._compile()
+
+        chars = self._chars
+        for _ in range(self._loop):
+            for (label, _), rules in zip(self._stages, self._compiled):
+                string = SEPARATOR.join(
+                    "".join([chars[tags[item] if item.__class__ is int else item[0]] for item in items])
+                    for tags, items in zip(tag_sents, sents))
+                for regexp, repl in rules:
+                    string = regexp.sub(repl, string).replace("{}", "")
+                if not VALID_CHUNKS.fullmatch(string):
+                    self._invalid(string)
+
+                for index, (items, chunked) in enumerate(zip(sents, string.split(SEPARATOR))):
+                    pieces, position, in_chunk = [], 0, False
+                    for part in BRACES.split(chunked):
+                        length = len(part)
+                        if in_chunk:
+                            pieces.append((label, items[position:position + length]))
+                        else:
+                            pieces.extend(items[position:position + length])
+                        position += length
+                        in_chunk = not in_chunk
+                    sents[index] = pieces
+        return sents
+
+    def _invalid(self, string):
+        """
+            Raises the ValueError of nltk for the first invalid sentence of a chunk string,
+            spelled with tags as nltk prints chunk strings
+        """
+        tags = {char: f"<{tag}>" for tag, char in self._chars.items()}
+        for chunked in string.split(SEPARATOR):
+            if not VALID_CHUNKS.fullmatch(chunked):
+                break
+        chunked = "".join(tags.get(char, char) for char in chunked)
+        raise ValueError("Transformation generated invalid chunkstring:\n  %s" % chunked)
+
+    @staticmethod
+    def _tags(sent):
+        """
+            Tags of the pieces of a sentence: tagged tokens, or subtrees tagged by their label
+        """
+        return [piece.label() if isinstance(piece, Tree) else piece[1] for piece in sent]
+
+    def parse_sents(self, sents):
+        """
+            Chunk trees of a batch of tagged sentences (or chunk trees)
+        """
+        sents = [sent if isinstance(sent, Tree) else list(sent) for sent in sents]
+        structures = self._structures([self._tags(sent) for sent in sents])
+
+        def build(sent, item):
+            if item.__class__ is int:
+                return sent[item]
+            label, children = item
+            if all(child.__class__ is int for child in children):
+                return Tree(label, [sent[child] for child in children])
+            return Tree(label, [build(sent, child) for child in children])
+
+        trees = []
+        for sent, items in zip(sents, structures):
+            if not sent:
+                label = self._empty_label
+            else:
+                label = sent.label() if isinstance(sent, Tree) else self._root_label
+            trees.append(Tree(label, [build(sent, item) for item in items]))
+        return trees
+
+    def parse(self, tokens):
+        """
+            Chunk tree of a tagged sentence
+        """
+        return self.parse_sents([tokens])[0]
+
+    def iob_tag_sents(self, tag_sents):
+        """
+            IOB tags of a batch of tag sequences, as tree2conlltags gives them for the
+            chunk trees of sentences with those tags. Words are never read
+        """
+        iob_sents = []
+        for tags, items in zip(tag_sents, self._structures([list(tags) for tags in tag_sents])):
+            iob = ["O"] * len(tags)
+            for item in items:
+                if item.__class__ is not int and item[1]:
+                    label, children = item
+                    if any(child.__class__ is not int for child in children):
+                        raise ValueError("Tree is too deeply nested to be printed in CoNLL format")
+                    iob[children[0]] = "B-" + label
+                    for child in children[1:]:
+                        iob[child] = "I-" + label
+            iob_sents.append(iob)
+        return iob_sents
+
+    def parse_iob_sents(self, sents):
+        """
+            (word, tag, iob) triples of a batch of tagged sentences, as tree2conlltags of
+            their chunk trees
+        """
+        sents = [list(sent) for sent in sents]
+        iob_sents = self.iob_tag_sents([self._tags(sent) for sent in sents])
+        return [[(word, tag, chunk) for (word, tag), chunk in zip(sent, iob)]
+                for sent, iob in zip(sents, iob_sents)]
+
+    def parse_iob(self, tokens):
+        """
+            (word, tag, iob) triples of a tagged sentence
+        """
+        return self.parse_iob_sents([tokens])[0]
+
+    def evaluate(self, gold, batch_size=1000):
+        """
+            ChunkScore of the chunker on gold chunk trees, parsing them batch_size at a time
+        """
+        chunkscore = ChunkScore()
+        gold = list(gold)
+        for start in range(0, len(gold), batch_size):
+            batch = gold[start:start + batch_size]
+            for correct, guess in zip(batch, self.parse_sents([tree.leaves() for tree in batch])):
+                chunkscore.score(correct, guess)
+        return chunkscore
+
+
+if __name__ == "__main__":
+    import random
+    import time
+    from nltk.corpus import conll2000
+    from nltk.chunk.util import tree2conlltags
+
+    # NP/PP/VP grammar of chunking.py
+    grammar = r'''
+    NP:
+        {<DT>?<NN.*>+}
+        <JJ>{}<NN.*>
+    PP:
+        {<IN>}
+    VP:
+        {<MD>?<VB.*>}
+    '''
+    gold = conll2000.chunked_sents()
+    regexp_chunker = RegexpParser(grammar)
+    compiled_chunker = CompiledRegexpParser(grammar)
+
+    start = time.perf_counter()
+    score = regexp_chunker.evaluate(gold)
+    regexp_time = time.perf_counter() - start
+    start = time.perf_counter()
+    compiled_score = compiled_chunker.evaluate(gold)
+    compiled_time = time.perf_counter() - start
+    print(f"RegexpParser evaluate: {regexp_time:.2f}s; compiled: {compiled_time:.2f}s; " +
+          f"same accuracy = {score.accuracy() == compiled_score.accuracy()}")
+
+    sents = [tree.leaves() for tree in gold]
+    start = time.perf_counter()
+    expected = [tree2conlltags(regexp_chunker.parse(sent)) for sent in sents]
+    regexp_time = time.perf_counter() - start
+    start = time.perf_counter()
+    iob = compiled_chunker.parse_iob_sents(sents)
+    compiled_time = time.perf_counter() - start
+    print(f"IOB tags, RegexpParser + tree2conlltags: {regexp_time:.2f}s; compiled: " +
+          f"{compiled_time:.2f}s; same tags = {iob == expected}")
+
+    # Grammar with split rules of chunking.py, on random tag sequences: both parsers give
+    # the same trees, or both raise for invalid chunk strings
+    split_grammar = r"""
+    NP:
+        {<DT><.*>*<NN.*>}
+        <NN.*>}{<.*>
+        <.*>}{<DT>
+        <NN.*>{}<NN.*> """
+    regexp_chunker = RegexpParser(split_grammar)
+    compiled_chunker = CompiledRegexpParser(split_grammar)
+    random.seed(0)
+    tags = ["DT", "NN", "NNS", "JJ", "VBZ", "MD", "IN"]
+    sents = [[("a", "VBZ"), ("b", "NNS"), ("c", "MD"), ("d", "DT")]]
+    sents += [[(str(index), random.choice(tags)) for index in range(random.randint(1, 8))]
+              for _ in range(3000)]
+    same = raised = 0
+    for sent in sents:
+        try:
+            expected = str(regexp_chunker.parse(sent))
+        except ValueError as error:
+            expected = str(error)
+            raised += 1
+        try:
+            result = str(compiled_chunker.parse(sent))
+        except ValueError as error:
+            result = str(error)
+        same += expected == result
+    print(f"Split grammar: {same} of {len(sents)} sentences give the same trees or errors; " +
+          f"{raised} invalid chunk strings")
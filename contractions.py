@@ -3,6 +3,7 @@
 """
 # pylint: disable=C0103
 
+import functools
 import re
 from samples import sample_ct
 
@@ -20,28 +21,102 @@ replacement_patts = [
     (r'(\w+)\'d', r'\g<1> would')
 ]
 
+# Spans of text that can hold a contraction: runs of word characters and apostrophes
+contraction_spans = r"(?<![\w'])[\w']*'[\w']*"
+
 # Class implementation
 
 
-class RegexpReplacer(object):  # pylint: disable = R0903
+class RegexpReplacer(object):
     """
-        Implements a Replacer using regular expressions
+        Implements a Replacer using regular expressions.
+        The text is scanned once for the spans where a pattern can match, and each span is
+        rewritten by one re.sub pass per pattern, in the order given, so stacked
+        contractions chain through the patterns as they do over the whole text.
+        Rewritten spans are cached, since the same contractions come up again and again.
     """
 
-    def __init__(self, patterns=replacement_patts):  # pylint: disable = W0102
+    def __init__(self, patterns=replacement_patts, spans=contraction_spans):  # pylint: disable = W0102
         self.patterns = [(re.compile(regex), repl) for (regex, repl) in patterns]
+        self._spans = re.compile(spans)
+        self._rewrite = functools.lru_cache(maxsize=1 << 16)(self._rewrite_span)
+
+    def _rewrite_span(self, span):
+        """
+            Rewrites one span with the patterns, one after the other
+        """
+        for (pattern, repl) in self.patterns:
+            span = pattern.sub(repl, span)
+        return span
 
     def replace(self, text):
         """
             Replaces the patterns found on a text
         """
-        temp = text
-        for (pattern, repl) in self.patterns:
-            temp = re.sub(pattern, repl, temp)
-        return temp
+        return self._spans.sub(lambda match: self._rewrite(match.group()), text)
+
+    def replace_stream(self, chunks):
+        """
+            Replaces the patterns over an iterable of text chunks (e.g. a file), yielding
+            the replaced text. Chunks are cut at their last whitespace, which no match spans
+        """
+        pending = ""
+        for chunk in chunks:
+            text = pending + chunk
+            cut = max(text.rfind(" "), text.rfind("\n"), text.rfind("\t")) + 1
+            pending = text[cut:]
+            if cut:
+                yield self.replace(text[:cut])
+        if pending:
+            yield self.replace(pending)
+
+    def replace_file(self, source, target, chunk_size=1 << 20):
+        """
+            Replaces the patterns of a text file into another, chunk_size characters at a time
+        """
+        with open(source, encoding="utf-8") as src, open(target, "w", encoding="utf-8") as dst:
+            chunks = iter(lambda: src.read(chunk_size), "")
+            for replaced in self.replace_stream(chunks):
+                dst.write(replaced)
 
 
 # Getting the replaced text
-regex_rep = RegexpReplacer(replacement_patts)
-replaced = regex_rep.replace(sample_ct.lower())
-print(f"Text without contractions = {replaced}\n")
+if __name__ == "__main__":
+    import os
+    import sys
+    import tempfile
+    import time
+    from samples import sample, sample_tw
+
+    regex_rep = RegexpReplacer(replacement_patts)
+    replaced = regex_rep.replace(sample_ct.lower())
+    print(f"Text without contractions = {replaced}\n")
+
+    # Benchmark against one re.sub pass per pattern, on a synthetic corpus of
+    # size_mb megabytes (first argument, 300 by default)
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    block = "\n".join([sample_ct.lower(), sample.lower(), sample_tw.lower()]) + "\n"
+    corpus = block * (size_mb * (1 << 20) // len(block) + 1)
+
+    start = time.perf_counter()
+    expected = corpus
+    for (patt, rep) in regex_rep.patterns:
+        expected = re.sub(patt, rep, expected)
+    sequential_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    single = regex_rep.replace(corpus)
+    single_time = time.perf_counter() - start
+    print(f"{len(corpus) / (1 << 20):.0f}MB: {len(regex_rep.patterns)} passes: " +
+          f"{sequential_time:.2f}s; single pass: {single_time:.2f}s; same text = {single == expected}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source, target = os.path.join(tmp, "corpus.txt"), os.path.join(tmp, "replaced.txt")
+        with open(source, "w", encoding="utf-8") as file:
+            file.write(corpus)
+        del corpus
+        start = time.perf_counter()
+        regex_rep.replace_file(source, target)
+        stream_time = time.perf_counter() - start
+        with open(target, encoding="utf-8") as file:
+            print(f"Streaming from file: {stream_time:.2f}s; same text = {file.read() == expected}")
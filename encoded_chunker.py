@@ -0,0 +1,194 @@
+"""
+    Classifier chunker over interned features: the features of prev_next_pos_iob as
+    integer columns of a vectorized Naive Bayes model, with the history-independent
+    ones scored once per sentence and cached
+"""
+# pylint: disable=C0103
+
+import functools
+import numpy as np
+from scipy import sparse
+from nltk.chunk import ChunkParserI
+from nltk.chunk.util import conlltags2tree, tree2conlltags
+from vectorized_nb import VectorizedNaiveBayes, UNSEEN
+
+# Features of prev_next_pos_iob not depending on the history, in its order, then previob
+STATIC_FEATURES = ("word", "pos", "nextword", "nextpos", "prevword", "prevpos")
+HISTORY_FEATURE = "previob"
+START, END = "<START>", "<END>"
+
+
+def _feature_values(words, tags):
+    """
+        Values of the static features for every token of a sentence, one list per feature
+    """
+    if not words:
+        return ([],) * len(STATIC_FEATURES)
+    return (words, tags, words[1:] + [END], tags[1:] + [END], [START] + words[:-1],
+            [START] + tags[:-1])
+
+
+class EncodedClassifierChunker(ChunkParserI):
+    """
+        Same chunker as ClassifierChunker with prev_next_pos_iob and the default Naive
+        Bayes classifier, without building feature dicts.
+
+        Each (feature, value) pair is interned into a column of the classifier's indexer,
+        so a token is seven column ids, and training is one sparse matrix. For a sentence,
+        the prior plus the six static features are summed once per token, in the order
+        nltk adds them. Adding the previob weights of every possible previous tag then
+        gives, for each token, the best tag after each previous tag: greedy decoding only
+        follows that table. Tables are kept in an LRU cache keyed by the sentence.
+    """
+
+    def __init__(self, train_sents, cache_size=1 << 14):
+        self.classifier = VectorizedNaiveBayes()
+        self.cache_size = cache_size
+        self._lookups = None
+        self._labels = None
+        self._weights = None
+        self._prior = None
+        self._history = None
+        self._train(train_sents)
+        self._cached = functools.lru_cache(maxsize=cache_size)(self._best_tags)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_cached"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cached = functools.lru_cache(maxsize=self.cache_size)(self._best_tags)
+
+    def _train(self, train_sents):
+        """
+            Interns the features of every training token, as ClassifierBasedTagger
+            extracts them with the gold history, and trains the classifier on their matrix
+        """
+        names = STATIC_FEATURES + (HISTORY_FEATURE,)
+        values = [[] for _ in names]
+        labels = []
+        for tree in train_sents:
+            conll = tree2conlltags(tree)
+            if not conll:
+                continue
+            words, tags, iobs = (list(column) for column in zip(*conll))
+            for column, sent_values in zip(values, _feature_values(words, tags) +
+                                           ([START] + iobs[:-1],)):
+                column.extend(sent_values)
+            labels.extend(iobs)
+
+        indexer = self.classifier.indexer
+        for fname, column in zip(names, values):
+            for fval in dict.fromkeys(column):
+                indexer._add((fname, fval))  # pylint: disable = W0212
+        self._lookups = {fname: {} for fname in names}
+        for (fname, fval), index in indexer.columns.items():
+            self._lookups[fname][fval] = index
+
+        columns = np.array([[self._lookups[fname][fval] for fval in column]
+                            for fname, column in zip(names, values)], dtype=np.int64)
+        matrix = sparse.csr_matrix(
+            (np.ones(columns.size), columns.T.ravel(), np.arange(0, columns.size + 1, len(names))),
+            shape=(len(labels), len(indexer)))
+        self.classifier.partial_fit_matrix(matrix, labels)
+        self._compile()
+
+    def _compile(self):
+        """
+            Weights of each column for each tag, with the tags sorted so the first best
+            tag is the greatest, as nltk breaks ties
+        """
+        weights, prior = self.classifier.weights()
+        labels = self.classifier.labels()
+        order = sorted(range(len(labels)), key=labels.__getitem__, reverse=True)
+        self._labels = [labels[index] for index in order]
+        self._weights = np.ascontiguousarray(weights[order].T)
+        self._prior = prior[order]
+        # previob weights of every previous tag, then of the sentence start
+        self._history = self._weights[[self._column(HISTORY_FEATURE, value)
+                                       for value in self._labels + [START]]]
+
+    def _column(self, fname, fval):
+        """
+            Column of a feature value, or of the unseen values of the feature
+        """
+        lookup = self._lookups[fname]
+        column = lookup.get(fval)
+        return lookup[UNSEEN] if column is None else column
+
+    def _best_tags(self, tokens):
+        """
+            Table of the best tag of each token after each previous tag (the last one
+            being the sentence start), as tag indexes
+        """
+        words = [word for word, _ in tokens]
+        tags = [tag for _, tag in tokens]
+        scores = self._prior
+        for fname, sent_values in zip(STATIC_FEATURES, _feature_values(words, tags)):
+            lookup, unseen = self._lookups[fname], self._lookups[fname][UNSEEN]
+            scores = scores + self._weights[[lookup.get(fval, unseen) for fval in sent_values]]
+        return (scores[:, None, :] + self._history[None, :, :]).argmax(axis=2).tolist()
+
+    def parse_iob(self, tokens):
+        """
+            (word, pos, iob) triples of a sentence, without building its tree
+        """
+        tokens = tuple(tokens)
+        if not tokens:
+            return []
+        labels = self._labels
+        previous = len(labels)
+        triples = []
+        for (word, tag), best in zip(tokens, self._cached(tokens)):
+            previous = best[previous]
+            triples.append((word, tag, labels[previous]))
+        return triples
+
+    def parse_iob_sents(self, sents):
+        """
+            (word, pos, iob) triples of a batch of sentences
+        """
+        return [self.parse_iob(sent) for sent in sents]
+
+    def parse(self, tokens):
+        """
+            Parse sentence into chunks
+        """
+        if not tokens:
+            return None
+        return conlltags2tree(self.parse_iob(tokens))
+
+
+if __name__ == "__main__":
+    import time
+    from nltk.corpus import conll2000
+    from nltk.tag import ClassifierBasedTagger
+    from chunk_features import prev_next_pos_iob
+
+    train_conll = conll2000.chunked_sents("train.txt")
+    test_sents = [tree.leaves() for tree in conll2000.chunked_sents("test.txt")]
+
+    start = time.perf_counter()
+    train_chunks = [[((w, t), c) for (w, t, c) in tree2conlltags(sent)] for sent in train_conll]
+    tagger = ClassifierBasedTagger(train=train_chunks, feature_detector=prev_next_pos_iob)
+    nltk_time = time.perf_counter() - start
+    start = time.perf_counter()
+    chunker = EncodedClassifierChunker(train_conll)
+    encoded_time = time.perf_counter() - start
+    print(f"Training on train_conll: ClassifierBasedTagger {nltk_time:.2f}s; " +
+          f"encoded {encoded_time:.2f}s")
+
+    start = time.perf_counter()
+    expected = [[(w, t, c) for ((w, t), c) in tagger.tag(sent)] for sent in test_sents]
+    nltk_time = (time.perf_counter() - start) / len(test_sents)
+    start = time.perf_counter()
+    iob = chunker.parse_iob_sents(test_sents)
+    encoded_time = (time.perf_counter() - start) / len(test_sents)
+    start = time.perf_counter()
+    chunker.parse_iob_sents(test_sents)
+    cached_time = (time.perf_counter() - start) / len(test_sents)
+    print(f"Latency per sentence: ClassifierBasedTagger {nltk_time * 1e3:.3f}ms; " +
+          f"encoded {encoded_time * 1e3:.3f}ms; cached {cached_time * 1e3:.3f}ms; " +
+          f"same tags = {iob == expected}")
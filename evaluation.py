@@ -0,0 +1,382 @@
+"""
+    Evaluation over flat arrays: gold and guessed tags of a whole test set encoded as
+    integer ids and scored with vectorized comparisons, for several models in parallel
+"""
+# pylint: disable=C0103
+
+import os
+import re
+import numpy as np
+from nltk.chunk.util import tree2conlltags
+from batch_tagging import pool_context
+
+# Models and test set of the current process, set before the pool is forked
+_models = None
+_test_set = None
+
+# Chunk tag kinds
+OUTSIDE, BEGIN, INSIDE = 0, 1, 2
+
+
+def _set_worker_state(models, test_set):
+    """
+        Sets the models and test set of the current process
+    """
+    global _models, _test_set  # pylint: disable = W0603
+    _models, _test_set = models, test_set
+
+
+def _predict_chunk(task):
+    """
+        Tags a slice of the test set with one of the models, inside a worker
+    """
+    model, start, stop = task
+    return _test_set.predict(_models[model], _test_set.inputs[start:stop])
+
+
+def _f_measure(precision, recall, alpha=0.5):
+    """
+        F measure as ChunkScore computes it
+    """
+    if precision == 0 or recall == 0:
+        return 0
+    return 1 / (alpha / precision + (1 - alpha) / recall)
+
+
+def _ratios(numerators, denominators):
+    """
+        Element-wise ratios, 0 where the denominator is 0
+    """
+    return np.divide(numerators, denominators, out=np.zeros(len(numerators)),
+                     where=denominators > 0)
+
+
+class TagScore(object):
+    """
+        Scores of a tagger on a test set: accuracy, as TaggerI.evaluate, and the
+        confusion matrix of the tags
+    """
+
+    def __init__(self, labels, gold, guess):
+        self.labels = labels
+        self._gold = gold
+        self._guess = guess
+
+    def accuracy(self):
+        """
+            Fraction of tokens given their gold tag
+        """
+        if not len(self._gold):
+            return 1
+        return np.count_nonzero(self._gold == self._guess) / len(self._gold)
+
+    def confusion_matrix(self):
+        """
+            (labels, counts): counts[i, j] tokens tagged labels[j] whose gold tag is labels[i]
+        """
+        n = len(self.labels)
+        counts = np.bincount(self._gold * n + self._guess, minlength=n * n)
+        return self.labels, counts.reshape(n, n)
+
+    def per_label(self, alpha=0.5):
+        """
+            {label: (precision, recall, f_measure)} of each tag
+        """
+        labels, counts = self.confusion_matrix()
+        hits = np.diagonal(counts).astype(np.float64)
+        precision = _ratios(hits, counts.sum(axis=0))
+        recall = _ratios(hits, counts.sum(axis=1))
+        seen = (counts.sum(axis=0) + counts.sum(axis=1)).tolist()
+        return {label: (p, r, _f_measure(p, r, alpha))
+                for label, p, r, n in zip(labels, precision.tolist(), recall.tolist(), seen) if n}
+
+
+class IOBScore(TagScore):
+    """
+        Scores of a chunker on a test set, the same as the ChunkScore of evaluate:
+        accuracy over the IOB tags, and precision, recall and F measure over the chunks
+    """
+
+    def __init__(self, labels, gold, guess, gold_chunks, guess_chunks, types):
+        TagScore.__init__(self, labels, gold, guess)
+        self._gold_chunks = gold_chunks
+        self._guess_chunks = guess_chunks
+        self._types = types
+        self._hits = np.intersect1d(gold_chunks, guess_chunks, assume_unique=True)
+
+    def precision(self):
+        """
+            Fraction of the guessed chunks that are gold chunks
+        """
+        return len(self._hits) / len(self._guess_chunks) if len(self._guess_chunks) else 0
+
+    def recall(self):
+        """
+            Fraction of the gold chunks that were guessed
+        """
+        return len(self._hits) / len(self._gold_chunks) if len(self._gold_chunks) else 0
+
+    def f_measure(self, alpha=0.5):
+        """
+            F measure of the chunks
+        """
+        return _f_measure(self.precision(), self.recall(), alpha)
+
+    def per_label(self, alpha=0.5):
+        """
+            {chunk label: (precision, recall, f_measure)} of the chunks of each label
+        """
+        mask = (1 << IOBTestSet.TYPE_BITS) - 1
+        n = len(self._types)
+        hits, guessed, gold = (np.bincount(chunks & mask, minlength=n).astype(np.float64)
+                               for chunks in (self._hits, self._guess_chunks, self._gold_chunks))
+        precision, recall = _ratios(hits, guessed), _ratios(hits, gold)
+        return {label: (p, r, _f_measure(p, r, alpha))
+                for label, p, r, seen in zip(self._types, precision.tolist(), recall.tolist(),
+                                             (guessed + gold).tolist()) if seen}
+
+
+class TaggedTestSet(object):
+    """
+        Tagged sentences prepared once for scoring taggers: the words to tag and the gold
+        tags as one array of ids. Tags are given ids as they show up, gold or guessed.
+    """
+
+    def __init__(self, tagged_sents):
+        tagged_sents = [list(sent) for sent in tagged_sents]
+        self.inputs = [[word for word, _ in sent] for sent in tagged_sents]
+        self.labels = []
+        self.ids = {}
+        lengths = np.array([len(sent) for sent in tagged_sents], dtype=np.int64)
+        self.offsets = np.concatenate(([0], np.cumsum(lengths)))
+        self.gold = self.encode([[tag for _, tag in sent] for sent in tagged_sents])
+
+    def __len__(self):
+        return len(self.inputs)
+
+    def _add_label(self, tag):
+        """
+            Gives an id to a new tag
+        """
+        self.ids[tag] = len(self.labels)
+        self.labels.append(tag)
+
+    def encode(self, tag_sents):
+        """
+            Ids of the tags of a list of sentences, as one flat array
+        """
+        tags = [tag for sent in tag_sents for tag in sent]
+        if len(tags) != self.offsets[-1]:
+            raise ValueError("Lists must have the same length.")
+        for tag in set(tags).difference(self.ids):
+            # Adding a tag may add others
+            if tag not in self.ids:
+                self._add_label(tag)
+        return np.fromiter(map(self.ids.__getitem__, tags), dtype=np.int64, count=len(tags))
+
+    @staticmethod
+    def predict(model, inputs):
+        """
+            Tags guessed by a tagger for a list of sentences
+        """
+        return [[tag for _, tag in sent] for sent in model.tag_sents(inputs)]
+
+    def score(self, guessed):
+        """
+            TagScore of the guessed tags of every sentence
+        """
+        return TagScore(self.labels, self.gold, self.encode(guessed))
+
+
+class IOBTestSet(TaggedTestSet):
+    """
+        Gold chunk trees prepared once for scoring chunkers: the tagged words to chunk,
+        the gold IOB tags as ids, and the gold chunks.
+
+        Chunks are (start, length, label) spans packed in one integer, with start counted
+        over the whole test set, so chunk sets compare as sorted arrays. IOB tags are read
+        as conlltags2tree reads them, an I- tag following no chunk of its label starting
+        a new chunk, and compared in that normalized form, as ChunkScore does.
+    """
+
+    # Bits of the chunk label id in the packed chunks
+    TYPE_BITS = 16
+
+    def __init__(self, chunked_sents, chunk_label=".*"):
+        self.chunk_label = chunk_label
+        self.types = []
+        self._type_ids = {}
+        self._kinds = []
+        self._label_types = []
+        self._scored_types = []
+        conll = [tree2conlltags(tree) for tree in chunked_sents]
+        TaggedTestSet.__init__(self, [[((word, tag), iob) for word, tag, iob in sent]
+                                      for sent in conll])
+        lengths = np.diff(self.offsets)
+        self._span = int(lengths.max()) + 1 if len(lengths) else 1
+        starts = np.zeros(self.offsets[-1] + 1, dtype=bool)
+        starts[self.offsets[:-1]] = True
+        self._sentence_starts = starts[:-1]
+        self.gold, self.gold_chunks = self._normalize(self.gold)
+
+    def _add_label(self, tag):
+        """
+            Gives an id to a new IOB tag, keeping its kind and chunk label id
+        """
+        if tag is None or tag == "O":
+            kind, label = OUTSIDE, None
+        elif tag.startswith("B-"):
+            kind, label = BEGIN, tag[2:]
+        elif tag.startswith("I-"):
+            kind, label = INSIDE, tag[2:]
+        else:
+            raise ValueError("Bad conll tag {0!r}".format(tag))
+        new_type = label is not None and label not in self._type_ids
+        if new_type:
+            self._type_ids[label] = len(self.types)
+            self.types.append(label)
+            self._scored_types.append(re.match(self.chunk_label, label) is not None)
+        TaggedTestSet._add_label(self, tag)
+        self._kinds.append(kind)
+        self._label_types.append(-1 if label is None else self._type_ids[label])
+        # Normalized tags of the label, so B- and I- tags exist for every chunk label
+        if new_type:
+            for prefix in ("B-", "I-"):
+                if prefix + label not in self.ids:
+                    self._add_label(prefix + label)
+
+    def _normalize(self, codes):
+        """
+            Normalized IOB ids of encoded IOB tags, and the packed chunks they make up
+        """
+        kinds = np.array(self._kinds, dtype=np.int8)[codes]
+        types = np.array(self._label_types, dtype=np.int64)[codes]
+        inside = kinds != OUTSIDE
+        follows = np.zeros(len(codes), dtype=bool)
+        follows[1:] = types[1:] == types[:-1]
+        continues = inside & (kinds == INSIDE) & follows & ~self._sentence_starts
+        begins = inside & ~continues
+
+        if "O" not in self.ids:
+            self._add_label("O")
+        n = len(self.types)
+        prefixes = np.array([self.ids[f"B-{label}"] for label in self.types] +
+                            [self.ids[f"I-{label}"] for label in self.types], dtype=np.int64)
+        # Outside tags (None, 'O') compare equal, as conlltags2tree reads None as 'O'
+        normalized = np.full(len(codes), self.ids["O"], dtype=np.int64)
+        normalized[inside] = prefixes[(types + continues * n)[inside]]
+
+        starts = np.flatnonzero(begins)
+        lengths = np.bincount(np.cumsum(begins)[inside] - 1, minlength=len(starts))
+        chunk_types = types[starts]
+        keep = np.array(self._scored_types, dtype=bool)[chunk_types]
+        chunks = (((starts * self._span + lengths) << self.TYPE_BITS) + chunk_types)[keep]
+        return normalized, np.sort(chunks)
+
+    @staticmethod
+    def predict(model, inputs):
+        """
+            IOB tags guessed by a chunker for a list of tagged sentences. Chunkers without
+            parse_iob_sents or parse_iob are read from their parse trees
+        """
+        if hasattr(model, "parse_iob_sents"):
+            triples = model.parse_iob_sents(inputs)
+        elif hasattr(model, "parse_iob"):
+            triples = [model.parse_iob(sent) for sent in inputs]
+        else:
+            triples = [tree2conlltags(tree) if tree is not None else []
+                       for tree in (model.parse(sent) for sent in inputs)]
+        return [[iob for _, _, iob in sent] for sent in triples]
+
+    def score(self, guessed):
+        """
+            IOBScore of the guessed IOB tags of every sentence
+        """
+        guess, guess_chunks = self._normalize(self.encode(guessed))
+        return IOBScore(self.labels, self.gold, guess, self.gold_chunks, guess_chunks, self.types)
+
+
+def evaluate_models(models, test_set, workers=None, chunksize=256):
+    """
+        Scores of each model on a TaggedTestSet (taggers) or an IOBTestSet (chunkers).
+        Slices of chunksize sentences are tagged across worker processes, which share the
+        models and test set through fork; tags are then encoded and scored in the parent.
+        Models keeping state while tagging only update it in their worker.
+    """
+    models = list(models)
+    workers = workers or os.cpu_count() or 1
+    tasks = [(model, start, min(start + chunksize, len(test_set)))
+             for model in range(len(models)) for start in range(0, len(test_set), chunksize)]
+    if workers == 1:
+        _set_worker_state(models, test_set)
+        results = [_predict_chunk(task) for task in tasks]
+    else:
+        with pool_context().Pool(workers, initializer=_set_worker_state,
+                                 initargs=(models, test_set)) as pool:
+            results = pool.map(_predict_chunk, tasks)
+    _set_worker_state(None, None)
+
+    guessed = [[] for _ in models]
+    for (model, _, _), tags in zip(tasks, results):
+        guessed[model].extend(tags)
+    return [test_set.score(tags) for tags in guessed]
+
+
+def evaluate(model, test_set):
+    """
+        Score of a model on a test set, in the current process: replaces model.evaluate,
+        with TagScore.accuracy() for taggers and an IOBScore for chunkers
+    """
+    return evaluate_models([model], test_set, workers=1)[0]
+
+
+if __name__ == "__main__":
+    import time
+    from nltk.chunk import RegexpParser
+    from nltk.corpus import conll2000, treebank
+    from nltk.tag import UnigramTagger, BigramTagger, TrigramTagger
+    from compiled_chunker import CompiledRegexpParser
+
+    # Chunkers: the NP/PP/VP grammar of chunking.py, plain and compiled
+    grammar = r'''
+    NP:
+        {<DT>?<NN.*>+}
+        <JJ>{}<NN.*>
+    PP:
+        {<IN>}
+    VP:
+        {<MD>?<VB.*>}
+    '''
+    gold = conll2000.chunked_sents()
+    chunkers = [RegexpParser(grammar), CompiledRegexpParser(grammar)]
+    start = time.perf_counter()
+    expected = [chunker.evaluate(gold) for chunker in chunkers]
+    baseline = time.perf_counter() - start
+    print(f"ChunkParserI.evaluate of {len(chunkers)} chunkers: {baseline:.2f}s")
+
+    start = time.perf_counter()
+    test_set = IOBTestSet(gold)
+    print(f"IOBTestSet: {time.perf_counter() - start:.2f}s")
+    for n_workers in (1, 2, 4):
+        start = time.perf_counter()
+        scores = evaluate_models(chunkers, test_set, workers=n_workers)
+        same = all(abs(score.accuracy() - chunk_score.accuracy()) < 1e-12 and
+                   abs(score.f_measure() - chunk_score.f_measure()) < 1e-12
+                   for score, chunk_score in zip(scores, expected))
+        print(f"evaluate_models with {n_workers} workers: {time.perf_counter() - start:.2f}s; " +
+              f"same scores = {same}")
+
+    # Taggers: the n-gram taggers of tagging.py
+    train_sents = treebank.tagged_sents()[:3000]
+    gold = treebank.tagged_sents()[3000:]
+    taggers = [UnigramTagger(train_sents), BigramTagger(train_sents), TrigramTagger(train_sents)]
+    start = time.perf_counter()
+    expected = [tagger.evaluate(gold) for tagger in taggers]
+    print(f"\nTaggerI.evaluate of {len(taggers)} taggers: {time.perf_counter() - start:.2f}s")
+    test_set = TaggedTestSet(gold)
+    for n_workers in (1, 2, 4):
+        start = time.perf_counter()
+        scores = evaluate_models(taggers, test_set, workers=n_workers)
+        same = [score.accuracy() for score in scores] == expected
+        print(f"evaluate_models with {n_workers} workers: {time.perf_counter() - start:.2f}s; " +
+              f"same accuracy = {same}")
@@ -0,0 +1,182 @@
+"""
+    Incremental training of context taggers: the n-gram and affix taggers keep their
+    context counts, so new tagged sentences update them in place, and can be
+    checkpointed with them
+"""
+# pylint: disable=C0103
+
+import os
+import pickle
+from nltk.probability import ConditionalFreqDist
+from nltk.tag import UnigramTagger, BigramTagger, TrigramTagger, AffixTagger
+
+
+class IncrementalTrainingMixin(object):
+    """
+        Mixin for ContextTagger subclasses: training keeps the counts of each context and
+        the contexts worth a table entry, and update() adds new sentences to them.
+
+        After an update, the table holds the most frequent tag of each useful context,
+        as _train builds it, recomputed only for the contexts of the new sentences. As in
+        _train, a context is useful when the backoff mistags one of its occurrences, but
+        occurrences are only checked once, against the backoff of that time: contexts
+        the backoff has learned since are kept rather than pruned.
+    """
+
+    def _train(self, tagged_corpus, cutoff=0, verbose=False):
+        """
+            Trains the table from scratch, keeping the counts
+        """
+        self._fd = ConditionalFreqDist()
+        self._useful = set()
+        self._cutoff = cutoff
+        self._context_to_tag = {}
+        self.update(tagged_corpus)
+        if verbose:
+            print(f"[Trained {self.__class__.__name__}: size={self.size()}, " +
+                  f"contexts={len(self._fd.conditions())}]")
+
+    def _seed_counts(self):
+        """
+            Counts of a tagger built without them (from a model=, or pickled before the
+            mixin): one count for the tag of each table entry, and every entry useful
+        """
+        self._fd = ConditionalFreqDist()
+        for context, tag in self._context_to_tag.items():
+            self._fd[context][tag] += 1
+        self._useful = set(self._context_to_tag)
+        self._cutoff = 0
+
+    def update(self, tagged_sents):
+        """
+            Adds tagged sentences to the counts, and updates the table entries of their
+            contexts. Returns the number of contexts seen
+        """
+        if not hasattr(self, "_fd"):
+            self._seed_counts()
+        fd, useful, backoff = self._fd, self._useful, self.backoff
+        seen = set()
+        for sentence in tagged_sents:
+            if not sentence:
+                continue
+            tokens, tags = zip(*sentence)
+            for index, tag in enumerate(tags):
+                context = self.context(tokens, index, tags[:index])
+                if context is None:
+                    continue
+                fd[context][tag] += 1
+                seen.add(context)
+                if context not in useful and (
+                        backoff is None or tag != backoff.tag_one(tokens, index, tags[:index])):
+                    useful.add(context)
+
+        table, cutoff = self._context_to_tag, self._cutoff
+        for context in seen & useful:
+            best_tag = fd[context].max()
+            if fd[context][best_tag] > cutoff:
+                table[context] = best_tag
+        return len(seen)
+
+
+class IncrementalUnigramTagger(IncrementalTrainingMixin, UnigramTagger):
+    """
+        UnigramTagger that can be updated with new tagged sentences
+    """
+
+
+class IncrementalBigramTagger(IncrementalTrainingMixin, BigramTagger):
+    """
+        BigramTagger that can be updated with new tagged sentences
+    """
+
+
+class IncrementalTrigramTagger(IncrementalTrainingMixin, TrigramTagger):
+    """
+        TrigramTagger that can be updated with new tagged sentences
+    """
+
+
+class IncrementalAffixTagger(IncrementalTrainingMixin, AffixTagger):
+    """
+        AffixTagger that can be updated with new tagged sentences
+    """
+
+
+def backoff_chain(tagger):
+    """
+        The taggers of a backoff chain, from the tagger to its last backoff
+    """
+    chain = []
+    while tagger is not None:
+        chain.append(tagger)
+        tagger = getattr(tagger, "backoff", None)
+    return chain
+
+
+def update_backoffs(tagger, tagged_sents):
+    """
+        Updates the incremental taggers of a backoff chain with new tagged sentences,
+        from the last backoff up, in the order make_backoffs trains them, so each tagger
+        checks the new sentences against its updated backoff. Other taggers are left as is
+    """
+    tagged_sents = [list(sent) for sent in tagged_sents]
+    for link in reversed(backoff_chain(tagger)):
+        if isinstance(link, IncrementalTrainingMixin):
+            link.update(tagged_sents)
+    return tagger
+
+
+def save_checkpoint(tagger, path):
+    """
+        Pickles a tagger with its counts. The file is replaced at once, so an interrupted
+        save leaves the previous checkpoint
+    """
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as file:
+        pickle.dump(tagger, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, path)
+
+
+def load_checkpoint(path):
+    """
+        Loads a tagger saved by save_checkpoint, ready for more updates
+    """
+    with open(path, "rb") as file:
+        return pickle.load(file)
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+    from nltk.corpus import treebank
+    from nltk.tag import DefaultTagger
+
+    def make_backoffs(training, tagger_classes, backoff=None):
+        """
+            make_backoffs of tagging.py
+        """
+        for cls in tagger_classes:
+            backoff = cls(training, backoff=backoff)
+        return backoff
+
+    tagged_sents = treebank.tagged_sents()
+    train_sents, new_sents, test_sents = tagged_sents[:3000], tagged_sents[3000:4000], tagged_sents[4000:]
+
+    start = time.perf_counter()
+    retrained = make_backoffs(list(train_sents) + list(new_sents),
+                              [UnigramTagger, BigramTagger, TrigramTagger], DefaultTagger('NN'))
+    print(f"Full retrain on 4000 sentences: {time.perf_counter() - start:.3f}s; " +
+          f"acc = {retrained.evaluate(test_sents)}")
+
+    tagger = make_backoffs(train_sents, [IncrementalUnigramTagger, IncrementalBigramTagger,
+                                         IncrementalTrigramTagger], DefaultTagger('NN'))
+    start = time.perf_counter()
+    update_backoffs(tagger, new_sents)
+    print("Update of a 3000 sentence chain with 1000 sentences: " +
+          f"{time.perf_counter() - start:.3f}s; acc = {tagger.evaluate(test_sents)}")
+
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        save_checkpoint(tagger, os.path.join(tmp, "incremental_backoff_tagger.pickle"))
+        tagger = load_checkpoint(os.path.join(tmp, "incremental_backoff_tagger.pickle"))
+    print(f"Checkpoint saved and loaded: {time.perf_counter() - start:.3f}s")
@@ -0,0 +1,141 @@
+"""
+    Brill tagging with indexed rules: each rule only visits the sentences holding its
+    original tag and the words and tags its conditions look for
+"""
+# pylint: disable=C0103
+
+import collections
+from nltk.tag import TaggerI, SequentialBackoffTagger
+from nltk.tag import brill
+from compiled_tagger import compile_backoff_chain
+
+# Token field each feature type extracts: the word or the tag
+FEATURE_COLUMNS = {brill.Word: 0, brill.Pos: 1}
+EMPTY = frozenset()
+
+
+def _compile_rule(rule):
+    """
+        (original tag, replacement tag, conditions, words, tags, rule): conditions are
+        (column, positions, value) triples, or None if a feature is not a plain Word or
+        Pos, then the rule checks itself. words and tags are the condition values a
+        sentence must hold for the rule to apply anywhere in it
+    """
+    conditions, words, tags = [], set(), set()
+    for feature, value in rule._conditions:  # pylint: disable = W0212
+        column = FEATURE_COLUMNS.get(type(feature))
+        if column is None:
+            conditions = None
+            words, tags = set(), set()
+            break
+        conditions.append((column, tuple(feature.positions), value))
+        (words if column == 0 else tags).add(value)
+    return (rule.original_tag, rule.replacement_tag,
+            None if conditions is None else tuple(conditions), tuple(words), tuple(tags), rule)
+
+
+def _applies(conditions, tokens, index):
+    """
+        Rule.applies for compiled conditions, the original tag being already checked
+    """
+    length = len(tokens)
+    for column, positions, value in conditions:
+        for position in positions:
+            neighbour = index + position
+            if 0 <= neighbour < length and tokens[neighbour][column] == value:
+                break
+        else:
+            return False
+    return True
+
+
+class IndexedBrillTagger(TaggerI):
+    """
+        Tags like a BrillTagger, with its rules applied in order to a batch of sentences.
+
+        Sentences are indexed by the condition words they hold and by the tags they
+        currently hold. A rule intersects the sentences of its original tag with those of
+        its condition words and tags, and only checks the positions of its original tag
+        in them. The initial backoff chain is compiled into a flat lookup table
+    """
+
+    def __init__(self, brill_tagger):
+        initial_tagger = brill_tagger._initial_tagger  # pylint: disable = W0212
+        if isinstance(initial_tagger, SequentialBackoffTagger):
+            initial_tagger = compile_backoff_chain(initial_tagger)
+        self._initial_tagger = initial_tagger
+        self._rules = [_compile_rule(rule) for rule in brill_tagger.rules()]
+        self._words = {word for rule in self._rules for word in rule[3]}
+
+    def tag(self, tokens):
+        """
+            Tags a sentence, giving the same tags as the BrillTagger
+        """
+        return self.tag_sents([tokens])[0]
+
+    def tag_sents(self, sentences):
+        """
+            Tags a batch of sentences, applying each rule once to the whole batch
+        """
+        tagged = [self._initial_tagger.tag(tokens) for tokens in sentences]
+        sents_by_tag = collections.defaultdict(set)
+        sents_by_word = collections.defaultdict(set)
+        rule_words = self._words
+        for sentnum, sent in enumerate(tagged):
+            for tag in {tag for _, tag in sent}:
+                sents_by_tag[tag].add(sentnum)
+            for word in rule_words.intersection([word for word, _ in sent]):
+                sents_by_word[word].add(sentnum)
+
+        for original, replacement, conditions, words, tags, rule in self._rules:
+            candidates = sents_by_tag.get(original)
+            if not candidates:
+                continue
+            for value in tags:
+                candidates = candidates & sents_by_tag.get(value, EMPTY)
+            for value in words:
+                candidates = candidates & sents_by_word.get(value, EMPTY)
+
+            for sentnum in list(candidates):
+                sent = tagged[sentnum]
+                at = [index for index, (_, tag) in enumerate(sent) if tag == original]
+                if conditions is None:
+                    changed = [index for index in at if rule.applies(sent, index)]
+                else:
+                    changed = [index for index in at if _applies(conditions, sent, index)]
+                if not changed:
+                    continue
+                for index in changed:
+                    sent[index] = (sent[index][0], replacement)
+                if len(changed) == len(at):
+                    sents_by_tag[original].discard(sentnum)
+                sents_by_tag[replacement].add(sentnum)
+        return tagged
+
+
+if __name__ == "__main__":
+    import pickle
+    import time
+    from nltk.corpus import treebank
+
+    with open("pickles/pos-taggers/brill_tagger.pickle", "rb") as file:
+        br_tagger = pickle.load(file)
+    test_words = [[word for word, _ in sent] for sent in treebank.tagged_sents()[3000:]]
+
+    start = time.perf_counter()
+    indexed = IndexedBrillTagger(br_tagger)
+    print(f"Indexed {len(br_tagger.rules())} rules in {time.perf_counter() - start:.3f}s")
+
+    start = time.perf_counter()
+    expected = [br_tagger.tag(words) for words in test_words]
+    brill_time = time.perf_counter() - start
+    start = time.perf_counter()
+    single = [indexed.tag(words) for words in test_words]
+    single_time = time.perf_counter() - start
+    start = time.perf_counter()
+    batched = indexed.tag_sents(test_words)
+    batch_time = time.perf_counter() - start
+
+    print(f"BrillTagger: {brill_time:.3f}s; indexed tag: {single_time:.3f}s " +
+          f"({brill_time / single_time:.1f}x); indexed tag_sents: {batch_time:.3f}s " +
+          f"({brill_time / batch_time:.1f}x); same tags = {single == expected == batched}")
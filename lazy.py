@@ -0,0 +1,110 @@
+"""
+    Lazy loading: modules, corpus readers and heavy resources built on their first use,
+    and a report of what each module costs to import
+"""
+# pylint: disable=C0103
+
+import importlib
+import re
+import subprocess
+import sys
+import threading
+
+_IMPORT_TIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| *(\S+)")
+
+
+class LazyResource(object):
+    """
+        Proxy of a resource built by factory on first use, once even across threads.
+        Attributes, calls, indexing, iteration and len are forwarded to the resource
+    """
+
+    def __init__(self, factory, name=None):
+        self._factory = factory
+        self._name = name or getattr(factory, "__name__", "resource")
+        self._lock = threading.Lock()
+        self._resource = None
+        self._loaded = False
+
+    def resolve(self):
+        """
+            The resource, built on the first call
+        """
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._resource = self._factory()
+                    self._loaded = True
+        return self._resource
+
+    @property
+    def loaded(self):
+        """
+            Whether the resource has been built
+        """
+        return self._loaded
+
+    def __getattr__(self, name):
+        # Only reached for attributes the proxy itself lacks
+        if name.startswith("__") or name in ("_factory", "_name", "_lock", "_resource", "_loaded"):
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __getitem__(self, key):
+        return self.resolve()[key]
+
+    def __contains__(self, item):
+        return item in self.resolve()
+
+    def __iter__(self):
+        return iter(self.resolve())
+
+    def __len__(self):
+        return len(self.resolve())
+
+    def __repr__(self):
+        state = "loaded" if self._loaded else "not loaded"
+        return f"<{self.__class__.__name__} {self._name} ({state})>"
+
+
+def lazy_import(name):
+    """
+        Proxy of a module, imported on first use
+    """
+    return LazyResource(lambda: importlib.import_module(name), name)
+
+
+def lazy_corpus(name):
+    """
+        Proxy of an nltk.corpus reader: neither nltk nor the corpus are loaded before
+        the first use
+    """
+    return LazyResource(lambda: getattr(importlib.import_module("nltk.corpus"), name),
+                        f"nltk.corpus.{name}")
+
+
+def import_time_report(module, top=10):
+    """
+        Imports a module in a fresh interpreter with -X importtime. Returns its total
+        import time and the top slowest imports under it, as (name, cumulative time),
+        in ms
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, check=True)
+    timings = {}
+    for line in result.stderr.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match:
+            timings[match.group(3)] = int(match.group(2)) / 1e3
+    total = timings.pop(module, 0.0)
+    return total, sorted(timings.items(), key=lambda timing: -timing[1])[:top]
+
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or ["repetitions", "synsets", "tagging"]:
+        import_time, slowest_imports = import_time_report(name, top=5)
+        print(f"{name}: {import_time:.0f}ms to import; slowest: " +
+              ", ".join(f"{module} {elapsed:.0f}ms" for module, elapsed in slowest_imports))
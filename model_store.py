@@ -0,0 +1,641 @@
+"""
+    Model store: the tables behind the pickled models, saved as a manifest plus one
+    memory-mappable binary file. Loading maps the file read-only, so it is near-instant
+    and the pages are shared by every process that loads the same model.
+"""
+# pylint: disable=C0103
+
+import ast
+import collections.abc
+import importlib
+import json
+import os
+import pickle
+import time
+import zlib
+import numpy as np
+from nltk.classify import NaiveBayesClassifier
+from nltk.probability import DictionaryProbDist, ConditionalFreqDist, FreqDist
+from nltk.tag import brill, tnt, SequentialBackoffTagger, ClassifierBasedTagger
+from nltk.tag import DefaultTagger, NgramTagger, UnigramTagger, BigramTagger, TrigramTagger
+from nltk.tag import AffixTagger
+from nltk.tbl.rule import Rule
+
+FORMAT = "nltk-experiments-model"
+VERSION = 1
+MANIFEST = "manifest.json"
+TABLES = "tables.bin"
+ALIGNMENT = 64
+
+# Same value nltk uses for log(0)
+_NINF = float("-1e300")
+
+NGRAM_CLASSES = {cls.__name__: cls for cls in
+                 (UnigramTagger, BigramTagger, TrigramTagger, NgramTagger)}
+BRILL_FEATURES = {cls.__name__: cls for cls in (brill.Word, brill.Pos)}
+
+# Writing and reading the binary tables, also used by the other mapped stores
+# (wordnet_lexicon, synonym_index)
+
+
+def write_tables(path, kind, tables, meta):
+    """
+        Writes the tables into one aligned binary file and describes them in the manifest
+    """
+    os.makedirs(path, exist_ok=True)
+    layout = {}
+    offset = 0
+
+    with open(os.path.join(path, TABLES), "wb") as file:
+        for name, array in tables.items():
+            array = np.ascontiguousarray(array)
+            padding = -offset % ALIGNMENT
+            file.write(b"\0" * padding)
+            offset += padding
+            layout[name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+            file.write(array.tobytes())
+            offset += array.nbytes
+
+    manifest = {"format": FORMAT, "version": VERSION, "kind": kind, "tables": layout}
+    manifest.update(meta)
+    with open(os.path.join(path, MANIFEST), "w") as file:
+        json.dump(manifest, file, indent=1)
+
+
+def read_tables(path):
+    """
+        Reads the manifest and maps every table of the model without copying it
+    """
+    with open(os.path.join(path, MANIFEST)) as file:
+        manifest = json.load(file)
+    if manifest.get("format") != FORMAT or manifest.get("version") != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} {FORMAT} directory")
+
+    tables_path = os.path.join(path, TABLES)
+    if os.path.getsize(tables_path):
+        buffer = np.memmap(tables_path, dtype=np.uint8, mode="r")
+    else:
+        buffer = np.zeros(0, dtype=np.uint8)
+
+    tables = {}
+    for name, spec in manifest["tables"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        start = spec["offset"]
+        tables[name] = buffer[start:start + count * dtype.itemsize].view(dtype).reshape(spec["shape"])
+    return manifest, tables
+
+
+def native_view(array):
+    """
+        Memoryview over the array for fast scalar access (no copy on little-endian hosts)
+    """
+    return memoryview(np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("=")))
+
+
+# Hash tables over the repr of the keys
+
+
+def hash_keys(keys, tables, name):
+    """
+        Stores the keys as an open addressing hash table (slots, offsets and blob tables)
+    """
+    encoded = [repr(key).encode("utf-8") for key in keys]
+    size = 1 << max(1, (2 * len(encoded) - 1).bit_length())
+    mask = size - 1
+    slots = [-1] * size
+
+    for index, data in enumerate(encoded):
+        slot = zlib.crc32(data) & mask
+        while slots[slot] >= 0:
+            slot = (slot + 1) & mask
+        slots[slot] = index
+
+    offsets = np.zeros(len(encoded) + 1, dtype="<i8")
+    np.cumsum([len(data) for data in encoded], out=offsets[1:])
+    tables[name + ".slots"] = np.array(slots, dtype="<i4")
+    tables[name + ".offsets"] = offsets
+    tables[name + ".blob"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+class MappedTable(collections.abc.Mapping):
+    """
+        Read-only mapping backed by a hash table of mapped arrays. Values are the entry
+        indexes themselves, or values[index], optionally translated through labels.
+    """
+
+    def __init__(self, tables, name, values=None, labels=None):
+        self._slots = native_view(tables[name + ".slots"])
+        self._offsets = native_view(tables[name + ".offsets"])
+        self._blob = memoryview(tables[name + ".blob"])
+        self._mask = len(self._slots) - 1
+        self._values = None if values is None else native_view(values)
+        self._labels = labels
+
+    def index(self, key):
+        """
+            Entry index of the key, -1 if it is not in the table
+        """
+        data = repr(key).encode("utf-8")
+        slots, offsets, blob, mask = self._slots, self._offsets, self._blob, self._mask
+        slot = zlib.crc32(data) & mask
+        entry = slots[slot]
+        while entry >= 0:
+            if blob[offsets[entry]:offsets[entry + 1]] == data:
+                return entry
+            slot = (slot + 1) & mask
+            entry = slots[slot]
+        return -1
+
+    def _value(self, entry):
+        """
+            Translates an entry index into the stored value
+        """
+        if self._values is None:
+            return entry
+        value = self._values[entry]
+        return value if self._labels is None else self._labels[value]
+
+    def get(self, key, default=None):
+        entry = self.index(key)
+        return default if entry < 0 else self._value(entry)
+
+    def __getitem__(self, key):
+        entry = self.index(key)
+        if entry < 0:
+            raise KeyError(key)
+        return self._value(entry)
+
+    def __contains__(self, key):
+        return self.index(key) >= 0
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __iter__(self):
+        offsets = self._offsets
+        for entry in range(len(self)):
+            yield ast.literal_eval(bytes(self._blob[offsets[entry]:offsets[entry + 1]]).decode("utf-8"))
+
+
+# Backoff chains of n-gram, affix and default taggers
+
+
+def _encode_chain(tagger, tables, prefix):
+    """
+        Describes every link of a backoff chain, storing its context table
+    """
+    links = []
+    for position, link in enumerate(tagger._taggers):  # pylint: disable = W0212
+        name = f"{prefix}{position}"
+        if type(link) is DefaultTagger:  # pylint: disable = C0123
+            links.append({"type": "default", "tag": link._tag})  # pylint: disable = W0212
+            continue
+
+        if type(link).__name__ in NGRAM_CLASSES and NGRAM_CLASSES[type(link).__name__] is type(link):
+            desc = {"type": "ngram", "class": type(link).__name__, "n": link._n}  # pylint: disable = W0212
+        elif type(link) is AffixTagger:  # pylint: disable = C0123
+            desc = {"type": "affix", "affix_length": link._affix_length,  # pylint: disable = W0212
+                    "min_word_length": link._min_word_length}  # pylint: disable = W0212
+        else:
+            raise ValueError(f"Unsupported backoff link: {type(link).__name__}")
+
+        contexts = link._context_to_tag  # pylint: disable = W0212
+        labels = sorted(set(contexts.values()))
+        ids = {tag: index for index, tag in enumerate(labels)}
+        hash_keys(contexts.keys(), tables, name)
+        tables[name + ".values"] = np.array([ids[tag] for tag in contexts.values()], dtype="<i4")
+        desc.update({"table": name, "labels": labels})
+        links.append(desc)
+    return links
+
+
+def _decode_chain(links, tables):
+    """
+        Rebuilds a backoff chain whose context tables are MappedTables
+    """
+    backoff = None
+    for desc in reversed(links):
+        if desc["type"] == "default":
+            backoff = DefaultTagger(desc["tag"])
+            continue
+
+        name = desc["table"]
+        if not len(tables[name + ".values"]):
+            continue
+        model = MappedTable(tables, name, tables[name + ".values"], desc["labels"])
+
+        if desc["type"] == "affix":
+            backoff = AffixTagger(model=model, affix_length=desc["affix_length"],
+                                  min_stem_length=desc["min_word_length"] - abs(desc["affix_length"]),
+                                  backoff=backoff)
+        elif desc["class"] == "NgramTagger":
+            backoff = NgramTagger(desc["n"], model=model, backoff=backoff)
+        else:
+            backoff = NGRAM_CLASSES[desc["class"]](model=model, backoff=backoff)
+    return backoff
+
+
+# Brill taggers
+
+
+def _encode_brill(tagger, tables):
+    """
+        Initial tagger as a backoff chain, learned rules in the manifest
+    """
+    rules = [{
+        "templateid": rule.templateid,
+        "original": rule.original_tag,
+        "replacement": rule.replacement_tag,
+        "conditions": [[type(feature).__name__, list(feature.positions), value]
+                       for feature, value in rule._conditions]  # pylint: disable = W0212
+    } for rule in tagger.rules()]
+    return {"initial": _encode_chain(tagger._initial_tagger, tables, "initial"),  # pylint: disable = W0212
+            "rules": rules}
+
+
+def _decode_brill(manifest, tables):
+    """
+        Rebuilds a BrillTagger from its initial chain and rule list
+    """
+    rules = [Rule(rule["templateid"], rule["original"], rule["replacement"],
+                  tuple((BRILL_FEATURES[feature](positions), value)
+                        for feature, positions, value in rule["conditions"]))
+             for rule in manifest["rules"]]
+    return brill.BrillTagger(_decode_chain(manifest["initial"], tables), rules)
+
+
+# TnT taggers
+
+
+def _encode_tnt(tagger, tables):
+    """
+        Dense unigram/bigram/trigram state counts and a CSR word -> tag count table
+    """
+    # pylint: disable = W0212
+    states = [("BOS", False)] + [state for state in tagger._uni if state != ("BOS", False)]
+    state_ids = {state: index for index, state in enumerate(states)}
+    size = len(states)
+
+    uni = np.zeros(size, dtype="<i8")
+    for state, count in tagger._uni.items():
+        uni[state_ids[state]] = count
+    bi = np.zeros((size, size), dtype="<i4")
+    for prev, fdist in tagger._bi.items():
+        for state, count in fdist.items():
+            bi[state_ids[prev], state_ids[state]] = count
+    tri = np.zeros((size, size, size), dtype="<i4")
+    for (prev2, prev1), fdist in tagger._tri.items():
+        for state, count in fdist.items():
+            tri[state_ids[prev2], state_ids[prev1], state_ids[state]] = count
+
+    tags = sorted({tag for fdist in tagger._wd.values() for tag in fdist} | set(tagger._eos))
+    tag_ids = {tag: index for index, tag in enumerate(tags)}
+    words = list(tagger._wd.conditions())
+    starts, wd_tags, wd_counts = [0], [], []
+    for word in words:
+        for tag, count in tagger._wd[word].items():
+            wd_tags.append(tag_ids[tag])
+            wd_counts.append(count)
+        starts.append(len(wd_tags))
+    hash_keys(words, tables, "wd")
+    tables.update({
+        "uni": uni, "bi": bi, "tri": tri,
+        "wd.starts": np.array(starts, dtype="<i8"),
+        "wd.tags": np.array(wd_tags, dtype="<i4"),
+        "wd.counts": np.array(wd_counts, dtype="<i8"),
+        "eos": np.array([tagger._eos[tag]["EOS"] for tag in tags], dtype="<i8"),
+    })
+    return {
+        "states": [list(state) for state in states], "tags": tags,
+        "lambdas": [tagger._l1, tagger._l2, tagger._l3],
+        "N": tagger._N, "C": tagger._C, "trained": tagger._T,
+        "unk": None if tagger._unk is None else _encode_chain(tagger._unk, tables, "unk"),
+    }
+
+
+def _decode_tnt(manifest, tables):
+    """
+        Rebuilds the TnT frequency tables. Unlike the other kinds this copies the
+        counts into FreqDists, since TnT only works with its own dict-based tables.
+    """
+    # pylint: disable = W0212
+    unk = None if manifest["unk"] is None else _decode_chain(manifest["unk"], tables)
+    tagger = tnt.TnT(unk=unk, Trained=manifest["trained"], N=manifest["N"], C=manifest["C"])
+    tagger._l1, tagger._l2, tagger._l3 = manifest["lambdas"]
+    states = [tuple(state) for state in manifest["states"]]
+    tags = manifest["tags"]
+
+    uni = tables["uni"]
+    tagger._uni = FreqDist({states[i]: int(uni[i]) for i in np.flatnonzero(uni)})
+    tagger._bi = ConditionalFreqDist()
+    for prev, state in zip(*np.nonzero(tables["bi"])):
+        tagger._bi[states[prev]][states[state]] = int(tables["bi"][prev, state])
+    tagger._tri = ConditionalFreqDist()
+    for prev2, prev1, state in zip(*np.nonzero(tables["tri"])):
+        tagger._tri[states[prev2], states[prev1]][states[state]] = int(tables["tri"][prev2, prev1, state])
+
+    words = MappedTable(tables, "wd")
+    starts, wd_tags, wd_counts = (tables["wd.starts"].tolist(), tables["wd.tags"].tolist(),
+                                  tables["wd.counts"].tolist())
+    tagger._wd = ConditionalFreqDist()
+    for index, word in enumerate(words):
+        for position in range(starts[index], starts[index + 1]):
+            tagger._wd[word][tags[wd_tags[position]]] = wd_counts[position]
+    tagger._eos = ConditionalFreqDist()
+    for index in np.flatnonzero(tables["eos"]):
+        tagger._eos[tags[index]]["EOS"] = int(tables["eos"][index])
+    return tagger
+
+
+# Naive Bayes classifier taggers
+
+
+class MappedNaiveBayesClassifier(NaiveBayesClassifier):
+    """
+        NaiveBayesClassifier whose log probabilities live in mapped tables: one row of
+        per-label log probabilities for the unseen values of each fname, and for each
+        (fname, fval) seen in training the labels whose probability differs from that
+        row. Classifies exactly like the original.
+    """
+
+    def __init__(self, labels, tables):  # pylint: disable = W0231
+        self._labels = labels
+        self._prior = tables["prior"]
+        self._fnames = MappedTable(tables, "fnames")
+        self._unseen = tables["unseen"]
+        self._features = MappedTable(tables, "features")
+        self._feature_fname = tables["features.fname"]
+        self._starts = tables["features.starts"]
+        self._seen_labels = tables["features.labels"]
+        self._seen_logprob = tables["features.logprob"]
+        self._seen_prob = tables.get("features.prob")
+        self._most_informative_features = None
+
+    def prob_classify(self, featureset):
+        logprob = np.array(self._prior)
+        for fname, fval in featureset.items():
+            entry = self._features.index((fname, fval))
+            if entry < 0:
+                row = self._fnames.get(fname)
+                if row is not None:
+                    logprob += self._unseen[row]
+                continue
+            feature = self._unseen[self._feature_fname[entry]].copy()
+            seen = slice(self._starts[entry], self._starts[entry + 1])
+            feature[self._seen_labels[seen]] = self._seen_logprob[seen]
+            logprob += feature
+        return DictionaryProbDist(dict(zip(self._labels, logprob.tolist())), normalize=True, log=True)
+
+    def _seen_probs(self, entry):
+        """
+            Label ids and P(fval | label) of the labels that saw a feature in training
+        """
+        seen = slice(self._starts[entry], self._starts[entry + 1])
+        if self._seen_prob is None:
+            # Models saved before the probabilities were stored only have their logs
+            return self._seen_labels[seen], np.exp2(self._seen_logprob[seen])
+        return self._seen_labels[seen], self._seen_prob[seen]
+
+    def most_informative_features(self, n=100):
+        """
+            The features with the highest max/min ratio of P(fval | label), in the same
+            order as NaiveBayesClassifier
+        """
+        if self._most_informative_features is None:
+            ratios = {}
+            for entry, feature in enumerate(self._features):
+                _, probs = self._seen_probs(entry)
+                if probs.min() > 0:
+                    ratios[feature] = probs.min() / probs.max()
+            self._most_informative_features = sorted(ratios, key=lambda feature: (
+                ratios[feature], feature[0], feature[1] in [None, False, True],
+                str(feature[1]).lower()))
+        return self._most_informative_features[:n]
+
+    def show_most_informative_features(self, n=10):
+        """
+            Prints the most informative features like NaiveBayesClassifier
+        """
+        print("Most Informative Features")
+        for fname, fval in self.most_informative_features(n):
+            label_ids, probs = self._seen_probs(self._features.index((fname, fval)))
+            prob = {self._labels[label]: value
+                    for label, value in zip(label_ids.tolist(), probs.tolist())}
+            labels = sorted(prob, key=lambda label: (-prob[label], label), reverse=True)
+            if len(labels) == 1:
+                continue
+            l0, l1 = labels[0], labels[-1]
+            if prob[l0] == 0:
+                ratio = "INF"
+            else:
+                ratio = "%8.1f" % (prob[l1] / prob[l0])
+            print("%24s = %-14r %6s : %-6s = %s : 1.0" % (
+                fname, fval, ("%s" % l1)[:6], ("%s" % l0)[:6], ratio))
+
+
+class _Unseen:  # pylint: disable = R0903
+    """
+        Sample that no probability distribution has seen
+    """
+
+
+def _encode_naive_bayes(classifier, tables):
+    """
+        Unseen value log probabilities per fname, sparse seen ones per (fname, fval)
+    """
+    # pylint: disable = W0212
+    labels = list(classifier._labels)
+    fpdist = classifier._feature_probdist
+    fnames = list(dict.fromkeys(fname for _, fname in fpdist))
+    fname_rows = {fname: row for row, fname in enumerate(fnames)}
+    unseen = _Unseen()
+    tables["unseen"] = np.array([[fpdist[label, fname].logprob(unseen) if (label, fname) in fpdist
+                                  else _NINF for label in labels] for fname in fnames],
+                                dtype="<f8").reshape(-1, len(labels))
+
+    seen = collections.defaultdict(list)
+    for (label, fname), pdist in fpdist.items():
+        for fval in pdist.samples():
+            seen[fname, fval].append((labels.index(label), pdist.logprob(fval), pdist.prob(fval)))
+
+    starts, seen_labels, seen_logprob, seen_prob = [0], [], [], []
+    for entries in seen.values():
+        for label, logprob, prob in sorted(entries):
+            seen_labels.append(label)
+            seen_logprob.append(logprob)
+            seen_prob.append(prob)
+        starts.append(len(seen_labels))
+
+    hash_keys(fnames, tables, "fnames")
+    hash_keys(seen.keys(), tables, "features")
+    tables.update({
+        "prior": np.array([classifier._label_probdist.logprob(label) for label in labels], dtype="<f8"),
+        "features.fname": np.array([fname_rows[fname] for fname, _ in seen], dtype="<i4"),
+        "features.starts": np.array(starts, dtype="<i8"),
+        "features.labels": np.array(seen_labels, dtype="<i4"),
+        "features.logprob": np.array(seen_logprob, dtype="<f8"),
+        "features.prob": np.array(seen_prob, dtype="<f8"),
+    })
+    return {"labels": labels}
+
+
+def _encode_classifier_tagger(tagger, tables, main_module):
+    """
+        Classifier, tagger class, feature detector reference and backoff chain
+    """
+    # pylint: disable = W0212
+    if type(tagger._classifier) is not NaiveBayesClassifier:  # pylint: disable = C0123
+        raise ValueError(f"Unsupported classifier: {type(tagger._classifier).__name__}")
+    detector = tagger.__dict__.get("_feature_detector")
+    if detector is not None:
+        module = main_module if detector.__module__ == "__main__" else detector.__module__
+        detector = f"{module}:{detector.__qualname__}"
+    backoff = tagger.backoff
+    meta = {
+        "class": f"{type(tagger).__module__}:{type(tagger).__qualname__}",
+        "feature_detector": detector,
+        "cutoff_prob": tagger._cutoff_prob,
+        "backoff": None if backoff is None else _encode_chain(backoff, tables, "backoff"),
+    }
+    meta.update(_encode_naive_bayes(tagger._classifier, tables))
+    return meta
+
+
+def _resolve(reference):
+    """
+        Imports a 'module:qualname' reference
+    """
+    module, _, name = reference.partition(":")
+    obj = importlib.import_module(module)
+    for attr in name.split("."):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def _decode_classifier_tagger(manifest, tables, feature_detector=None):
+    """
+        Rebuilds the classifier based tagger around a MappedNaiveBayesClassifier
+    """
+    if feature_detector is None and manifest["feature_detector"] is not None:
+        feature_detector = _resolve(manifest["feature_detector"])
+    backoff = None if manifest["backoff"] is None else _decode_chain(manifest["backoff"], tables)
+    return _resolve(manifest["class"])(
+        feature_detector=feature_detector, backoff=backoff, cutoff_prob=manifest["cutoff_prob"],
+        classifier=MappedNaiveBayesClassifier(manifest["labels"], tables))
+
+
+# Public API
+
+
+def save_model(model, path, main_module="__main__"):
+    """
+        Saves a tagger (or a chunker wrapping one in its 'tagger' attribute) to path.
+        main_module names the script whose __main__ functions the model references.
+    """
+    tables = {}
+    meta = {"chunker": None}
+    if not isinstance(model, SequentialBackoffTagger) and not isinstance(model, tnt.TnT) \
+            and not isinstance(model, brill.BrillTagger) and hasattr(model, "tagger"):
+        meta["chunker"] = type(model).__name__
+        model = model.tagger
+
+    if isinstance(model, brill.BrillTagger):
+        kind = "brill"
+        meta.update(_encode_brill(model, tables))
+    elif isinstance(model, tnt.TnT):
+        kind = "tnt"
+        meta.update(_encode_tnt(model, tables))
+    elif isinstance(model, ClassifierBasedTagger):
+        kind = "classifier_tagger"
+        meta.update(_encode_classifier_tagger(model, tables, main_module))
+    elif isinstance(model, SequentialBackoffTagger):
+        kind = "backoff_chain"
+        meta["links"] = _encode_chain(model, tables, "link")
+    else:
+        raise ValueError(f"Unsupported model: {type(model).__name__}")
+    write_tables(path, kind, tables, meta)
+
+
+def load_model(path, feature_detector=None):
+    """
+        Loads a model saved by save_model. Chunkers are returned as their tagger.
+        feature_detector overrides the stored reference of classifier taggers.
+    """
+    manifest, tables = read_tables(path)
+    kind = manifest["kind"]
+    if kind == "backoff_chain":
+        return _decode_chain(manifest["links"], tables)
+    if kind == "brill":
+        return _decode_brill(manifest, tables)
+    if kind == "tnt":
+        return _decode_tnt(manifest, tables)
+    if kind == "classifier_tagger":
+        return _decode_classifier_tagger(manifest, tables, feature_detector)
+    raise ValueError(f"Unknown model kind: {kind}")
+
+
+# Converting the existing pickles
+
+
+class _MainObject:  # pylint: disable = R0903
+    """
+        Stand-in for classes and functions the pickles reference from __main__
+    """
+
+
+class _PickleReader(pickle.Unpickler):
+    """
+        Unpickler that does not need the scripts that defined the pickled chunkers
+    """
+
+    def find_class(self, module, name):
+        if module == "__main__":
+            stand_in = type(name, (_MainObject,), {})
+            stand_in.__module__ = "__main__"
+            stand_in.__qualname__ = name
+            return stand_in
+        return super().find_class(module, name)
+
+
+def read_pickle(path):
+    """
+        Unpickles a model, replacing __main__ references by stand-ins
+    """
+    with open(path, "rb") as file:
+        return _PickleReader(file).load()
+
+
+def convert_pickles(src="pickles", dst="models", main_modules=None):
+    """
+        Converts every pickle under src into a model directory under dst.
+        main_modules maps each subdirectory to the module holding the __main__ functions
+        its pickles reference: the feature detectors of the chunkers live in chunk_features.
+    """
+    main_modules = main_modules or {"chunkers": "chunk_features", "pos-taggers": "tagging"}
+    converted = []
+    for folder, _, files in os.walk(src):
+        for name in sorted(files):
+            if not name.endswith(".pickle"):
+                continue
+            relative = os.path.relpath(folder, src)
+            target = os.path.join(dst, relative, name[:-len(".pickle")])
+            save_model(read_pickle(os.path.join(folder, name)), target,
+                       main_modules.get(relative, "__main__"))
+            converted.append((os.path.join(folder, name), target))
+    return converted
+
+
+if __name__ == "__main__":
+    for source, target in convert_pickles():
+        start = time.perf_counter()
+        read_pickle(source)
+        unpickle_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        load_model(target)
+        load_time = time.perf_counter() - start
+
+        size = os.path.getsize(os.path.join(target, TABLES))
+        print(f"{source}: unpickle {unpickle_time * 1000:.1f}ms; " +
+              f"load {load_time * 1000:.1f}ms ({size / 2 ** 20:.1f} MB mapped)")
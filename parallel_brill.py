@@ -0,0 +1,425 @@
+"""
+    Parallel Brill training: candidate rules found across worker processes, rule scans
+    over flat arrays of tag and word ids, and rule bookkeeping indexed by tag
+"""
+# pylint: disable=C0103
+
+import bisect
+import collections
+import itertools
+import os
+import numpy as np
+from nltk.tag import brill
+from nltk.tag.brill import BrillTagger
+from nltk.tag.brill_trainer import BrillTaggerTrainer
+from nltk.tbl.rule import Rule
+from nltk.tbl.template import Template
+from batch_tagging import pool_context
+
+# Templates and corpora of the current process, set before the pool is forked
+_templates = None
+_test_sents = None
+_train_sents = None
+
+# Candidate positions checked one by one before a rule scan turns to the arrays, as
+# most scans stop at the first few; then positions scanned at once by the first block
+PYTHON_SCAN = 16
+SCAN_BLOCK = 256
+
+
+def _set_worker_state(templates, test_sents, train_sents):
+    """
+        Sets the templates and corpora of the current process
+    """
+    global _templates, _test_sents, _train_sents  # pylint: disable = W0603
+    _templates, _test_sents, _train_sents = templates, test_sents, train_sents
+
+
+def _candidate_values(template, tokens, index):
+    """
+        Condition values of the rules template.applicable_rules proposes at index, in
+        the same order and with the same repeats
+    """
+    conditions = template._applicable_conditions(tokens, index)  # pylint: disable = W0212
+    return itertools.product(*[[value for _, value in condition] for condition in conditions])
+
+
+class _InternedRule(Rule):
+    """
+        Rule made once per distinct rule during training, so it hashes by identity
+        instead of by its repr
+    """
+
+    __hash__ = object.__hash__
+
+
+def _find_rules_chunk(sentnums):
+    """
+        Candidate rules at the errors of a range of sentences, inside a worker: one
+        (sentnum, wordnum, [(template index, condition values)]) per error
+    """
+    found = []
+    for sentnum in range(*sentnums):
+        sent, gold = _test_sents[sentnum], _train_sents[sentnum]
+        for wordnum, (_, tag) in enumerate(sent):
+            if tag != gold[wordnum][1]:
+                found.append((sentnum, wordnum, [
+                    (index, values) for index, template in enumerate(_templates)
+                    for values in _candidate_values(template, sent, wordnum)]))
+    return found
+
+
+class ParallelBrillTaggerTrainer(BrillTaggerTrainer):
+    """
+        BrillTaggerTrainer learning the same rules, faster.
+
+        The candidate rules at each initial error are found by worker processes, which
+        share the corpora through fork, and the trainer then records them in corpus order.
+        Rules are interned, so each distinct rule is built and hashed once. Scanning a
+        rule for the positions it applies to runs over flat arrays of tag and word ids,
+        a growing block at a time. Rules waiting for a scan are indexed by their original
+        tag, since a rule can only apply where the current tag is that tag.
+    """
+
+    def __init__(self, initial_tagger, templates, trace=0, deterministic=None,
+                 ruleformat="str", workers=None, chunksize=64):
+        BrillTaggerTrainer.__init__(self, initial_tagger, templates, trace, deterministic,
+                                    ruleformat)
+        self._workers = workers or os.cpu_count() or 1
+        self._chunksize = chunksize
+        self._interned = None
+        self._unknown_by_tag = None
+        self._span = None
+        self._ids = None
+        self._arrays = None
+        self._test_sents = None
+
+    def _rule(self, index, original_tag, replacement_tag, values):
+        """
+            The interned rule of a template for these tags and condition values
+        """
+        key = (index, original_tag, replacement_tag, values)
+        rule = self._interned.get(key)
+        if rule is None:
+            template = self._templates[index]
+            conditions = tuple(zip(template._features, values))  # pylint: disable = W0212
+            rule = self._interned[key] = _InternedRule(template.id, original_tag,
+                                                       replacement_tag, conditions)
+        return rule
+
+    def _applicable_rules(self, tokens, index, correct_tag):
+        """
+            Interned rules proposed by the templates at index, as _find_rules
+        """
+        tag = tokens[index][1]
+        if tag == correct_tag:
+            return
+        for position, template in enumerate(self._templates):
+            for values in _candidate_values(template, tokens, index):
+                yield self._rule(position, tag, correct_tag, values)
+
+    def _set_first_unknown(self, rule, position):
+        """
+            Records the first position where a rule is not checked yet, also in the tag index
+        """
+        self._first_unknown_position[rule] = position
+        self._unknown_by_tag.setdefault(rule.original_tag, {})[rule] = position
+
+    def train(self, train_sents, max_rules=200, min_score=2, min_acc=None):
+        tagger = BrillTaggerTrainer.train(self, train_sents, max_rules, min_score, min_acc)
+        rules = [Rule(rule.templateid, rule.original_tag, rule.replacement_tag,
+                      rule._conditions) for rule in tagger.rules()]  # pylint: disable = W0212
+        return BrillTagger(self._initial_tagger, rules, tagger.train_stats())
+
+    def _update_rule_applies(self, rule, sentnum, wordnum, train_sents):
+        """
+            Same updates as BrillTaggerTrainer._update_rule_applies, with fewer lookups
+        """
+        pos = sentnum, wordnum
+        positions = self._positions_by_rule[rule]
+        if pos in positions:
+            return
+        correct_tag = train_sents[sentnum][wordnum][1]
+        if rule.replacement_tag == correct_tag:
+            effect = 1
+        elif rule.original_tag == correct_tag:
+            effect = -1
+        else:  # was wrong, remains wrong
+            effect = 0
+        positions[pos] = effect
+        self._rules_by_position[pos].add(rule)
+        old_score = self._rule_scores[rule]
+        self._rule_scores[rule] = old_score + effect
+        self._rules_by_score[old_score].discard(rule)
+        self._rules_by_score[old_score + effect].add(rule)
+
+    def _index_corpus(self, test_sents, train_sents):
+        """
+            Flat arrays of the corpus: word ids, current tag ids, and the sentence and
+            sentence bounds of every token
+        """
+        tags = {}
+        words = {}
+        lengths = np.array([len(sent) for sent in test_sents], dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        sentnums = np.repeat(np.arange(len(test_sents)), lengths)
+        for sent in train_sents:
+            for _, tag in sent:
+                tags.setdefault(tag, len(tags))
+        tag_ids = np.array([tags.setdefault(tag, len(tags)) for sent in test_sents
+                            for _, tag in sent], dtype=np.int64)
+        word_ids = np.array([words.setdefault(word, len(words)) for sent in test_sents
+                             for word, _ in sent], dtype=np.int64)
+        self._ids = {brill.Pos: tags, brill.Word: words}
+        self._arrays = {brill.Pos: tag_ids, brill.Word: word_ids, "offsets": offsets,
+                        "sentnums": sentnums, "starts": offsets[sentnums],
+                        "ends": offsets[sentnums + 1]}
+
+    def _init_mappings(self, test_sents, train_sents):
+        """
+            Same tables as BrillTaggerTrainer._init_mappings, the candidate rules being
+            found across the worker processes
+        """
+        self._tag_positions = collections.defaultdict(list)
+        self._rules_by_position = collections.defaultdict(set)
+        self._positions_by_rule = collections.defaultdict(dict)
+        self._rules_by_score = collections.defaultdict(set)
+        self._rule_scores = collections.defaultdict(int)
+        self._first_unknown_position = collections.defaultdict(int)
+        self._interned = {}
+        self._unknown_by_tag = {}
+        self._test_sents = test_sents
+        for sentnum, sent in enumerate(test_sents):
+            for wordnum, (_, tag) in enumerate(sent):
+                self._tag_positions[tag].append((sentnum, wordnum))
+        self._index_corpus(test_sents, train_sents)
+
+        # Neighbourhood of all the templates, when they are plain Templates
+        if all(type(template).get_neighborhood is Template.get_neighborhood
+               for template in self._templates):
+            positions = [0] + [position for template in self._templates
+                               for feature in template._features  # pylint: disable = W0212
+                               for position in feature.positions]
+            self._span = (min(positions), max(positions))
+
+        ranges = [(start, min(start + self._chunksize, len(test_sents)))
+                  for start in range(0, len(test_sents), self._chunksize)]
+        if self._workers == 1:
+            _set_worker_state(self._templates, test_sents, train_sents)
+            results = [_find_rules_chunk(sentnums) for sentnums in ranges]
+        else:
+            with pool_context().Pool(self._workers, initializer=_set_worker_state,
+                                     initargs=(self._templates, test_sents, train_sents)) as pool:
+                results = pool.map(_find_rules_chunk, ranges)
+        _set_worker_state(None, None, None)
+
+        for found in results:
+            for sentnum, wordnum, candidates in found:
+                tag, correct_tag = test_sents[sentnum][wordnum][1], train_sents[sentnum][wordnum][1]
+                for index, values in candidates:
+                    self._update_rule_applies(self._rule(index, tag, correct_tag, values),
+                                              sentnum, wordnum, train_sents)
+
+    def _clean(self):
+        BrillTaggerTrainer._clean(self)
+        self._interned = None
+        self._unknown_by_tag = None
+        self._ids = None
+        self._arrays = None
+        self._test_sents = None
+
+    def _scan(self, rule, start, stop):
+        """
+            Flat positions in [start, stop) where a rule applies, as rule.applies finds them
+        """
+        arrays = self._arrays
+        original = self._ids[brill.Pos].get(rule.original_tag)
+        if original is None:
+            return np.zeros(0, dtype=np.int64)
+        candidates = np.flatnonzero(arrays[brill.Pos][start:stop] == original) + start
+        for feature, value in rule._conditions:  # pylint: disable = W0212
+            if not len(candidates):
+                break
+            kind = type(feature)
+            if kind not in self._ids:
+                # Other features are checked by the rule itself
+                test_sents = self._test_sents
+                sentnums = arrays["sentnums"]
+                return np.array([flat for flat in candidates.tolist()
+                                 if rule.applies(test_sents[sentnums[flat]],
+                                                 flat - arrays["starts"][flat])], dtype=np.int64)
+            value_id = self._ids[kind].get(value)
+            if value_id is None:
+                return np.zeros(0, dtype=np.int64)
+            values = arrays[kind]
+            starts, ends = arrays["starts"][candidates], arrays["ends"][candidates]
+            matches = np.zeros(len(candidates), dtype=bool)
+            for position in feature.positions:
+                neighbours = candidates + position
+                inside = (neighbours >= starts) & (neighbours < ends)
+                matches |= inside & (values[np.where(inside, neighbours, 0)] == value_id)
+            candidates = candidates[matches]
+        return candidates
+
+    def _applying_positions(self, rule, unknown):
+        """
+            (sentnum, wordnum) positions from unknown on where a rule applies, in order:
+            the first positions of its original tag one by one, then blocks of the
+            arrays growing four times each time
+        """
+        arrays = self._arrays
+        offsets = arrays["offsets"]
+        positions = self._tag_positions[rule.original_tag]
+        first = bisect.bisect_left(positions, unknown)
+        for sentnum, wordnum in positions[first:first + PYTHON_SCAN]:
+            if rule.applies(self._test_sents[sentnum], wordnum):
+                yield sentnum, wordnum
+        if first + PYTHON_SCAN >= len(positions):
+            return
+        sentnum, wordnum = positions[first + PYTHON_SCAN]
+        start, size, total = int(offsets[sentnum]) + wordnum, SCAN_BLOCK, int(offsets[-1])
+        while start < total:
+            stop = min(start + size, total)
+            for flat in self._scan(rule, start, stop).tolist():
+                sentnum = int(arrays["sentnums"][flat])
+                yield sentnum, flat - int(offsets[sentnum])
+            start, size = stop, size * 4
+
+    def _best_rule(self, train_sents, test_sents, min_score, min_acc):
+        """
+            Same search as BrillTaggerTrainer._best_rule, with array scans
+        """
+        for max_score in sorted(self._rules_by_score.keys(), reverse=True):
+            if len(self._rules_by_score) == 0:
+                return None
+            if max_score < min_score or max_score <= 0:
+                return None
+            best_rules = list(self._rules_by_score[max_score])
+            if self._deterministic:
+                best_rules.sort(key=repr)
+            for rule in best_rules:
+                unknown = self._first_unknown_position.get(rule, (0, -1))
+                for sentnum, wordnum in self._applying_positions(rule, unknown):
+                    self._update_rule_applies(rule, sentnum, wordnum, train_sents)
+                    if self._rule_scores[rule] < max_score:
+                        self._set_first_unknown(rule, (sentnum, wordnum + 1))
+                        break  # The update demoted the rule.
+                if self._rule_scores[rule] == max_score:
+                    self._set_first_unknown(rule, (len(train_sents) + 1, 0))
+                    if min_acc is None:
+                        return rule
+                    changes = self._positions_by_rule[rule].values()
+                    num_fixed = len([c for c in changes if c == 1])
+                    num_broken = len([c for c in changes if c == -1])
+                    acc = num_fixed / (num_fixed + num_broken)
+                    if acc >= min_acc:
+                        return rule
+            assert min_acc is not None or not self._rules_by_score[max_score]
+            if not self._rules_by_score[max_score]:
+                del self._rules_by_score[max_score]
+        return None
+
+    def _apply_rule(self, rule, test_sents):
+        BrillTaggerTrainer._apply_rule(self, rule, test_sents)
+        arrays = self._arrays
+        flat = [arrays["offsets"][sentnum] + wordnum
+                for sentnum, wordnum in self._positions_by_rule[rule]]
+        tags = self._ids[brill.Pos]
+        arrays[brill.Pos][flat] = tags.setdefault(rule.replacement_tag, len(tags))
+
+    def _neighbors(self, test_sents, sentnum, wordnum):
+        """
+            Positions whose candidate rules may change when the tag at wordnum changes
+        """
+        if self._span is None:
+            neighbors = set()
+            for template in self._templates:
+                neighbors.update(template.get_neighborhood(test_sents[sentnum], wordnum))
+            return neighbors
+        first, last = self._span
+        return range(max(0, wordnum - last), min(wordnum - first + 1, len(test_sents[sentnum])))
+
+    def _update_rules(self, rule, train_sents, test_sents):
+        """
+            Same updates as BrillTaggerTrainer._update_rules, only looking at the rules
+            waiting for a scan whose original tag is the tag of each position
+        """
+        neighbors = set()
+        for sentnum, wordnum in self._positions_by_rule[rule]:
+            neighbors.update((sentnum, i) for i in self._neighbors(test_sents, sentnum, wordnum))
+
+        num_obsolete = num_new = num_unseen = 0
+        for sentnum, wordnum in neighbors:
+            test_sent = test_sents[sentnum]
+            correct_tag = train_sents[sentnum][wordnum][1]
+
+            old_rules = set(self._rules_by_position[sentnum, wordnum])
+            for old_rule in old_rules:
+                if not old_rule.applies(test_sent, wordnum):
+                    num_obsolete += 1
+                    self._update_rule_not_applies(old_rule, sentnum, wordnum)
+
+            for new_rule in self._applicable_rules(test_sent, wordnum, correct_tag):
+                if new_rule not in old_rules:
+                    num_new += 1
+                    if new_rule not in self._rule_scores:
+                        num_unseen += 1
+                    old_rules.add(new_rule)
+                    self._update_rule_applies(new_rule, sentnum, wordnum, train_sents)
+
+            position = (sentnum, wordnum)
+            waiting = self._unknown_by_tag.get(test_sent[wordnum][1], {})
+            for new_rule, pos in waiting.items():
+                if pos > position and new_rule not in old_rules:
+                    num_new += 1
+                    if new_rule.applies(test_sent, wordnum):
+                        self._update_rule_applies(new_rule, sentnum, wordnum, train_sents)
+
+        if self._trace > 3:
+            self._trace_update_rules(num_obsolete, num_new, num_unseen)
+
+
+if __name__ == "__main__":
+    import time
+    from nltk.corpus import treebank
+    from nltk.tag import DefaultTagger, UnigramTagger, BigramTagger, TrigramTagger
+
+    # Templates and initial backoff chain of train_brill_tagger in tagging.py
+    templates = [
+        brill.Template(brill.Pos([-1])),
+        brill.Template(brill.Pos([1])),
+        brill.Template(brill.Pos([-2])),
+        brill.Template(brill.Pos([2])),
+        brill.Template(brill.Pos([-2, -1])),
+        brill.Template(brill.Pos([1, 2])),
+        brill.Template(brill.Pos([-3, -2, -1])),
+        brill.Template(brill.Pos([1, 2, 3])),
+        brill.Template(brill.Pos([-1]), brill.Pos([1])),
+        brill.Template(brill.Word([-1])),
+        brill.Template(brill.Word([1])),
+        brill.Template(brill.Word([-2])),
+        brill.Template(brill.Word([2])),
+        brill.Template(brill.Word([-2, -1])),
+        brill.Template(brill.Word([1, 2])),
+        brill.Template(brill.Word([-3, -2, -1])),
+        brill.Template(brill.Word([1, 2, 3])),
+        brill.Template(brill.Word([-1]), brill.Word([1])),
+    ]
+    train_sents = treebank.tagged_sents()[:3000]
+    initial_tagger = DefaultTagger('NN')
+    for cls in [UnigramTagger, BigramTagger, TrigramTagger]:
+        initial_tagger = cls(train_sents, backoff=initial_tagger)
+
+    start = time.perf_counter()
+    expected = BrillTaggerTrainer(initial_tagger, templates, deterministic=True).train(train_sents)
+    baseline = time.perf_counter() - start
+    print(f"BrillTaggerTrainer: {baseline:.2f}s, {len(expected.rules())} rules")
+
+    for n_workers in (1, 2, 4, 8):
+        start = time.perf_counter()
+        tagger = ParallelBrillTaggerTrainer(initial_tagger, templates, deterministic=True,
+                                            workers=n_workers).train(train_sents)
+        elapsed = time.perf_counter() - start
+        print(f"ParallelBrillTaggerTrainer with {n_workers} workers: {elapsed:.2f}s; " +
+              f"speedup = {baseline / elapsed:.1f}x; " +
+              f"same rules = {tagger.rules() == expected.rules()}")
@@ -3,45 +3,67 @@
 """
 # pylint: disable=C0103
 
+import functools
 import re
-from nltk.corpus import wordnet
+from lazy import lazy_corpus
+
+# nltk and WordNet are loaded by the first lookup
+wordnet = lazy_corpus("wordnet")
 
 # Class Implementation
 
 
-class RepeatReplacer(object):  # pylint: disable = R0903
+class RepeatReplacer(object):
     """
-        Replace repeated characters in a word
+        Replace repeated characters in a word.
+        A word is kept once WordNet knows it: either it is a lemma name, looked up in a set
+        built on first use, or morphy reduces it to one (e.g. plurals), which is when
+        wordnet.synsets finds it. Results are kept in an LRU cache of word -> replacement.
     """
 
-    def __init__(self):
+    def __init__(self, cache_size=1 << 16):
         self.repeat_regexp = re.compile(r'(\w*)(\w)\2(\w*)')
         self.repl = r'\1\2\3'
+        self._lemmas = None
+        self._cached = functools.lru_cache(maxsize=cache_size)(self._replace)
+
+    def known(self, word):
+        """
+            Checks if the word exists in the wordnet
+        """
+        if self._lemmas is None:
+            self._lemmas = frozenset(wordnet.all_lemma_names())
+        word = word.lower()
+        return word in self._lemmas or wordnet.morphy(word) is not None
 
     def replace(self, word):
         """
             Does the replacement
         """
-        # Check if word exists in the wordnet
-        if wordnet.synsets(word):
-            return word
-
-        # Replaces
-        repl_word = self.repeat_regexp.sub(self.repl, word)
-        if repl_word != word:
-            return self.replace(repl_word)
-        return repl_word
-
-
-# Sample words
-wrd_0 = "looooooove"
-wrd_1 = "hippopotamus"
-wrd_2 = "coordination"
-wrd_3 = "uuuuuuuuuuuuh"
-
-# Replacing
-rep_replacer = RepeatReplacer()
-print(rep_replacer.replace(wrd_0))
-print(rep_replacer.replace(wrd_1))
-print(rep_replacer.replace(wrd_2))
-print(rep_replacer.replace(wrd_3))
+        return self._cached(word)
+
+    def _replace(self, word):
+        """
+            Removes one repeated character per step until the word is known
+        """
+        while not self.known(word):
+            repl_word = self.repeat_regexp.sub(self.repl, word)
+            if repl_word == word:
+                break
+            word = repl_word
+        return word
+
+
+if __name__ == "__main__":
+    # Sample words
+    wrd_0 = "looooooove"
+    wrd_1 = "hippopotamus"
+    wrd_2 = "coordination"
+    wrd_3 = "uuuuuuuuuuuuh"
+
+    # Replacing
+    rep_replacer = RepeatReplacer()
+    print(rep_replacer.replace(wrd_0))
+    print(rep_replacer.replace(wrd_1))
+    print(rep_replacer.replace(wrd_2))
+    print(rep_replacer.replace(wrd_3))
@@ -0,0 +1,136 @@
+"""
+    Map-reduce collocation finding: n-gram counts per shard across processes, merged
+    into the finders of nltk, and ranked with the vectorized nbest of association_scoring
+"""
+# pylint: disable=C0103
+
+import collections
+import itertools
+import os
+from nltk.collocations import BigramCollocationFinder, TrigramCollocationFinder
+from nltk.probability import FreqDist
+from association_scoring import nbest
+from batch_tagging import pool_context
+
+# Word filter of the current process, set before the pool is forked
+_word_filter = None
+
+
+def _set_word_filter(word_filter):
+    """
+        Sets the word filter of the current process
+    """
+    global _word_filter  # pylint: disable = W0603
+    _word_filter = word_filter
+
+
+def shards(words, n, size):
+    """
+        Splits a stream of words into (tokens, owned) shards: the windows starting in the
+        first owned tokens belong to the shard, and the n - 1 tokens after them are only
+        there to complete those windows. The last shard has no such lookahead.
+    """
+    iterator = iter(words)
+    tokens = list(itertools.islice(iterator, size + n - 1))
+    while len(tokens) > size:
+        yield tokens, size
+        tokens = tokens[size:] + list(itertools.islice(iterator, size))
+    if tokens:
+        yield tokens, len(tokens)
+
+
+def _count_shard(shard, n):
+    """
+        Counts the windows of a shard, like from_words of the finders. Candidate n-grams
+        holding a word rejected by the filter are never counted; the word and auxiliary
+        counts, used to score the candidates left, are not filtered.
+    """
+    tokens, owned = shard
+    columns = [tokens[offset:owned + offset] for offset in range(n)]
+    word_fd = collections.Counter(columns[0])
+    candidates = zip(*columns)
+    if _word_filter is not None:
+        rejected = {word for word in set(tokens) if _word_filter(word)}
+        candidates = (ngram for ngram in candidates if rejected.isdisjoint(ngram))
+    ngram_fd = collections.Counter(candidates)
+    if n == 2:
+        return word_fd, ngram_fd
+    return word_fd, collections.Counter(zip(columns[0], columns[1])), \
+        collections.Counter(zip(columns[0], columns[2])), ngram_fd
+
+
+def count_ngrams(words, n=2, word_filter=None, workers=None, shard_size=1 << 20, prefetch=2):
+    """
+        Builds a Bigram (n=2) or Trigram (n=3) CollocationFinder from a stream of words,
+        counting shards of shard_size words across worker processes. The result equals
+        from_words followed by apply_word_filter(word_filter).
+    """
+    if n not in (2, 3):
+        raise ValueError("Only bigram and trigram collocations are supported")
+    workers = workers or os.cpu_count() or 1
+    tables = None
+
+    def merge(counts):
+        nonlocal tables
+        if tables is None:
+            tables = [FreqDist(table) for table in counts]
+        else:
+            for table, count in zip(tables, counts):
+                table.update(count)
+
+    if workers == 1:
+        _set_word_filter(word_filter)
+        for shard in shards(words, n, shard_size):
+            merge(_count_shard(shard, n))
+    else:
+        with pool_context().Pool(workers, initializer=_set_word_filter,
+                                 initargs=(word_filter,)) as pool:
+            pending = collections.deque()
+            for shard in shards(words, n, shard_size):
+                pending.append(pool.apply_async(_count_shard, (shard, n)))
+                if len(pending) >= workers * prefetch:
+                    merge(pending.popleft().get())
+            while pending:
+                merge(pending.popleft().get())
+
+    if tables is None:
+        tables = [FreqDist() for _ in range(n * 2 - 2)]
+    if n == 2:
+        word_fd, ngram_fd = tables
+        return BigramCollocationFinder(word_fd, ngram_fd)
+    word_fd, bigram_fd, wildcard_fd, ngram_fd = tables
+    return TrigramCollocationFinder(word_fd, bigram_fd, wildcard_fd, ngram_fd)
+
+
+if __name__ == "__main__":
+    import time
+    from nltk.corpus import webtext
+    from nltk.metrics import BigramAssocMeasures, TrigramAssocMeasures
+    from normalization import stopword_set
+
+    stop = stopword_set("english")
+    words = [wd.lower() for fileid in webtext.fileids() for wd in webtext.words(fileid)] * 4
+
+    def word_filter(wd):
+        """
+            Filter of the refined collocations in collocations.py
+        """
+        return len(wd) < 3 or wd in stop
+
+    for finder_class, measures, n in ((BigramCollocationFinder, BigramAssocMeasures, 2),
+                                      (TrigramCollocationFinder, TrigramAssocMeasures, 3)):
+        start = time.perf_counter()
+        finder = finder_class.from_words(words)
+        finder.apply_word_filter(word_filter)
+        expected = {measure: finder.nbest(getattr(measures, measure), 20)
+                    for measure in ("likelihood_ratio", "chi_sq")}
+        print(f"{len(words)} words, n = {n}; from_words + nbest: {time.perf_counter() - start:.2f}s")
+
+        for workers in (1, 2, 4, 8):
+            start = time.perf_counter()
+            sharded = count_ngrams(words, n, word_filter, workers=workers, shard_size=1 << 17)
+            top = {measure: nbest(sharded, getattr(measures, measure), 20)
+                   for measure in ("likelihood_ratio", "chi_sq")}
+            print(f"Sharded with {workers} workers: {time.perf_counter() - start:.2f}s; " +
+                  f"same collocations = {top == expected}")
+        print()
@@ -0,0 +1,206 @@
+"""
+    Synonym and antonym index: the synonyms and antonyms of every WordNet lemma computed
+    once, as interned string ids in mapped arrays, so query expansion is a few lookups
+"""
+# pylint: disable=C0103
+
+import numpy as np
+from model_store import MappedTable, hash_keys, native_view, read_tables, write_tables
+
+SYNONYM_INDEX = "models/wordnet/synonym_index"
+KIND = "synonym_index"
+RELATIONS = ("synonyms", "antonyms")
+
+
+def synonym_table(words=()):
+    """
+        Synonyms and antonyms of every WordNet lemma name, of the inflected forms of
+        the WordNet exception lists, of the regular inflections of the lemma names, and
+        of the lowercased words, as synsets.py gathers them:
+        word -> (synonym names, antonym names)
+    """
+    from nltk.corpus import wordnet  # pylint: disable = C0415
+    from nltk.corpus.reader.wordnet import POS_LIST  # pylint: disable = C0415
+
+    vocabulary = dict.fromkeys(wordnet.all_lemma_names())
+    for pos in wordnet._exception_map:  # pylint: disable = W0212
+        vocabulary.update(dict.fromkeys(wordnet._exception_map[pos]))  # pylint: disable = W0212
+    # Regular inflections: the forms morphy reduces to a lemma name by one of its rules,
+    # which wordnet.synsets finds but aren't lemma names themselves ("dogs", "balances")
+    for pos in POS_LIST:
+        substitutions = wordnet.MORPHOLOGICAL_SUBSTITUTIONS[pos]
+        for name in wordnet.all_lemma_names(pos):
+            vocabulary.update(dict.fromkeys(name[:len(name) - len(new)] + old
+                                            for old, new in substitutions if name.endswith(new)))
+    vocabulary.update(dict.fromkeys(word.lower() for word in words))
+
+    table = {}
+    for word in vocabulary:
+        synonyms, antonyms = set(), set()
+        for synset in wordnet.synsets(word):
+            for lemma in synset.lemmas():
+                synonyms.add(lemma.name())
+                antonyms.update(antonym.name() for antonym in lemma.antonyms())
+        if synonyms:
+            table[word] = (synonyms, antonyms)
+    return table
+
+
+def save_synonym_index(table, path=SYNONYM_INDEX):
+    """
+        Saves a word -> (synonyms, antonyms) table: the words in a hash table, every
+        string once in a blob, and each relation as CSR arrays of string ids
+    """
+    strings = {word: index for index, word in enumerate(table)}
+    for names in (names for entry in table.values() for names in entry):
+        for name in sorted(names):
+            strings.setdefault(name, len(strings))
+
+    tables = {}
+    hash_keys(table.keys(), tables, "words")
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype="<i8")
+    np.cumsum([len(data) for data in encoded], out=offsets[1:])
+    tables["strings.offsets"] = offsets
+    tables["strings.blob"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+    for position, relation in enumerate(RELATIONS):
+        rows = [sorted(strings[name] for name in entry[position]) for entry in table.values()]
+        offsets = np.zeros(len(rows) + 1, dtype="<i8")
+        np.cumsum([len(row) for row in rows], out=offsets[1:])
+        tables[relation + ".offsets"] = offsets
+        tables[relation + ".ids"] = np.array([i for row in rows for i in row], dtype="<i4")
+    write_tables(path, KIND, tables, {"words": len(table), "strings": len(strings)})
+
+
+def build_synonym_index(path=SYNONYM_INDEX, words=()):
+    """
+        Build step: computes the synonym table from WordNet and saves it to path
+    """
+    table = synonym_table(words)
+    save_synonym_index(table, path)
+    return len(table)
+
+
+class SynonymIndex(object):
+    """
+        Read-only index saved by save_synonym_index, mapped from disk.
+
+        Words are lowercased, as wordnet.synsets does, and looked up in the hash table;
+        their row gives the string ids of their synonyms or antonyms, and strings are
+        decoded once, on first use. The vocabulary holds the lemma names and their
+        inflections, regular or listed as exceptions; words outside it have none
+    """
+
+    def __init__(self, path=SYNONYM_INDEX):
+        manifest, tables = read_tables(path)
+        if manifest["kind"] != KIND:
+            raise ValueError(f"{path} holds a {manifest['kind']} model, not a {KIND}")
+        self._words = MappedTable(tables, "words")
+        self._blob = memoryview(tables["strings.blob"])
+        self._string_offsets = native_view(tables["strings.offsets"])
+        self._strings = [None] * manifest["strings"]
+        self._rows = {relation: (native_view(tables[relation + ".offsets"]),
+                                 native_view(tables[relation + ".ids"])) for relation in RELATIONS}
+        self._arrays = {relation: (tables[relation + ".offsets"], tables[relation + ".ids"])
+                        for relation in RELATIONS}
+
+    def __len__(self):
+        return len(self._words)
+
+    def _string(self, index):
+        """
+            String of an id, decoded on first use
+        """
+        string = self._strings[index]
+        if string is None:
+            offsets = self._string_offsets
+            string = self._strings[index] = \
+                self._blob[offsets[index]:offsets[index + 1]].tobytes().decode("utf-8")
+        return string
+
+    def _related(self, row, relation):
+        """
+            Names related to the word of a row
+        """
+        if row < 0:
+            return set()
+        offsets, ids = self._rows[relation]
+        string = self._string
+        return {string(index) for index in ids[offsets[row]:offsets[row + 1]]}
+
+    def synonyms(self, word):
+        """
+            Lemma names of every synset of the word
+        """
+        return self._related(self._words.index(word.lower()), "synonyms")
+
+    def antonyms(self, word):
+        """
+            Antonym names of the lemmas of every synset of the word
+        """
+        return self._related(self._words.index(word.lower()), "antonyms")
+
+    def expand(self, words):
+        """
+            (synonyms, antonyms) of each word
+        """
+        index, related = self._words.index, self._related
+        rows = [index(word.lower()) for word in words]
+        return [(related(row, "synonyms"), related(row, "antonyms")) for row in rows]
+
+    def expand_ids(self, words, relation="synonyms"):
+        """
+            String ids related to each word, as CSR arrays: the ids of words[i] are
+            ids[offsets[i]:offsets[i + 1]]. strings() decodes them
+        """
+        rows = np.array([self._words.index(word.lower()) for word in words], dtype=np.int64)
+        row_offsets, row_ids = self._arrays[relation]
+        found = rows >= 0
+        starts = np.where(found, row_offsets[np.maximum(rows, 0)], 0)
+        lengths = np.where(found, row_offsets[np.maximum(rows, 0) + 1] - starts, 0)
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        entries = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return offsets, row_ids[entries]
+
+    def strings(self, ids):
+        """
+            Strings of string ids
+        """
+        return [self._string(index) for index in ids]
+
+
+if __name__ == "__main__":
+    import time
+    from nltk.corpus import treebank, wordnet
+
+    start = time.perf_counter()
+    size = build_synonym_index(words=treebank.words())
+    print(f"Indexed {size} words in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    index = SynonymIndex()
+    print(f"Index loaded in {(time.perf_counter() - start) * 1e3:.1f}ms")
+
+    terms = sorted(set(word.lower() for word in treebank.words()))[:5000]
+    start = time.perf_counter()
+    expected = []
+    for term in terms:
+        synonyms, antonyms = set(), set()
+        for synset in wordnet.synsets(term):
+            for lemma in synset.lemmas():
+                synonyms.add(lemma.name())
+                antonyms.update(antonym.name() for antonym in lemma.antonyms())
+        expected.append((synonyms, antonyms))
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expanded = index.expand(terms)
+    expand_time = time.perf_counter() - start
+    start = time.perf_counter()
+    index.expand_ids(terms)
+    ids_time = time.perf_counter() - start
+    print(f"{len(terms)} terms: nested loops {loop_time:.3f}s; expand {expand_time:.3f}s " +
+          f"({expand_time / len(terms) * 1e6:.1f}us per term); expand_ids {ids_time:.3f}s; " +
+          f"same = {expanded == expected}")
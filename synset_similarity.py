@@ -0,0 +1,394 @@
+"""
+    Synset similarity engine: the depths and hypernym distances of every synset computed
+    once, so path, Leacock-Chodorow and Wu-Palmer similarities are lookups, for one pair
+    or for arrays of pairs at once
+"""
+# pylint: disable=C0103
+
+import math
+import numpy as np
+from nltk.corpus.reader.wordnet import WordNetError
+
+# Distance between synsets without a common hypernym
+NO_PATH = 1 << 40
+# Subsumer standing for the fake root of simulate_root
+FAKE_ROOT = -1
+# Pairs scored at once by similarity_matrix
+MATRIX_BLOCK = 1 << 16
+
+
+class SynsetSimilarity(object):
+    """
+        Gives the same results as Synset.path_similarity, lch_similarity and
+        wup_similarity (None becoming NaN in the array methods).
+
+        Every synset is indexed with its hypernym closure: its ancestors (itself
+        included) and their shortest distances, its min and max depths, and its
+        farthest ancestor distance, under which simulate_root puts the fake root.
+        The shortest path between two synsets is the least sum of distances over
+        their common ancestors, so a pair only intersects two small ancestor tables.
+        Pairs in the array methods look their ancestors up in a sorted array of
+        (synset, ancestor) keys with one binary search each.
+        Synsets missing from the index are added on first use, with their hypernyms
+    """
+
+    def __init__(self, synsets=()):
+        self._synsets = []
+        self._ids = {}
+        self._ancestors = []
+        self._min_depth = []
+        self._max_depth = []
+        self._farthest = []
+        self._need_root = []
+        self._taxonomy_depths = {}
+        self._arrays = None
+        self.index(synsets)
+
+    def __len__(self):
+        return len(self._synsets)
+
+    def index(self, synsets):
+        """
+            Adds synsets and their hypernyms to the index
+        """
+        for synset in synsets:
+            self._node(synset)
+        return self
+
+    def _node(self, synset):
+        """
+            Index of a synset, indexing it after its hypernyms if needed
+        """
+        index = self._ids.get(synset)
+        if index is not None:
+            return index
+        parents = [self._node(hypernym)
+                   for hypernym in synset.hypernyms() + synset.instance_hypernyms()]
+        index = len(self._synsets)
+        ancestors = {index: 0}
+        for parent in parents:
+            for ancestor, distance in self._ancestors[parent].items():
+                if distance + 1 < ancestors.get(ancestor, NO_PATH):
+                    ancestors[ancestor] = distance + 1
+
+        self._synsets.append(synset)
+        self._ids[synset] = index
+        self._ancestors.append(ancestors)
+        self._min_depth.append(1 + min(self._min_depth[p] for p in parents) if parents else 0)
+        self._max_depth.append(1 + max(self._max_depth[p] for p in parents) if parents else 0)
+        self._farthest.append(max(ancestors.values()))
+        self._need_root.append(bool(synset._needs_root()))  # pylint: disable = W0212
+        self._arrays = None
+        return index
+
+    # One pair
+
+    def _distance(self, first, second, simulate_root):
+        """
+            Shortest path distance between two indexed synsets, None if there is none
+        """
+        if first == second:
+            return 0
+        ancestors, others = self._ancestors[first], self._ancestors[second]
+        if len(ancestors) > len(others):
+            ancestors, others = others, ancestors
+        distance = min((d + others[a] for a, d in ancestors.items() if a in others),
+                       default=NO_PATH)
+        if simulate_root:
+            distance = min(distance, self._farthest[first] + self._farthest[second] + 2)
+        return None if distance >= NO_PATH else distance
+
+    def _taxonomy_depth(self, first):
+        """
+            Max depth of the taxonomy of a synset's POS, as lch_similarity computes it
+        """
+        synset = self._synsets[first]
+        pos = synset._pos  # pylint: disable = W0212
+        if pos not in self._taxonomy_depths:
+            reader = synset._wordnet_corpus_reader  # pylint: disable = W0212
+            if pos not in reader._max_depth:  # pylint: disable = W0212
+                reader._compute_max_depth(pos, self._need_root[first])  # pylint: disable = W0212
+            self._taxonomy_depths[pos] = reader._max_depth[pos]  # pylint: disable = W0212
+        return self._taxonomy_depths[pos]
+
+    def _subsumer(self, first, second, simulate_root):
+        """
+            Subsumer wup_similarity picks: among the common hypernyms of least min depth,
+            the first synset itself or the first by name; FAKE_ROOT when the fake root
+            of simulate_root (named *ROOT*, so sorted first) is among them, None if
+            there is no common hypernym
+        """
+        ancestors = self._ancestors[second]
+        common = [a for a in self._ancestors[first] if a in ancestors]
+        best = max((self._min_depth[a] for a in common), default=None)
+        if simulate_root and (best is None or best == 0):
+            return first if first in ancestors and self._min_depth[first] == 0 else FAKE_ROOT
+        if best is None:
+            return None
+        if first in ancestors and self._min_depth[first] == best:
+            return first
+        return min((a for a in common if self._min_depth[a] == best),
+                   key=lambda a: self._synsets[a].name())
+
+    def shortest_path_distance(self, synset1, synset2, simulate_root=False):
+        """
+            Synset.shortest_path_distance
+        """
+        return self._distance(self._node(synset1), self._node(synset2), simulate_root)
+
+    def lowest_common_hypernyms(self, synset1, synset2, use_min_depth=False):
+        """
+            Synset.lowest_common_hypernyms, without simulate_root
+        """
+        first, second = self._node(synset1), self._node(synset2)
+        depths = self._min_depth if use_min_depth else self._max_depth
+        common = [a for a in self._ancestors[first] if a in self._ancestors[second]]
+        best = max((depths[a] for a in common), default=None)
+        return sorted(self._synsets[a] for a in common if depths[a] == best)
+
+    def path_similarity(self, synset1, synset2, simulate_root=True):
+        """
+            Synset.path_similarity
+        """
+        first, second = self._node(synset1), self._node(synset2)
+        distance = self._distance(first, second, simulate_root and self._need_root[first])
+        return None if distance is None else 1.0 / (distance + 1)
+
+    def lch_similarity(self, synset1, synset2, simulate_root=True):
+        """
+            Synset.lch_similarity
+        """
+        # pylint: disable = W0212
+        if synset1._pos != synset2._pos:
+            raise WordNetError("Computing the lch similarity requires "
+                               "%s and %s to have the same part of speech." % (synset1, synset2))
+        first, second = self._node(synset1), self._node(synset2)
+        depth = self._taxonomy_depth(first)
+        distance = self._distance(first, second, simulate_root and self._need_root[first])
+        if distance is None or depth == 0:
+            return None
+        return -math.log((distance + 1) / (2.0 * depth))
+
+    def wup_similarity(self, synset1, synset2, simulate_root=True):
+        """
+            Synset.wup_similarity
+        """
+        first, second = self._node(synset1), self._node(synset2)
+        simulate_root = simulate_root and self._need_root[first]
+        subsumer = self._subsumer(first, second, simulate_root)
+        if subsumer is None:
+            return None
+        if subsumer == FAKE_ROOT:
+            depth = 1
+            len1, len2 = self._farthest[first] + 1, self._farthest[second] + 1
+        else:
+            depth = self._max_depth[subsumer] + 1
+            len1 = self._distance(first, subsumer, simulate_root)
+            len2 = self._distance(second, subsumer, simulate_root)
+        len1 += depth
+        len2 += depth
+        return (2.0 * depth) / (len1 + len2)
+
+    # Arrays of pairs
+
+    def _compile(self):
+        """
+            Arrays of the index: the ancestor tables as sorted (synset, ancestor) keys
+            and their distances, the depths, and the rank of each synset name
+        """
+        if self._arrays is not None:
+            return self._arrays
+        size = len(self._synsets)
+        rows, cols, dists = [], [], []
+        for index, ancestors in enumerate(self._ancestors):
+            for ancestor in sorted(ancestors):
+                rows.append(index)
+                cols.append(ancestor)
+                dists.append(ancestors[ancestor])
+        rows, cols = np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)
+        by_name = np.array(sorted(range(size), key=lambda a: self._synsets[a].name()),
+                           dtype=np.int64)
+        ranks = np.empty(size, dtype=np.int64)
+        ranks[by_name] = np.arange(size)
+        pos_ids = {}
+        self._arrays = {
+            "starts": np.searchsorted(rows, np.arange(size + 1)),
+            "keys": rows * size + cols,
+            "cols": cols,
+            "dists": np.array(dists, dtype=np.int64),
+            "min_depth": np.array(self._min_depth, dtype=np.int64),
+            "max_depth": np.array(self._max_depth, dtype=np.int64),
+            "farthest": np.array(self._farthest, dtype=np.int64),
+            "need_root": np.array(self._need_root, dtype=bool),
+            "pos": np.array([pos_ids.setdefault(synset._pos, len(pos_ids))  # pylint: disable = W0212
+                             for synset in self._synsets], dtype=np.int64),
+            "ranks": ranks,
+            "by_name": by_name,
+        }
+        return self._arrays
+
+    def _ids_of(self, synsets):
+        """
+            Array of the indexes of synsets
+        """
+        ids = np.array([self._node(synset) for synset in synsets], dtype=np.int64)
+        self._compile()
+        return ids
+
+    def _lookup(self, firsts, seconds):
+        """
+            For every ancestor of each second synset: the position of its row in the
+            ancestor tables, where the first synset's row for it is (if found), and
+            the start of each pair's rows
+        """
+        arrays = self._arrays
+        starts = arrays["starts"]
+        lengths = starts[seconds + 1] - starts[seconds]
+        offsets = np.cumsum(lengths) - lengths
+        entries = np.repeat(starts[seconds] - offsets, lengths) + np.arange(int(lengths.sum()))
+        keys = np.repeat(firsts, lengths) * len(self._synsets) + arrays["cols"][entries]
+        found = np.minimum(np.searchsorted(arrays["keys"], keys), len(arrays["keys"]) - 1)
+        return entries, found, arrays["keys"][found] == keys, offsets
+
+    def _distances(self, firsts, seconds, simulate_root):
+        """
+            Shortest path distances of pairs, NO_PATH where there is none
+        """
+        if not len(firsts):
+            return np.zeros(0, dtype=np.int64)
+        arrays = self._arrays
+        entries, found, common, offsets = self._lookup(firsts, seconds)
+        totals = np.where(common, arrays["dists"][found] + arrays["dists"][entries], NO_PATH)
+        distances = np.minimum.reduceat(totals, offsets)
+        farthest = arrays["farthest"]
+        return np.where(simulate_root,
+                        np.minimum(distances, farthest[firsts] + farthest[seconds] + 2), distances)
+
+    def _subsumers(self, firsts, seconds, simulate_root):
+        """
+            _subsumer of pairs, with -2 for None
+        """
+        arrays = self._arrays
+        size = len(self._synsets)
+        entries, _, common, offsets = self._lookup(firsts, seconds)
+        cols, min_depth = arrays["cols"][entries], arrays["min_depth"]
+        scores = np.where(common, min_depth[cols] * size + (size - 1 - arrays["ranks"][cols]), -1)
+        best = np.maximum.reduceat(scores, offsets)
+        best_depth = np.where(best >= 0, best // size, -1)
+        subsumers = arrays["by_name"][size - 1 - best % size]
+
+        # Whether the first synset is a hypernym of the second one
+        keys = seconds * size + firsts
+        found = np.minimum(np.searchsorted(arrays["keys"], keys), len(arrays["keys"]) - 1)
+        first_common = arrays["keys"][found] == keys
+        subsumers = np.where(first_common & (min_depth[firsts] == best_depth), firsts, subsumers)
+
+        fake = simulate_root & (best_depth <= 0)
+        fake_subsumers = np.where(first_common & (min_depth[firsts] == 0), firsts, FAKE_ROOT)
+        subsumers = np.where(fake, fake_subsumers, subsumers)
+        return np.where(~simulate_root & (best_depth < 0), -2, subsumers)
+
+    def pair_similarities(self, synsets1, synsets2, measure="path", simulate_root=True):
+        """
+            Similarity of each pair of synsets1 and synsets2, measure being "path",
+            "lch" or "wup". NaN where nltk gives None, or where lch gets two POS
+        """
+        firsts, seconds = self._ids_of(synsets1), self._ids_of(synsets2)
+        arrays = self._arrays
+        similarities = np.full(len(firsts), np.nan)
+        if not len(firsts):
+            return similarities
+        roots = simulate_root & arrays["need_root"][firsts]
+
+        if measure == "path":
+            distances = self._distances(firsts, seconds, roots)
+            found = distances < NO_PATH
+            similarities[found] = 1.0 / (distances[found] + 1)
+        elif measure == "lch":
+            same_pos = arrays["pos"][firsts] == arrays["pos"][seconds]
+            distances = self._distances(firsts, seconds, roots)
+            for pos in np.unique(arrays["pos"][firsts]).tolist():
+                pairs = np.flatnonzero(same_pos & (arrays["pos"][firsts] == pos) &
+                                       (distances < NO_PATH))
+                if not len(pairs):
+                    continue
+                depth = self._taxonomy_depth(int(firsts[pairs[0]]))
+                if depth == 0:
+                    continue
+                # math.log on the few distinct distances, to match nltk to the bit
+                values, inverse = np.unique(distances[pairs], return_inverse=True)
+                logs = np.array([-math.log((value + 1) / (2.0 * depth)) for value in values.tolist()])
+                similarities[pairs] = logs[inverse]
+        elif measure == "wup":
+            subsumers = self._subsumers(firsts, seconds, roots)
+            fake, real = subsumers == FAKE_ROOT, subsumers >= 0
+            depths = np.where(real, arrays["max_depth"][np.maximum(subsumers, 0)] + 1, 1)
+            len1 = arrays["farthest"][firsts] + 1
+            len2 = arrays["farthest"][seconds] + 1
+            len1[real] = self._distances(firsts[real], subsumers[real], roots[real])
+            len2[real] = self._distances(seconds[real], subsumers[real], roots[real])
+            scored = real | fake
+            similarities[scored] = (2.0 * depths[scored]) / (
+                (len1[scored] + depths[scored]) + (len2[scored] + depths[scored]))
+        else:
+            raise ValueError(f"Unknown measure {measure!r}, expected one of path, lch, wup")
+        return similarities
+
+    def similarities(self, synset, candidates, measure="path", simulate_root=True):
+        """
+            Similarity of one synset to each candidate
+        """
+        candidates = list(candidates)
+        return self.pair_similarities([synset] * len(candidates), candidates, measure,
+                                      simulate_root)
+
+    def similarity_matrix(self, synsets1, synsets2, measure="path", simulate_root=True):
+        """
+            Matrix of the similarities of each synset of synsets1 (rows) to each synset
+            of synsets2 (columns), scored in blocks of rows
+        """
+        synsets1, synsets2 = list(synsets1), list(synsets2)
+        matrix = np.full((len(synsets1), len(synsets2)), np.nan)
+        if not synsets2:
+            return matrix
+        step = max(1, MATRIX_BLOCK // len(synsets2))
+        for start in range(0, len(synsets1), step):
+            rows = synsets1[start:start + step]
+            matrix[start:start + len(rows)] = self.pair_similarities(
+                [synset for synset in rows for _ in synsets2], synsets2 * len(rows),
+                measure, simulate_root).reshape(len(rows), len(synsets2))
+        return matrix
+
+
+if __name__ == "__main__":
+    import time
+    from nltk.corpus import wordnet
+
+    candidates = list(wordnet.all_synsets("n"))[:20000:10] + list(wordnet.all_synsets("v"))[:2000]
+    queries = candidates[:20]
+
+    start = time.perf_counter()
+    engine = SynsetSimilarity(candidates)
+    print(f"Indexed {len(engine)} synsets in {time.perf_counter() - start:.2f}s")
+
+    for name in ("path", "lch", "wup"):
+        pairs = [(query, candidate) for query in queries for candidate in candidates
+                 if name != "lch" or query.pos() == candidate.pos()][:20000]
+        start = time.perf_counter()
+        expected = [getattr(first, f"{name}_similarity")(second) for first, second in pairs]
+        nltk_time = time.perf_counter() - start
+        start = time.perf_counter()
+        single = [getattr(engine, f"{name}_similarity")(first, second) for first, second in pairs]
+        single_time = time.perf_counter() - start
+        start = time.perf_counter()
+        batch = engine.pair_similarities(*zip(*pairs), measure=name)
+        batch_time = time.perf_counter() - start
+        same = single == expected and all(
+            (value is None and math.isnan(got)) or value == got
+            for value, got in zip(expected, batch.tolist()))
+        print(f"{name}: {len(pairs)} pairs; nltk {nltk_time:.2f}s; engine {single_time:.2f}s; " +
+              f"arrays {batch_time:.3f}s; same = {same}")
+
+    start = time.perf_counter()
+    matrix = engine.similarity_matrix(queries, candidates, "wup")
+    print(f"{matrix.shape} wup matrix in {time.perf_counter() - start:.2f}s")
@@ -3,53 +3,78 @@
 """
 # pylint: disable=C0103
 
-from nltk.corpus import wordnet
-
-# Getting synsets from a sample word.
-word = "balance"
-syn = wordnet.synsets(word)
-print(f"Synsets of {word} = {syn}\n")
-
-# Getting the name of the synonym and definiton.
-syn_name = syn[0].name()
-syn_def = syn[0].definition()
-print(f"N: {syn_name}, def: {syn_def}\n")
-
-# Hypernyms: generalization, Hyponyms: specification. Up and down a tree.
-hypernyms = syn[0].hypernyms()
-print(f"Hypernyms = {hypernyms}\n")
-hyponyms = hypernyms[0].hyponyms()
-print(f"Hyponyms of the first hypernyms = {hyponyms}\n")
-
-# Part of speech. Noun (n), Adjective (a), Adverb (r), Verb(v)
-pos = syn[0].pos()
-print(f"Our word is a '{pos}'\n")
-
-# Using lemmas to get all synonyms for our word.
-synonyms = []
-for synset in wordnet.synsets(word):
-    for lemma in synset.lemmas():
-        synonyms.append(lemma.name())
-synonyms = set(synonyms)
-print(f"Synonyms for {word} : {synonyms}\n")
-
-# Using lemmas to get antonyms
-antonyms = []
-for synset in wordnet.synsets(word):
-    for lemma in synset.lemmas():
-        antonyms += lemma.antonyms()
-antonyms = set([antn.name() for antn in antonyms])
-print(f"Antonyms for {word} : {antonyms}\n")
-
-# Calculating similarity between words -> proximity in the tree of synsets.
-# Wu-Palmer Similarity
-wup_simi = hypernyms[0].wup_similarity(syn[0])
-print(f"Wup similarity of {hypernyms[0].name()} and {syn[0].name()} = {wup_simi}\n")
-
-# Path similarity
-path_simi = hypernyms[0].path_similarity(syn[0])
-print(f"Path similarity of {hypernyms[0].name()} and {syn[0].name()} = {path_simi}\n")
-
-# Leacock Chordorow similarity
-lch_simi = hypernyms[0].lch_similarity(syn[0])
-print(f"LCH similarity of {hypernyms[0].name()} and {syn[0].name()} = {lch_simi}\n")
+from lazy import lazy_corpus
+
+# nltk and WordNet are loaded by the first lookup
+wordnet = lazy_corpus("wordnet")
+
+if __name__ == "__main__":
+    import os
+    from synonym_index import SYNONYM_INDEX, SynonymIndex, build_synonym_index
+    from synset_similarity import SynsetSimilarity
+
+    # Getting synsets from a sample word.
+    word = "balance"
+    syn = wordnet.synsets(word)
+    print(f"Synsets of {word} = {syn}\n")
+
+    # Getting the name of the synonym and definiton.
+    syn_name = syn[0].name()
+    syn_def = syn[0].definition()
+    print(f"N: {syn_name}, def: {syn_def}\n")
+
+    # Hypernyms: generalization, Hyponyms: specification. Up and down a tree.
+    hypernyms = syn[0].hypernyms()
+    print(f"Hypernyms = {hypernyms}\n")
+    hyponyms = hypernyms[0].hyponyms()
+    print(f"Hyponyms of the first hypernyms = {hyponyms}\n")
+
+    # Part of speech. Noun (n), Adjective (a), Adverb (r), Verb(v)
+    pos = syn[0].pos()
+    print(f"Our word is a '{pos}'\n")
+
+    # Using lemmas to get all synonyms for our word.
+    synonyms = []
+    for synset in wordnet.synsets(word):
+        for lemma in synset.lemmas():
+            synonyms.append(lemma.name())
+    synonyms = set(synonyms)
+    print(f"Synonyms for {word} : {synonyms}\n")
+
+    # Using lemmas to get antonyms
+    antonyms = []
+    for synset in wordnet.synsets(word):
+        for lemma in synset.lemmas():
+            antonyms += lemma.antonyms()
+    antonyms = set([antn.name() for antn in antonyms])
+    print(f"Antonyms for {word} : {antonyms}\n")
+
+    # Same sets from the prebuilt synonym index, for many words in one call
+    if not os.path.isdir(SYNONYM_INDEX):
+        build_synonym_index()
+    index = SynonymIndex()
+    [(index_synonyms, index_antonyms), *_] = index.expand([word, "good", "fast"])
+    print(f"Index: same synonyms = {index_synonyms == synonyms}, " +
+          f"same antonyms = {index_antonyms == antonyms}\n")
+
+    # Calculating similarity between words -> proximity in the tree of synsets.
+    # Wu-Palmer Similarity
+    wup_simi = hypernyms[0].wup_similarity(syn[0])
+    print(f"Wup similarity of {hypernyms[0].name()} and {syn[0].name()} = {wup_simi}\n")
+
+    # Path similarity
+    path_simi = hypernyms[0].path_similarity(syn[0])
+    print(f"Path similarity of {hypernyms[0].name()} and {syn[0].name()} = {path_simi}\n")
+
+    # Leacock Chordorow similarity
+    lch_simi = hypernyms[0].lch_similarity(syn[0])
+    print(f"LCH similarity of {hypernyms[0].name()} and {syn[0].name()} = {lch_simi}\n")
+
+    # Same measures from the similarity engine, and every synset of the word against
+    # the synsets of another one at once
+    engine = SynsetSimilarity(syn)
+    print(f"Engine: wup = {engine.wup_similarity(hypernyms[0], syn[0])}, " +
+          f"path = {engine.path_similarity(hypernyms[0], syn[0])}, " +
+          f"lch = {engine.lch_similarity(hypernyms[0], syn[0])}\n")
+    matrix = engine.similarity_matrix(syn, wordnet.synsets("scale"), "wup")
+    print(f"Wup similarities of the synsets of {word} and scale:\n{matrix}\n")
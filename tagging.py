@@ -3,55 +3,12 @@
 """
 # pylint: disable=C0103
 
-import pickle
-from nltk.tokenize import word_tokenize
-from nltk.corpus import treebank, wordnet
-from nltk.probability import FreqDist
-from nltk.tag.sequential import ClassifierBasedPOSTagger
-from nltk.tag import brill, brill_trainer, tnt, SequentialBackoffTagger
-from nltk.tag import DefaultTagger, UnigramTagger, BigramTagger, TrigramTagger, AffixTagger
-from samples import sample
-
-# Test and training variables
-test_sents = treebank.tagged_sents()[3000:]
-train_sents = treebank.tagged_sents()[:3000]
-tk_sample = word_tokenize(sample)
-
-# Default tagger - Nouns
-df_tagger = DefaultTagger('NN')
-tagged = df_tagger.tag(tk_sample)
-accuracy = df_tagger.evaluate(test_sents)
-print(f"Tagged text: {tagged}; acc = {accuracy}\n")
-
-# Unigram tagger
-ug_tagger = UnigramTagger(train_sents)
-tagged = ug_tagger.tag(tk_sample)
-accuracy = ug_tagger.evaluate(test_sents)
-print(f"Tagged text: {tagged}; acc = {accuracy}\n")
-
-# Backoff tagger: rely on other tagger(backoff) when the current one does not know how to evaluate
-ugb_tagger = UnigramTagger(train_sents, backoff=df_tagger)
-accuracy = ugb_tagger.evaluate(test_sents)
-print(f"Accuracy of backoff: {accuracy}\n")
-
-# Saving pickle and testing it.
-with open('pickles/pos-taggers/unigram_backoff_tagger.pickle', 'wb') as file:
-    pickle.dump(ugb_tagger, file)
-
-with open('pickles/pos-taggers/unigram_backoff_tagger.pickle', 'rb') as file:
-    pk_tagger = pickle.load(file)
-
-accuracy = pk_tagger.evaluate(test_sents)
-print(f"Accuracy of pickled backoff: {accuracy}\n")
-
-# Testing bigram and trigram taggers
-bg_tagger = BigramTagger(train_sents)
-accuracy = bg_tagger.evaluate(test_sents)
-print(f"Accuracy of bigram: {accuracy}\n")
-
-tg_tagger = TrigramTagger(train_sents)
-accuracy = tg_tagger.evaluate(test_sents)
-print(f"Accuracy of trigram: {accuracy}\n")
+from lazy import LazyResource, lazy_corpus
+
+# nltk and the corpora are loaded by their first use: importing nltk takes most of the
+# import time of this module (scipy, through nltk.collocations)
+treebank = lazy_corpus("treebank")
+wordnet = lazy_corpus("wordnet")
 
 
 def make_backoffs(training, tagger_classes, backoff=None):
@@ -64,27 +21,16 @@ def make_backoffs(training, tagger_classes, backoff=None):
     return backoff
 
 
-# Testing the function with all 4 taggers
-bc_tagger = make_backoffs(
-    train_sents, [UnigramTagger, BigramTagger, TrigramTagger], backoff=df_tagger)
-accuracy = bc_tagger.evaluate(test_sents)
-print(f"Accuracy of the backoff chain tagger: {accuracy}\n")
-
-# Saving pickle
-with open('pickles/pos-taggers/backoff_chain_tagger.pickle', 'wb') as file:
-    pickle.dump(bc_tagger, file)
-
-# Affix tagger: context is either the prefix or the suffix
-af_tagger = AffixTagger(train_sents)
-accuracy = af_tagger.evaluate(test_sents)
-print(f"Accuracy of the affix tagger: {accuracy}\n")
-
-
 # Brill Tagging
-def train_brill_tagger(initial_tagger, training, **kwargs):
+def train_brill_tagger(initial_tagger, training, workers=None, **kwargs):
     """
-        Function to train a brill tagger. Uses rules to correct the results of a tagger
+        Function to train a brill tagger. Uses rules to correct the results of a tagger.
+        Candidate rules are found across a pool of workers (all the CPUs by default),
+        learning the same rules as BrillTaggerTrainer
     """
+    from nltk.tag import brill  # pylint: disable = C0415
+    from parallel_brill import ParallelBrillTaggerTrainer  # pylint: disable = C0415
+
     templates = [
         brill.Template(brill.Pos([-1])),
         brill.Template(brill.Pos([1])),
@@ -105,68 +51,222 @@ def train_brill_tagger(initial_tagger, training, **kwargs):
         brill.Template(brill.Word([1, 2, 3])),
         brill.Template(brill.Word([-1]), brill.Word([1])),
     ]
-    trainer = brill_trainer.BrillTaggerTrainer(initial_tagger, templates, deterministic=True)
+    trainer = ParallelBrillTaggerTrainer(initial_tagger, templates, deterministic=True,
+                                         workers=workers)
     return trainer.train(training, **kwargs)
 
 
-# Brill tagger using the previous backoff chain tagger
-br_tagger = train_brill_tagger(bc_tagger, train_sents)
-accuracy = br_tagger.evaluate(test_sents)
-print(f"Accuracy of the brill tagger: {accuracy}\n")
-
-# Saving pickle
-with open('pickles/pos-taggers/brill_tagger.pickle', 'wb') as file:
-    pickle.dump(br_tagger, file)
-
-# TnT tagger with default tagger for unknown words
-tnt_tagger = tnt.TnT(unk=df_tagger, Trained=True, N=200)
-tnt_tagger.train(train_sents)
-accuracy = tnt_tagger.evaluate(test_sents)
-print(f"Accuracy of the tnt tagger: {accuracy}\n")
-
-# Saving pickle
-with open('pickles/pos-taggers/tnt_tagger.pickle', 'wb') as file:
-    pickle.dump(tnt_tagger, file)
-
-
 # Tagging using the wordnet
-class WordNetTagger(SequentialBackoffTagger):
+def _wordnet_tagger_class():
     """
-        Class implementation of the wordnet tagger
+        WordNetTagger, defined on first use, since it subclasses an nltk tagger
     """
+    from nltk.probability import FreqDist  # pylint: disable = C0415
+    from nltk.tag import SequentialBackoffTagger  # pylint: disable = C0415
 
-    def __init__(self, *args, **kwargs):
-        SequentialBackoffTagger.__init__(self, *args, **kwargs)
-        self.wordnet_tag_map = {
-            'n': 'NN',
-            's': 'JJ',
-            'a': 'JJ',
-            'r': 'RB',
-            'v': 'VB'
-        }
-        self.fd = FreqDist(treebank.words())
-
-    def choose_tag(self, tokens, index, history):
+    class WordNetTagger(SequentialBackoffTagger):
         """
-            Choses a POS tag based on the wordnet tag
+            Class implementation of the wordnet tagger
         """
 
-        word = tokens[index]
-        for synset in wordnet.synsets(word):
-            self.fd[synset.pos()] += 1
-        return self.wordnet_tag_map.get(self.fd.max())
-
-
-# Using the wordnet tagger
-wn_tagger = WordNetTagger()
-accuracy = wn_tagger.evaluate(test_sents)
-print(f"Accuracy of the wordnet tagger: {accuracy}\n")
-
-# Classifier tagging
-cl_tagger = ClassifierBasedPOSTagger(train=train_sents)
-accuracy = cl_tagger.evaluate(test_sents)
-print(f"Accuracy of the classifier tagger: {accuracy}\n")
-
-# Saving pickle - Heavy one
-with open('pickles/pos-taggers/classifier_tagger.pickle', 'wb') as file:
-    pickle.dump(cl_tagger, file)
+        def __init__(self, *args, **kwargs):
+            SequentialBackoffTagger.__init__(self, *args, **kwargs)
+            self.wordnet_tag_map = {
+                'n': 'NN',
+                's': 'JJ',
+                'a': 'JJ',
+                'r': 'RB',
+                'v': 'VB'
+            }
+            self._fd = None
+
+        @property
+        def fd(self):
+            """
+                Treebank word counts, updated with the synset POS of each tagged word.
+                Counted on first use, so making the tagger does not load treebank
+            """
+            if self._fd is None:
+                self._fd = FreqDist(treebank.words())
+            return self._fd
+
+        def choose_tag(self, tokens, index, history):
+            """
+                Choses a POS tag based on the wordnet tag
+            """
+
+            word = tokens[index]
+            for synset in wordnet.synsets(word):
+                self.fd[synset.pos()] += 1
+            return self.wordnet_tag_map.get(self.fd.max())
+
+    # Pickled as tagging.WordNetTagger, which __getattr__ resolves to this class
+    WordNetTagger.__qualname__ = "WordNetTagger"
+    return WordNetTagger
+
+
+_wordnet_tagger = LazyResource(_wordnet_tagger_class, "WordNetTagger")
+
+
+def __getattr__(name):
+    """
+        Module attributes defined on first use: WordNetTagger
+    """
+    if name == "WordNetTagger":
+        return _wordnet_tagger.resolve()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if __name__ == "__main__":
+    import os
+    import pickle
+    import tempfile
+    import time
+    from nltk.tokenize import word_tokenize
+    from nltk.tag.sequential import ClassifierBasedPOSTagger
+    from nltk.tag import tnt
+    from nltk.tag import DefaultTagger, UnigramTagger, BigramTagger, TrigramTagger, AffixTagger
+    from samples import sample
+    from compiled_tagger import compile_backoff_chain
+    from evaluation import TaggedTestSet, evaluate
+    from incremental_tagging import IncrementalUnigramTagger, IncrementalBigramTagger, \
+        IncrementalTrigramTagger, update_backoffs, save_checkpoint
+    from vectorized_tnt import VectorizedTnT
+    from wordnet_lexicon import WordNetLexiconTagger, build_wordnet_lexicon
+
+    # Test and training variables
+    test_sents = treebank.tagged_sents()[3000:]
+    train_sents = treebank.tagged_sents()[:3000]
+    tk_sample = word_tokenize(sample)
+
+    # Test set prepared once, and scored on flat tag arrays
+    test_set = TaggedTestSet(test_sents)
+
+    # Default tagger - Nouns
+    df_tagger = DefaultTagger('NN')
+    tagged = df_tagger.tag(tk_sample)
+    accuracy = evaluate(df_tagger, test_set).accuracy()
+    print(f"Tagged text: {tagged}; acc = {accuracy}\n")
+
+    # Unigram tagger
+    ug_tagger = UnigramTagger(train_sents)
+    tagged = ug_tagger.tag(tk_sample)
+    accuracy = evaluate(ug_tagger, test_set).accuracy()
+    print(f"Tagged text: {tagged}; acc = {accuracy}\n")
+
+    # Backoff tagger: rely on other tagger(backoff) when the current one does not know how
+    # to evaluate
+    ugb_tagger = UnigramTagger(train_sents, backoff=df_tagger)
+    accuracy = evaluate(ugb_tagger, test_set).accuracy()
+    print(f"Accuracy of backoff: {accuracy}\n")
+
+    # Saving pickle and testing it.
+    with open('pickles/pos-taggers/unigram_backoff_tagger.pickle', 'wb') as file:
+        pickle.dump(ugb_tagger, file)
+
+    with open('pickles/pos-taggers/unigram_backoff_tagger.pickle', 'rb') as file:
+        pk_tagger = pickle.load(file)
+
+    accuracy = evaluate(pk_tagger, test_set).accuracy()
+    print(f"Accuracy of pickled backoff: {accuracy}\n")
+
+    # Testing bigram and trigram taggers
+    bg_tagger = BigramTagger(train_sents)
+    accuracy = evaluate(bg_tagger, test_set).accuracy()
+    print(f"Accuracy of bigram: {accuracy}\n")
+
+    tg_tagger = TrigramTagger(train_sents)
+    accuracy = evaluate(tg_tagger, test_set).accuracy()
+    print(f"Accuracy of trigram: {accuracy}\n")
+
+    # Testing the function with all 4 taggers
+    bc_tagger = make_backoffs(
+        train_sents, [UnigramTagger, BigramTagger, TrigramTagger], backoff=df_tagger)
+    accuracy = evaluate(bc_tagger, test_set).accuracy()
+    print(f"Accuracy of the backoff chain tagger: {accuracy}\n")
+
+    # Saving pickle
+    with open('pickles/pos-taggers/backoff_chain_tagger.pickle', 'wb') as file:
+        pickle.dump(bc_tagger, file)
+
+    # Incremental backoff chain: keeps its counts, so new sentences update it in place
+    inc_tagger = make_backoffs(train_sents[:2000], [IncrementalUnigramTagger,
+                                                    IncrementalBigramTagger,
+                                                    IncrementalTrigramTagger], backoff=df_tagger)
+    update_backoffs(inc_tagger, train_sents[2000:])
+    accuracy = evaluate(inc_tagger, test_set).accuracy()
+    print(f"Accuracy of the incrementally trained chain tagger: {accuracy}\n")
+
+    # Checkpoint with the counts, to keep updating it later. Not one of the pickles of the
+    # repository, so it is only written to a temporary directory
+    with tempfile.TemporaryDirectory() as tmp:
+        save_checkpoint(inc_tagger, os.path.join(tmp, 'incremental_backoff_tagger.pickle'))
+
+    # Compiled backoff chain: the whole chain folded into one flat lookup table
+    cbc_tagger = compile_backoff_chain(bc_tagger)
+    accuracy = evaluate(cbc_tagger, test_set).accuracy()
+    print(f"Accuracy of the compiled backoff chain tagger: {accuracy}\n")
+
+    # Affix tagger: context is either the prefix or the suffix
+    af_tagger = AffixTagger(train_sents)
+    accuracy = evaluate(af_tagger, test_set).accuracy()
+    print(f"Accuracy of the affix tagger: {accuracy}\n")
+
+    # Brill tagger using the previous backoff chain tagger
+    br_tagger = train_brill_tagger(bc_tagger, train_sents)
+    accuracy = evaluate(br_tagger, test_set).accuracy()
+    print(f"Accuracy of the brill tagger: {accuracy}\n")
+
+    # Saving pickle
+    with open('pickles/pos-taggers/brill_tagger.pickle', 'wb') as file:
+        pickle.dump(br_tagger, file)
+
+    # TnT tagger with default tagger for unknown words
+    tnt_tagger = tnt.TnT(unk=df_tagger, Trained=True, N=200)
+    tnt_tagger.train(train_sents)
+    accuracy = evaluate(tnt_tagger, test_set).accuracy()
+    print(f"Accuracy of the tnt tagger: {accuracy}\n")
+
+    # Saving pickle
+    with open('pickles/pos-taggers/tnt_tagger.pickle', 'wb') as file:
+        pickle.dump(tnt_tagger, file)
+
+    # Same tnt tagger, decoded over arrays for a whole batch of sentences
+    test_words = [[word for word, _ in sent] for sent in test_sents]
+    start = time.perf_counter()
+    tnt_tagger.tag_sents(test_words)
+    tnt_latency = (time.perf_counter() - start) / len(test_words)
+    vec_tnt_tagger = VectorizedTnT(tnt_tagger)
+    start = time.perf_counter()
+    vec_tnt_tagger.tag_sents(test_words)
+    vec_latency = (time.perf_counter() - start) / len(test_words)
+    accuracy = evaluate(vec_tnt_tagger, test_set).accuracy()
+    print(f"Accuracy of the vectorized tnt tagger: {accuracy}")
+    print(f"Latency per sentence: tnt {tnt_latency * 1e3:.3f}ms; " +
+          f"vectorized {vec_latency * 1e3:.3f}ms\n")
+
+    # Using the wordnet tagger
+    wn_tagger = _wordnet_tagger()
+    accuracy = evaluate(wn_tagger, test_set).accuracy()
+    print(f"Accuracy of the wordnet tagger: {accuracy}\n")
+
+    # Same idea over a lexicon precomputed from wordnet: one lookup per token
+    build_wordnet_lexicon()
+    wl_tagger = WordNetLexiconTagger()
+    accuracy = evaluate(wl_tagger, test_set).accuracy()
+    print(f"Accuracy of the wordnet lexicon tagger: {accuracy}\n")
+
+    # The lexicon tagger as a backoff link of the n-gram chain
+    wl_chain = make_backoffs(train_sents, [UnigramTagger, BigramTagger, TrigramTagger],
+                             backoff=WordNetLexiconTagger(backoff=df_tagger))
+    accuracy = evaluate(wl_chain, test_set).accuracy()
+    print(f"Accuracy of the backoff chain with the wordnet lexicon: {accuracy}\n")
+
+    # Classifier tagging
+    cl_tagger = ClassifierBasedPOSTagger(train=train_sents)
+    accuracy = evaluate(cl_tagger, test_set).accuracy()
+    print(f"Accuracy of the classifier tagger: {accuracy}\n")
+
+    # Saving pickle - Heavy one
+    with open('pickles/pos-taggers/classifier_tagger.pickle', 'wb') as file:
+        pickle.dump(cl_tagger, file)
@@ -0,0 +1,45 @@
+"""
+    Tests of the incremental context taggers
+"""
+# pylint: disable=C0103
+
+import pickle
+from nltk.tag import DefaultTagger, UnigramTagger
+from incremental_tagging import IncrementalUnigramTagger, IncrementalBigramTagger
+
+train_sents = [[("the", "DT"), ("dog", "NN"), ("runs", "VBZ")],
+               [("a", "DT"), ("cat", "NN"), ("sleeps", "VBZ")]]
+new_sents = [[("the", "DT"), ("bird", "NN"), ("sings", "VBZ")],
+             [("dog", "VB"), ("dog", "VB"), ("birds", "NNS")]]
+
+
+def test_update_of_tagger_built_from_model():
+    tagger = IncrementalUnigramTagger(model={"the": "DT", "dog": "NN"},
+                                      backoff=DefaultTagger("NN"))
+    tagger.update(new_sents)
+    # "dog" has one seeded NN count against two new VB counts
+    assert tagger.tag(["the", "bird", "sings", "dog", "birds"]) == [
+        ("the", "DT"), ("bird", "NN"), ("sings", "VBZ"), ("dog", "VB"), ("birds", "NNS")]
+
+
+def test_update_keeps_model_entries_of_unseen_contexts():
+    tagger = IncrementalBigramTagger(model={((), "x"): "FW"})
+    tagger.update(new_sents)
+    assert tagger._context_to_tag[((), "x")] == "FW"  # pylint: disable = W0212
+    assert tagger.tag(["the", "bird"]) == [("the", "DT"), ("bird", "NN")]
+
+
+def test_update_of_tagger_pickled_without_counts():
+    tagger = IncrementalUnigramTagger(train_sents)
+    for name in ("_fd", "_useful", "_cutoff"):
+        delattr(tagger, name)
+    tagger = pickle.loads(pickle.dumps(tagger))
+    tagger.update(new_sents)
+    assert tagger.tag(["dog", "birds"]) == [("dog", "VB"), ("birds", "NNS")]
+
+
+def test_update_matches_retrain():
+    tagger = IncrementalUnigramTagger(train_sents)
+    tagger.update(new_sents)
+    retrained = UnigramTagger(train_sents + new_sents)
+    assert tagger._context_to_tag == retrained._context_to_tag  # pylint: disable = W0212
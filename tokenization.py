@@ -6,6 +6,7 @@
 import nltk.data
 from nltk.tokenize import sent_tokenize, word_tokenize
 from nltk.tokenize import MWETokenizer, TreebankWordTokenizer, TweetTokenizer
+from batch_tokenization import document_spans, load_tokenizers
 from samples import sample, sample_ct, sample_tw
 
 """
@@ -43,3 +44,14 @@ print(f"MWE tok = {mwe_tk.tokenize(sample.split())}\n")
 # Testing contractions
 print(f"Word tok contractions = {word_tokenize(sample_ct)}\n")
 print(f"Tweet contractions = {tweet_tk.tokenize(sample_ct)}\n")
+
+"""
+    Spans from tokenizers loaded once
+"""
+
+# Sentence and word spans of the sample, with the words of word_tokenize
+load_tokenizers("english")
+sent_spans, word_spans, word_bounds = document_spans(sample)
+print(f"Sentence spans = {sent_spans.tolist()}\n")
+print("Words of the first sentence = " +
+      f"{[sample[start:end] for start, end in word_spans[:word_bounds[1]].tolist()]}\n")
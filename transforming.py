@@ -3,15 +3,6 @@
 """
 # pylint: disable=C0103
 
-import pickle
-from nltk import pos_tag
-from nltk.tokenize import word_tokenize
-from samples import quote_2, quote_3, quote_4, quote_5, quote_6, quote_7, wrong_1, wrong_2
-
-# Loading tagger
-with open("pickles/pos-taggers/brill_tagger.pickle", "rb") as file:
-    pos_tagger = pickle.load(file)
-
 
 def filter_insignificant(chunk, tag_suffixes=['DT', 'CC']):  # pylint: disable = W0102
     """
@@ -33,10 +24,6 @@ def filter_insignificant(chunk, tag_suffixes=['DT', 'CC']):  # pylint: disable =
     return good
 
 
-# Filtering
-filtered = filter_insignificant(pos_tagger.tag(word_tokenize(quote_2)))
-print(f"Filtered: {filtered}\n")
-
 # Verb forms
 plural_verb_forms = {
     ('is', 'VBZ'): ('are', 'VBP'),
@@ -110,11 +97,6 @@ def correct_verbs(chunk):
     return chunk
 
 
-corrected = correct_verbs(pos_tagger.tag(word_tokenize(wrong_1)))
-print(f"Corrected = {corrected}\n")
-corrected = correct_verbs(pos_tagger.tag(word_tokenize(wrong_2)))
-print(f"Corrected = {corrected}\n")
-
 # Swapping
 
 
@@ -135,10 +117,6 @@ def swap_verb_phrase(chunk):
     return chunk[vb_index + 1:] + chunk[:vb_index]
 
 
-swapped = swap_verb_phrase(pos_tagger.tag(word_tokenize(quote_3)))
-print(f"Swapping verb phrases: {swapped}\n")
-
-
 def tag_equals(tag):
     """
         High order - builds a function with the given tag
@@ -167,10 +145,6 @@ def swap_noun_cardinal(chunk):
     return chunk
 
 
-swapped = swap_noun_cardinal(pos_tagger.tag(word_tokenize(quote_4)))
-print(f"Swapping noun cardinals: {swapped}\n")
-
-
 def swap_infinitive_phrase(chunk):
     """
         Swaps infinitives phrases to a more concise form
@@ -190,10 +164,6 @@ def swap_infinitive_phrase(chunk):
     return chunk[:nn_index] + chunk[in_index + 1:] + chunk[nn_index:in_index]
 
 
-swapped = swap_infinitive_phrase(pos_tagger.tag(word_tokenize(quote_5)))
-print(f"Swapping infinitive phrases: {swapped}\n")
-
-
 def singularize_plural_noun(chunk):
     """
         Depluralize a noun that is followed by other noun
@@ -208,9 +178,6 @@ def singularize_plural_noun(chunk):
     return chunk
 
 
-sing = singularize_plural_noun(pos_tag(word_tokenize(quote_6)))
-print(f"Singularized plural nouns: {sing}\n")
-
 # Chaining
 
 
@@ -227,5 +194,42 @@ def transform_chunk(chunk, chain=[filter_insignificant, swap_verb_phrase,  # pyl
     return chunk
 
 
-transformed = transform_chunk(pos_tag(word_tokenize(quote_7)), trace=1)
-print(f"\nTransformed sentence: {transformed}\n")
+if __name__ == "__main__":
+    import pickle
+    from nltk import pos_tag
+    from nltk.tokenize import word_tokenize
+    from samples import quote_2, quote_3, quote_4, quote_5, quote_6, quote_7, wrong_1, wrong_2
+    from indexed_brill import IndexedBrillTagger
+    from chunk_transforms import ChunkTransformer
+
+    # Loading tagger
+    with open("pickles/pos-taggers/brill_tagger.pickle", "rb") as file:
+        pos_tagger = IndexedBrillTagger(pickle.load(file))
+
+    # Filtering
+    filtered = filter_insignificant(pos_tagger.tag(word_tokenize(quote_2)))
+    print(f"Filtered: {filtered}\n")
+
+    corrected = correct_verbs(pos_tagger.tag(word_tokenize(wrong_1)))
+    print(f"Corrected = {corrected}\n")
+    corrected = correct_verbs(pos_tagger.tag(word_tokenize(wrong_2)))
+    print(f"Corrected = {corrected}\n")
+
+    swapped = swap_verb_phrase(pos_tagger.tag(word_tokenize(quote_3)))
+    print(f"Swapping verb phrases: {swapped}\n")
+
+    swapped = swap_noun_cardinal(pos_tagger.tag(word_tokenize(quote_4)))
+    print(f"Swapping noun cardinals: {swapped}\n")
+
+    swapped = swap_infinitive_phrase(pos_tagger.tag(word_tokenize(quote_5)))
+    print(f"Swapping infinitive phrases: {swapped}\n")
+
+    sing = singularize_plural_noun(pos_tag(word_tokenize(quote_6)))
+    print(f"Singularized plural nouns: {sing}\n")
+
+    transformed = transform_chunk(pos_tag(word_tokenize(quote_7)), trace=1)
+    print(f"\nTransformed sentence: {transformed}\n")
+
+    # Same chain from the transformation engine, over tag class bitmasks
+    engine_transformed = ChunkTransformer().transform(pos_tag(word_tokenize(quote_7)))
+    print(f"Engine: same output = {engine_transformed == transformed}\n")
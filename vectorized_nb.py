@@ -0,0 +1,268 @@
+"""
+    Vectorized Naive Bayes: featuresets indexed into sparse CSR matrices, trained and
+    scored for whole batches with matrix operations
+"""
+# pylint: disable=C0103
+
+import itertools
+import math
+import numpy as np
+from scipy import sparse
+from nltk.classify.api import ClassifierI
+from nltk.probability import DictionaryProbDist
+
+
+def batches(iterable, size):
+    """
+        Splits an iterable into lists of at most size elements
+    """
+    iterator = iter(iterable)
+    batch = list(itertools.islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(itertools.islice(iterator, size))
+
+
+class _Unseen:  # pylint: disable = R0903
+    """
+        Stands for every value of a feature name that was not seen in training
+    """
+
+    def __repr__(self):
+        return "<unseen>"
+
+    def __reduce__(self):
+        # Unpickles as the UNSEEN of this module, so pickled indexers keep finding it
+        return "UNSEEN"
+
+
+UNSEEN = _Unseen()
+
+
+class FeatureIndexer(object):
+    """
+        Vocabulary indexer: gives each (fname, fval) pair a column. Every feature name
+        also gets a (fname, None) column, for the implicit 'None' value nltk assigns to
+        missing features, and a (fname, UNSEEN) column for values it never saw.
+    """
+
+    def __init__(self):
+        self.columns = {}
+        self.fnames = {}
+        self.column_fname = []
+
+    def __len__(self):
+        return len(self.columns)
+
+    def _add(self, feature):
+        """
+            Gives a column to a new feature
+        """
+        fname = feature[0]
+        if fname not in self.fnames:
+            self.fnames[fname] = len(self.fnames)
+            for reserved in ((fname, None), (fname, UNSEEN)):
+                self.columns[reserved] = len(self.column_fname)
+                self.column_fname.append(self.fnames[fname])
+        if feature not in self.columns:
+            self.columns[feature] = len(self.column_fname)
+            self.column_fname.append(self.fnames[fname])
+        return self.columns[feature]
+
+    def transform(self, featuresets, grow=False):
+        """
+            Turns featuresets into a binary CSR matrix, one row per featureset. Without
+            grow, unseen values go to their UNSEEN column and unknown names are dropped.
+        """
+        indptr, indices = [0], []
+        columns = self.columns
+        for featureset in featuresets:
+            for feature in featureset.items():
+                column = columns.get(feature)
+                if column is None:
+                    if grow:
+                        column = self._add(feature)
+                    else:
+                        column = columns.get((feature[0], UNSEEN))
+                        if column is None:
+                            continue
+                indices.append(column)
+            indptr.append(len(indices))
+        data = np.ones(len(indices), dtype=np.float64)
+        return sparse.csr_matrix((data, indices, indptr), shape=(len(indptr) - 1, len(self)))
+
+
+class VectorizedNaiveBayes(ClassifierI):
+    """
+        Same model as nltk's NaiveBayesClassifier with ELE estimates: only the features
+        present in a featureset are scored, and missing features count as the value None
+        during training. Probabilities are kept as a (labels x columns) log2 matrix.
+    """
+
+    def __init__(self, indexer=None):
+        self.indexer = indexer or FeatureIndexer()
+        self._labels = []
+        self._label_counts = np.zeros(0, dtype=np.int64)
+        self._counts = np.zeros((0, 0), dtype=np.int64)
+        self._weights = None
+        self._prior = None
+
+    @classmethod
+    def train(cls, labeled_featuresets, indexer=None, batch_size=None):
+        """
+            Trains a classifier from (featureset, label) pairs. With a batch_size the pairs
+            are consumed lazily, batch_size at a time, so any iterable will do
+        """
+        classifier = cls(indexer)
+        if batch_size is None:
+            classifier.partial_fit(labeled_featuresets)
+        else:
+            for batch in batches(labeled_featuresets, batch_size):
+                classifier.partial_fit(batch)
+        return classifier
+
+    def partial_fit(self, labeled_featuresets):
+        """
+            Adds the counts of a batch of (featureset, label) pairs. Memory grows with the
+            number of labels and features, not with the number of featuresets seen
+        """
+        labeled_featuresets = list(labeled_featuresets)
+        featuresets = [featureset for featureset, _ in labeled_featuresets]
+        matrix = self.indexer.transform(featuresets, grow=True)
+        self.partial_fit_matrix(matrix, [label for _, label in labeled_featuresets])
+
+    def partial_fit_matrix(self, matrix, labels):
+        """
+            Adds the counts of a batch already turned into a binary CSR matrix by the
+            indexer, one row per featureset, with the label of each row
+        """
+        for label in labels:
+            if label not in self._labels:
+                self._labels.append(label)
+        label_ids = {label: index for index, label in enumerate(self._labels)}
+        rows = np.array([label_ids[label] for label in labels], dtype=np.int64)
+        n_labels, n_columns = len(self._labels), len(self.indexer)
+
+        # Grow the count tables geometrically, so batches do not copy them every time
+        if self._counts.shape[0] < n_labels or self._counts.shape[1] < n_columns:
+            counts = np.zeros((n_labels, max(n_columns, 2 * self._counts.shape[1])), dtype=np.int64)
+            counts[:self._counts.shape[0], :self._counts.shape[1]] = self._counts
+            self._counts = counts
+            self._label_counts = np.append(self._label_counts,
+                                           np.zeros(n_labels - len(self._label_counts), dtype=np.int64))
+
+        one_hot = sparse.csr_matrix((np.ones(len(rows)), (rows, np.arange(len(rows)))),
+                                    shape=(n_labels, len(rows)))
+        self._counts[:, :n_columns] += (one_hot @ matrix).toarray().astype(np.int64)
+        self._label_counts += np.bincount(rows, minlength=n_labels)
+        self._weights = None
+
+    def _effective_counts(self):
+        """
+            Counts with the implicit None values added, and the value count of each column
+        """
+        fnames = np.array(self.indexer.column_fname, dtype=np.int64)
+        n_fnames = len(self.indexer.fnames)
+        counts = self._counts[:, :len(self.indexer)].copy()
+
+        # Featuresets of a label lacking a fname count as (fname, None)
+        present = np.zeros((len(self._labels), n_fnames), dtype=np.int64)
+        np.add.at(present.T, fnames, counts.T)
+        none_columns = [self.indexer.columns[fname, None] for fname in self.indexer.fnames]
+        counts[:, none_columns] += self._label_counts[:, None] - present
+
+        # Bins of a fname: the values it took in training, None included
+        seen = counts.sum(axis=0) > 0
+        bins = np.bincount(fnames[seen], minlength=n_fnames)
+        return counts, bins[fnames]
+
+    def _finalize(self):
+        """
+            Computes the log2 probabilities from the counts
+        """
+        counts, bins = self._effective_counts()
+        divisor = self._label_counts[:, None] + bins[None, :] * 0.5
+        self._weights = np.log((counts + 0.5) / divisor) / math.log(2)
+        total = self._label_counts.sum() + len(self._labels) * 0.5
+        self._prior = np.log((self._label_counts + 0.5) / total) / math.log(2)
+
+    def labels(self):
+        return self._labels
+
+    def weights(self):
+        """
+            (weights, prior): the (labels x columns) log2 P(feature | label) matrix and
+            the log2 P(label) of each label
+        """
+        if self._weights is None:
+            self._finalize()
+        return self._weights, self._prior
+
+    def log_scores(self, featuresets):
+        """
+            Unnormalized log2 P(label, featureset) for a batch, as a (featuresets x labels) array
+        """
+        if self._weights is None:
+            self._finalize()
+        matrix = self.indexer.transform(featuresets)
+        return np.asarray(matrix @ self._weights.T) + self._prior
+
+    def classify_many(self, featuresets):
+        scores = self.log_scores(featuresets)
+        # Like DictionaryProbDist.max(), ties go to the greatest label
+        order = sorted(range(len(self._labels)), key=lambda index: self._labels[index])
+        best = len(order) - 1 - np.argmax(scores[:, order[::-1]], axis=1)
+        return [self._labels[order[index]] for index in best]
+
+    def prob_classify_many(self, featuresets):
+        return [DictionaryProbDist(dict(zip(self._labels, row)), normalize=True, log=True)
+                for row in self.log_scores(featuresets).tolist()]
+
+    def classify(self, featureset):
+        return self.classify_many([featureset])[0]
+
+    def prob_classify(self, featureset):
+        return self.prob_classify_many([featureset])[0]
+
+    def _probabilities(self):
+        """
+            P(fval | label, fname) for every column, and which labels saw each value
+        """
+        counts, bins = self._effective_counts()
+        return (counts + 0.5) / (self._label_counts[:, None] + bins[None, :] * 0.5), counts > 0
+
+    def most_informative_features(self, n=100):
+        """
+            The features with the highest max/min ratio of P(fval | label), in the same
+            order as nltk's NaiveBayesClassifier
+        """
+        probs, seen = self._probabilities()
+        maxprob = np.where(seen, probs, 0.0).max(axis=0)
+        minprob = np.where(seen, probs, 1.0).min(axis=0)
+        features = [(feature, column) for feature, column in self.indexer.columns.items()
+                    if seen[:, column].any()]
+        features.sort(key=lambda item: (minprob[item[1]] / maxprob[item[1]], item[0][0],
+                                        item[0][1] in [None, False, True], str(item[0][1]).lower()))
+        return [feature for feature, _ in features[:n]]
+
+    def show_most_informative_features(self, n=10):
+        """
+            Prints the most informative features like nltk's NaiveBayesClassifier
+        """
+        probs, seen = self._probabilities()
+        print("Most Informative Features")
+        for feature in self.most_informative_features(n):
+            fname, fval = feature
+            column = self.indexer.columns[feature]
+            labels = sorted([index for index in range(len(self._labels)) if seen[index, column]],
+                            key=lambda index: (-probs[index, column], self._labels[index]),
+                            reverse=True)
+            if len(labels) == 1:
+                continue
+            l0, l1 = labels[0], labels[-1]
+            if probs[l0, column] == 0:
+                ratio = "INF"
+            else:
+                ratio = "%8.1f" % (probs[l1, column] / probs[l0, column])
+            print("%24s = %-14r %6s : %-6s = %s : 1.0" % (
+                fname, fval, ("%s" % self._labels[l1])[:6], ("%s" % self._labels[l0])[:6], ratio))
@@ -0,0 +1,232 @@
+"""
+    Vectorized TnT decoding: the beam search of a trained TnT tagger over NumPy tables,
+    run for a whole batch of sentences one word position at a time
+"""
+# pylint: disable=C0103
+
+import math
+import numpy as np
+from nltk.tag import TaggerI
+
+
+class VectorizedTnT(TaggerI):
+    """
+        Same beam search as TnT.tag, over arrays.
+
+        The interpolated probability of a state only depends on the two states before it,
+        so its log is tabled once for every (prev2, prev1, state) triple, with math.log as
+        TnT computes it, to keep the very same scores and ties. Contexts TnT never sees
+        when tagging (the "BOS" strings of its start history, unknown word tags) share an
+        extra state with no counts. Each step scores the candidate tags of every beam
+        entry of every sentence at once, and sorts them by sentence then score, keeping
+        TnT's order for equal scores, before the beam cut.
+    """
+
+    def __init__(self, tagger):
+        # pylint: disable = W0212
+        self._C, self._N, self._unk = tagger._C, tagger._N, tagger._unk
+        self._wd = {word: dict(fdist) for word, fdist in tagger._wd.items()}
+        self._uni = dict(tagger._uni)
+
+        contexts = set(tagger._uni) | set(tagger._bi.conditions())
+        contexts.update(state for history in tagger._tri.conditions() for state in history)
+        self._state_ids = {state: index for index, state in
+                           enumerate(sorted(contexts, key=repr))}
+        self._unseen = size = len(self._state_ids)
+        size += 1
+
+        p_uni = np.zeros(size)
+        for state, count in tagger._uni.items():
+            p_uni[self._state_ids[state]] = tagger._uni.freq(state)
+        p_bi = np.zeros((size, size))
+        for prev, fdist in tagger._bi.items():
+            for state in fdist:
+                p_bi[self._state_ids[prev], self._state_ids[state]] = fdist.freq(state)
+        p_tri = np.zeros((size, size, size))
+        for (prev2, prev1), fdist in tagger._tri.items():
+            for state in fdist:
+                p_tri[self._state_ids[prev2], self._state_ids[prev1],
+                      self._state_ids[state]] = fdist.freq(state)
+        p = tagger._l1 * p_uni[None, None, :] + tagger._l2 * p_bi[None, :, :] + tagger._l3 * p_tri
+        self._log_p = np.array([math.log(value, 2) if value > 0 else -math.inf
+                                for value in p.ravel().tolist()]).reshape(p.shape)
+
+        self._tags = []
+        self._tag_ids = {}
+        self._entries = {}
+
+    def _tag_id(self, tag):
+        """
+            Index of an output tag
+        """
+        index = self._tag_ids.get(tag)
+        if index is None:
+            index = self._tag_ids[tag] = len(self._tags)
+            self._tags.append(tag)
+        return index
+
+    def _entry(self, word):
+        """
+            (state ids, tag ids, log p(word | tag)) of the candidate tags of a known word,
+            in TnT's order, or (state id, tag id) of the tag given to an unknown word
+        """
+        C = bool(self._C and word[0].isupper())
+        entry = self._entries.get((word, C))
+        if entry is not None:
+            return entry
+        counts = self._wd.get(word)
+        if counts:
+            states, tags, log_wd = [], [], []
+            for tag, count in counts.items():
+                state = (tag, C)
+                log_wd.append(math.log(count / self._uni.get(state, 0), 2))
+                states.append(self._state_ids[state])
+                tags.append(self._tag_id(tag))
+            entry = (np.array(states), np.array(tags), np.array(log_wd))
+        else:
+            if self._unk is None:
+                tag = "Unk"
+            else:
+                [(_, tag)] = list(self._unk.tag([word]))
+            entry = (self._state_ids.get((tag, C), self._unseen), self._tag_id(tag))
+        self._entries[word, C] = entry
+        return entry
+
+    def tag(self, tokens):
+        """
+            Tags a sentence, giving the same tags as TnT.tag
+        """
+        return self.tag_sents([tokens])[0]
+
+    def tag_sents(self, sentences):
+        """
+            Tags a batch of sentences, stepping through their word positions together
+        """
+        sents = [list(sent) for sent in sentences]
+        lengths = np.array([len(sent) for sent in sents], dtype=np.int64)
+        count = len(sents)
+
+        # Beam entries of every sentence, grouped by sentence, best first
+        owner = np.flatnonzero(lengths > 0)
+        score = np.zeros(len(owner))
+        prev2 = prev1 = np.full(len(owner), self._unseen)
+        steps, last = [], {}
+
+        for index in range(int(lengths.max(initial=0))):
+            ending = lengths[owner] == index
+            if ending.any():
+                self._record_best(owner, np.flatnonzero(ending), index - 1, last)
+            entries = np.flatnonzero(~ending)
+            active = np.unique(owner[entries])
+
+            known = np.zeros(count, dtype=bool)
+            sizes = np.zeros(count, dtype=np.int64)
+            starts = np.zeros(count, dtype=np.int64)
+            unknown_states = np.zeros(count, dtype=np.int64)
+            unknown_tags = np.zeros(count, dtype=np.int64)
+            states, tags, log_wd = [], [], []
+            offset = 0
+            for sentnum in active.tolist():
+                entry = self._entry(sents[sentnum][index])
+                if len(entry) == 3:
+                    known[sentnum], sizes[sentnum], starts[sentnum] = True, len(entry[0]), offset
+                    offset += len(entry[0])
+                    states.append(entry[0])
+                    tags.append(entry[1])
+                    log_wd.append(entry[2])
+                else:
+                    unknown_states[sentnum], unknown_tags[sentnum] = entry
+
+            # Candidates of the entries at known words, in TnT's order
+            known_entries = entries[known[owner[entries]]]
+            repeats = sizes[owner[known_entries]]
+            parents = np.repeat(known_entries, repeats)
+            candidates = np.arange(int(repeats.sum())) + np.repeat(
+                starts[owner[known_entries]] - (np.cumsum(repeats) - repeats), repeats)
+            if states:
+                states, tags, log_wd = (np.concatenate(states), np.concatenate(tags),
+                                        np.concatenate(log_wd))
+                new_states = states[candidates]
+                new_tags = tags[candidates]
+                new_score = score[parents] + (
+                    self._log_p[prev2[parents], prev1[parents], new_states] + log_wd[candidates])
+            else:
+                new_states = new_tags = np.zeros(0, dtype=np.int64)
+                new_score = np.zeros(0)
+
+            # Entries at unknown words keep their order and score
+            unknown_entries = entries[~known[owner[entries]]]
+            parents = np.concatenate([parents, unknown_entries])
+            new_owner = owner[parents]
+            new_states = np.concatenate([new_states, unknown_states[owner[unknown_entries]]])
+            new_tags = np.concatenate([new_tags, unknown_tags[owner[unknown_entries]]])
+            new_score = np.concatenate([new_score, score[unknown_entries]])
+
+            # Stable sort by sentence then decreasing score, and beam cut
+            order = np.lexsort((-new_score, new_owner))
+            sorted_owner = new_owner[order]
+            firsts = np.flatnonzero(np.r_[True, sorted_owner[1:] != sorted_owner[:-1]])
+            ranks = np.arange(len(order)) - np.repeat(firsts, np.diff(np.r_[firsts, len(order)]))
+            keep = order[ranks < self._N]
+
+            owner, score = new_owner[keep], new_score[keep]
+            prev2, prev1 = prev1[parents[keep]], new_states[keep]
+            steps.append((parents[keep], new_tags[keep]))
+
+        if len(owner):
+            self._record_best(owner, np.arange(len(owner)), len(steps) - 1, last)
+        return [self._backtrack(sent, steps, *last[sentnum]) if sent else []
+                for sentnum, sent in enumerate(sents)]
+
+    @staticmethod
+    def _record_best(owner, entries, step, last):
+        """
+            Keeps the first (best) entry of each sentence among entries of a step
+        """
+        sentnums = owner[entries]
+        firsts = np.r_[True, sentnums[1:] != sentnums[:-1]]
+        for sentnum, entry in zip(sentnums[firsts].tolist(), entries[firsts].tolist()):
+            last[sentnum] = (step, entry)
+
+    def _backtrack(self, sent, steps, step, entry):
+        """
+            (word, tag) pairs of a sentence, following the parents from its best entry
+        """
+        tags = []
+        while step >= 0:
+            parents, tag_ids = steps[step]
+            tags.append(self._tags[tag_ids[entry]])
+            entry = parents[entry]
+            step -= 1
+        return list(zip(sent, reversed(tags)))
+
+
+if __name__ == "__main__":
+    import pickle
+    import time
+    from nltk.corpus import treebank
+
+    with open("pickles/pos-taggers/tnt_tagger.pickle", "rb") as file:
+        tnt_tagger = pickle.load(file)
+    test_sents = treebank.tagged_sents()[3000:]
+    test_words = [[word for word, _ in sent] for sent in test_sents]
+
+    start = time.perf_counter()
+    vectorized = VectorizedTnT(tnt_tagger)
+    print(f"Tables built in {time.perf_counter() - start:.3f}s")
+
+    start = time.perf_counter()
+    expected = [tnt_tagger.tag(words) for words in test_words]
+    tnt_time = (time.perf_counter() - start) / len(test_words)
+    start = time.perf_counter()
+    single = [vectorized.tag(words) for words in test_words]
+    single_time = (time.perf_counter() - start) / len(test_words)
+    start = time.perf_counter()
+    batched = vectorized.tag_sents(test_words)
+    batch_time = (time.perf_counter() - start) / len(test_words)
+
+    print(f"Latency per sentence: TnT {tnt_time * 1e3:.3f}ms; vectorized tag " +
+          f"{single_time * 1e3:.3f}ms; vectorized tag_sents {batch_time * 1e3:.3f}ms; " +
+          f"same tags = {single == expected == batched}")
+    print(f"Accuracy: TnT {tnt_tagger.evaluate(test_sents)}; " +
+          f"vectorized {vectorized.evaluate(test_sents)}")
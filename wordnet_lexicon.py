@@ -0,0 +1,123 @@
+"""
+    WordNet POS lexicon: the treebank tag WordNet suggests for each word, computed once
+    and saved as a mapped hash table, so tagging is one lookup per token
+"""
+# pylint: disable=C0103
+
+import collections
+import numpy as np
+from nltk.corpus import treebank, wordnet
+from nltk.probability import FreqDist
+from nltk.tag import SequentialBackoffTagger
+from model_store import MappedTable, hash_keys, read_tables, write_tables
+
+WORDNET_LEXICON = "models/pos-taggers/wordnet_lexicon"
+KIND = "wordnet_lexicon"
+
+# Treebank tag of each WordNet synset POS, as WordNetTagger maps them
+WORDNET_TAG_MAP = {
+    'n': 'NN',
+    's': 'JJ',
+    'a': 'JJ',
+    'r': 'RB',
+    'v': 'VB'
+}
+
+
+def wordnet_lexicon(words=None, tag_counts=None):
+    """
+        Maps every WordNet lemma (but the multiword ones), and the lowercased words
+        (treebank words by default), to the treebank tag of most of their synsets.
+        Ties go to the tag most frequent in tag_counts (treebank tags by default)
+    """
+    if words is None:
+        words = treebank.words()
+    if tag_counts is None:
+        tag_counts = FreqDist(tag for _, tag in treebank.tagged_words())
+
+    vocabulary = dict.fromkeys(lemma for lemma in wordnet.all_lemma_names() if "_" not in lemma)
+    vocabulary.update(dict.fromkeys(word.lower() for word in words))
+    lexicon = {}
+    for word in vocabulary:
+        counts = collections.Counter(WORDNET_TAG_MAP[synset.pos()]
+                                     for synset in wordnet.synsets(word))
+        if counts:
+            lexicon[word] = max(counts, key=lambda tag: (counts[tag], tag_counts[tag], tag))
+    return lexicon
+
+
+def save_lexicon(lexicon, path=WORDNET_LEXICON):
+    """
+        Saves a word -> tag dict as a model directory holding one mapped hash table
+    """
+    labels = sorted(set(lexicon.values()))
+    ids = {tag: index for index, tag in enumerate(labels)}
+    tables = {}
+    hash_keys(lexicon.keys(), tables, "lexicon")
+    tables["lexicon.values"] = np.array([ids[tag] for tag in lexicon.values()], dtype="<i4")
+    write_tables(path, KIND, tables, {"labels": labels})
+
+
+def load_lexicon(path=WORDNET_LEXICON):
+    """
+        Maps a lexicon saved by save_lexicon, as a read-only word -> tag mapping
+    """
+    manifest, tables = read_tables(path)
+    if manifest["kind"] != KIND:
+        raise ValueError(f"{path} holds a {manifest['kind']} model, not a {KIND}")
+    return MappedTable(tables, "lexicon", tables["lexicon.values"], manifest["labels"])
+
+
+def build_wordnet_lexicon(path=WORDNET_LEXICON, words=None):
+    """
+        Build step: computes the WordNet lexicon and saves it to path
+    """
+    lexicon = wordnet_lexicon(words)
+    save_lexicon(lexicon, path)
+    return len(lexicon)
+
+
+class WordNetLexiconTagger(SequentialBackoffTagger):
+    """
+        Tags words with the lexicon built by build_wordnet_lexicon, and leaves the
+        words it does not hold to its backoff. The lexicon is mapped read-only, so the
+        tagger keeps no state between calls and processes loading it share its pages.
+        Pickles only keep the path of the lexicon
+    """
+
+    def __init__(self, path=WORDNET_LEXICON, backoff=None):
+        SequentialBackoffTagger.__init__(self, backoff)
+        self._path = path
+        self._lexicon = load_lexicon(path)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lexicon"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lexicon = load_lexicon(self._path)
+
+    def choose_tag(self, tokens, index, history):
+        """
+            Tag of the lowercased word in the lexicon, as wordnet.synsets lowercases it
+        """
+        return self._lexicon.get(tokens[index].lower())
+
+
+if __name__ == "__main__":
+    import time
+
+    start = time.perf_counter()
+    size = build_wordnet_lexicon()
+    print(f"Built a lexicon of {size} words in {time.perf_counter() - start:.2f}s")
+
+    test_words = [[word for word, _ in sent] for sent in treebank.tagged_sents()[3000:]]
+    start = time.perf_counter()
+    tagger = WordNetLexiconTagger()
+    print(f"Lexicon loaded in {(time.perf_counter() - start) * 1e3:.1f}ms")
+    start = time.perf_counter()
+    tagger.tag_sents(test_words)
+    elapsed = time.perf_counter() - start
+    print(f"Tagged {len(test_words)} sentences in {elapsed:.3f}s")